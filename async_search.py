@@ -0,0 +1,530 @@
+"""基于asyncio的向量检索引擎和评估接口
+
+VectorSearchEngine和search_vector_*系列函数都是阻塞调用，在异步Web框架中只能放到线程池里执行。
+AsyncVectorSearchEngine直接用aiohttp调用DashScope文本向量化和DashVector检索的HTTP接口：
+
+- 一个引擎持有一个aiohttp连接池，DashScope和DashVector的请求复用连接
+- 每个后端一个asyncio.Semaphore限制在途请求数（APIConfig.ASYNC_CONCURRENCY），请求同时经过
+  rate_limiter中与同步调用共用的限流器，线程和协程合计不超过端点配额
+- 与同步路径共用向量缓存、检索缓存、评估缓存和评估结果存储；多个评估同时需要同一文本的向量、
+  同一检索或同一评估时只发出一次请求（交互式评估不等待批量评估发起的请求，见rate_limiter.request_priority）
+
+单个进程中可以同时进行数百个评估：
+
+    async with AsyncVectorSearchEngine() as engine:
+        results = await asyncio.gather(*(engine.calculate_research_score(topic, variables, model)
+                                         for topic, variables, model in inputs_list))
+
+本地后端（EMBEDDING_BACKEND/SEARCH_BACKEND为local）在线程中执行，不占用事件循环。
+"""
+import asyncio
+from collections import namedtuple
+
+import aiohttp
+
+from vector_search_core import (
+    APIConfig, ResultProcessor, TextVectorizer, get_embedding_backend,
+    _is_dashscope_throttled, _is_dashvector_throttled
+)
+from rate_limiter import PRIORITY_LANES, request_priority, call_with_rate_limit_async, ThrottledError
+from result_store import get_default_store
+from result_records import to_record
+from quantization import unpack_vector
+from search_functions import (
+    _EMBEDDING_CACHE, _SEARCH_CACHE, _EVALUATION_CACHE, EVALUATION_DIMENSIONS, _cache_embedding, _resolve_query_vectors,
+    canonicalize_inputs, embedding_digest, search_digest, evaluation_digest, evaluation_cache_key, search_config_hash,
+    describe_dimension_queries, dimension_filter, local_dataset_results, fuse_lexical_scores,
+    merge_dataset_results, build_score_results, load_prompts
+)
+from evaluation_config import current_config
+from structured_log import get_logger
+
+log = get_logger("async_search")
+
+# HTTP响应，字段与限流判断函数（_is_dashscope_throttled、_is_dashvector_throttled）读取的属性一致
+_HTTPResponse = namedtuple("_HTTPResponse", ["status_code", "code", "message", "body"])
+
+
+class AsyncVectorSearchEngine:
+    """异步向量搜索引擎，整合文本向量化和向量检索功能"""
+
+    def __init__(self, dashscope_api_key=None, dashvector_api_key=None, endpoint=None, concurrency=None, session=None):
+        """初始化异步向量搜索引擎
+
+        Args:
+            dashscope_api_key: DashScope API密钥
+            dashvector_api_key: DashVector API密钥
+            endpoint: DashVector服务端点，不含协议时使用https
+            concurrency: 后端名称到最大在途请求数的映射，覆盖APIConfig.ASYNC_CONCURRENCY中的对应项
+            session: 外部创建的aiohttp.ClientSession，默认在首次请求时创建并由close()关闭
+
+        Raises:
+            ValueError: 模型不支持配置的向量维度
+        """
+        self.dashscope_api_key = dashscope_api_key or APIConfig.DASHSCOPE_API_KEY
+        self.dashvector_api_key = dashvector_api_key or APIConfig.DASHVECTOR_API_KEY
+        self.endpoint = endpoint or APIConfig.CLUSTER_ENDPOINT
+        self.concurrency = dict(APIConfig.ASYNC_CONCURRENCY, **(concurrency or {}))
+
+        self.backend = get_embedding_backend()
+        if self.backend is not None:
+            self.dimension = self.backend.dimension
+        else:
+            self.dimension = APIConfig.EMBEDDING_DIMENSION
+            if self.dimension not in APIConfig.SUPPORTED_EMBEDDING_DIMENSIONS:
+                raise ValueError(f"{APIConfig.EMBEDDING_MODEL} 不支持 {self.dimension} 维向量，"
+                                 f"可选维度: {APIConfig.SUPPORTED_EMBEDDING_DIMENSIONS}")
+
+        self._session = session
+        self._owns_session = session is None
+        self._semaphores = {name: asyncio.Semaphore(limit) for name, limit in self.concurrency.items()}
+        # 进行中的检索和评估，键为(优先级, 缓存摘要)
+        self._inflight = {}
+        # 进行中的向量化，键为(优先级, 向量缓存摘要)，值为返回{摘要: 向量}的任务
+        self._inflight_vectors = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """关闭引擎创建的连接池"""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _get_session(self):
+        """获取共享的HTTP连接池，首次调用时创建"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=sum(self.concurrency.values()), ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=APIConfig.ASYNC_HTTP_TIMEOUT))
+            self._owns_session = True
+        return self._session
+
+    async def _post(self, backend, url, headers, payload, is_throttled):
+        """在后端并发上限和共享限流器保护下发送POST请求
+
+        Returns:
+            _HTTPResponse: 响应状态码、业务错误码、错误信息和JSON响应体
+
+        Raises:
+            ThrottledError: 持续被限流，重试次数用尽
+        """
+        session = self._get_session()
+
+        async def send():
+            # 信号量在限流器许可之内获取：排队顺序由限流器按优先级决定，信号量只限制在途请求数
+            async with self._semaphores[backend]:
+                async with session.post(url, json=payload, headers=headers) as resp:
+                    body = await resp.json(content_type=None)
+                    if not isinstance(body, dict):
+                        body = {}
+                    return _HTTPResponse(resp.status, body.get("code"), body.get("message", ""), body)
+
+        return await call_with_rate_limit_async(backend, send, is_throttled, max_retries=APIConfig.THROTTLE_MAX_RETRIES)
+
+    @staticmethod
+    def _find_inflight(inflight, key):
+        """当前调用方可以等待的进行中任务
+
+        只共享同一或更高优先级发起的任务：批量评估发起的请求在限流器中排在batch通道，
+        交互式评估等待它会失去优先级，因此另外发起请求
+        """
+        priority = request_priority.get()
+        lanes = PRIORITY_LANES[:PRIORITY_LANES.index(priority)] if priority in PRIORITY_LANES else PRIORITY_LANES
+        for lane in lanes + (priority,):
+            task = inflight.get((lane, key))
+            if task is not None:
+                return task
+        return None
+
+    async def _single_flight(self, key, factory):
+        """同一个键同时只执行一次factory()，其余调用方等待同一个结果"""
+        task = self._find_inflight(self._inflight, key)
+        if task is None:
+            inflight_key = (request_priority.get(), key)
+            task = asyncio.ensure_future(factory())
+            self._inflight[inflight_key] = task
+            task.add_done_callback(lambda done: self._task_done(done, [inflight_key], self._inflight))
+        # 某个调用方被取消时不影响其他等待同一结果的调用方
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _task_done(task, keys, inflight):
+        """任务结束后移出进行中列表；调用方都已取消时异常不再上抛，这里标记为已读取"""
+        for key in keys:
+            if inflight.get(key) is task:
+                del inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    async def texts_to_vectors(self, texts):
+        """批量将文本转换为向量（不经过缓存）
+
+        DashScope按每批TextVectorizer.DASHSCOPE_BATCH_SIZE条并发请求；本地后端在线程中一次完成
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            list: 与texts等长的向量列表，转换失败的位置为None
+
+        Raises:
+            ThrottledError: 持续被限流，重试次数用尽
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        if self.backend is not None:
+            vectors = await asyncio.to_thread(self.backend.embed_batch, texts)
+            return [vector.tolist() for vector in vectors]
+
+        batch_size = TextVectorizer.DASHSCOPE_BATCH_SIZE
+        batches = await asyncio.gather(*(
+            self._embed_batch(texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)
+        ))
+        return [vector for batch in batches for vector in batch]
+
+    async def _embed_batch(self, batch):
+        """调用DashScope向量化一批文本"""
+        vectors = [None] * len(batch)
+        payload = {"model": APIConfig.EMBEDDING_MODEL, "input": {"texts": batch}, "parameters": {"dimension": self.dimension}}
+        try:
+            resp = await self._post("dashscope", APIConfig.DASHSCOPE_EMBEDDING_URL,
+                                    {"Authorization": f"Bearer {self.dashscope_api_key}"}, payload, _is_dashscope_throttled)
+        except ThrottledError:
+            log.warning("embedding_batch_throttled", "批量文本转向量持续被限流")
+            raise
+        except Exception as e:
+            log.error("embedding_batch_error", "批量文本转向量异常: {error}", error=e)
+            return vectors
+
+        if resp.status_code != 200:
+            log.error("embedding_batch_failed", "批量文本转向量失败: {message}", message=resp.message)
+            return vectors
+        for item in (resp.body.get("output") or {}).get("embeddings", []):
+            vectors[item["text_index"]] = item["embedding"]
+        return vectors
+
+    async def text_to_vector(self, text):
+        """将文本转换为向量（不经过缓存）
+
+        Returns:
+            向量或None（如果转换失败）
+        """
+        return (await self.texts_to_vectors([text]))[0]
+
+    async def cached_vectors(self, texts):
+        """带缓存的批量文本向量化，与_SearchSession共用向量缓存
+
+        未命中缓存的文本一次批量转换；其他协程正在转换的文本等待其结果，不重复请求
+
+        Args:
+            texts: 规范化后的文本列表
+
+        Returns:
+            list: 与texts顺序一致的向量列表，转换失败的位置为None
+        """
+        vectors = [None] * len(texts)
+        waiting = {}
+        missing = {}
+        for index, text in enumerate(texts):
+            key = embedding_digest(text)
+            packed = _EMBEDDING_CACHE.get(key)
+            pending = self._find_inflight(self._inflight_vectors, key) if packed is None else None
+            if packed is not None:
+                vectors[index] = unpack_vector(packed)
+            elif pending is not None:
+                waiting[index] = (key, pending)
+            else:
+                missing.setdefault(key, text)
+                waiting[index] = (key, None)
+
+        if missing:
+            task = asyncio.ensure_future(self._convert(missing))
+            inflight_keys = [(request_priority.get(), key) for key in missing]
+            for inflight_key in inflight_keys:
+                self._inflight_vectors[inflight_key] = task
+            task.add_done_callback(lambda done: self._task_done(done, inflight_keys, self._inflight_vectors))
+            waiting = {index: (key, task if pending is None else pending) for index, (key, pending) in waiting.items()}
+
+        for index, (key, task) in waiting.items():
+            vectors[index] = (await asyncio.shield(task)).get(key)
+        return vectors
+
+    async def _convert(self, missing):
+        """向量化{摘要: 文本}中的文本并写入向量缓存，返回{摘要: 向量}"""
+        converted = await self.texts_to_vectors(list(missing.values()))
+        vectors = {}
+        for key, vector in zip(missing, converted):
+            if vector:
+                vectors[key] = _cache_embedding(key, vector)
+        return vectors
+
+    async def search(self, query_vector, collection_name, topk=10, output_fields=None, search_filter=None):
+        """执行向量检索（不经过缓存）
+
+        Args:
+            query_vector: 查询向量
+            collection_name: 集合名称
+            topk: 返回结果数量
+            output_fields: 返回字段列表，默认为集合的输出字段
+            search_filter: 元数据过滤条件，SearchFilter或DashVector的filter表达式字符串
+
+        Returns:
+            list: 结果记录列表（见result_records），失败时返回None
+
+        Raises:
+            ThrottledError: 持续被限流，重试次数用尽
+        """
+        output_fields = output_fields or APIConfig.get_output_fields(collection_name)
+        if APIConfig.SEARCH_BACKEND == "local":
+            results = await asyncio.to_thread(self._search_local, query_vector, collection_name, topk, output_fields,
+                                              search_filter)
+            return None if results is None else [to_record(result, collection_name) for result in results]
+
+        if search_filter is not None and not isinstance(search_filter, str):
+            search_filter = search_filter.to_dashvector()
+        payload = {"vector": [float(value) for value in query_vector], "topk": topk, "include_vector": False,
+                   "output_fields": output_fields}
+        if search_filter:
+            payload["filter"] = search_filter
+        base_url = self.endpoint if "://" in self.endpoint else f"https://{self.endpoint}"
+        url = f"{base_url}/v1/collections/{collection_name}/query"
+        try:
+            resp = await self._post("dashvector", url, {"dashvector-auth-token": self.dashvector_api_key}, payload,
+                                    _is_dashvector_throttled)
+        except ThrottledError:
+            log.warning("search_throttled", "向量检索持续被限流")
+            raise
+        except Exception as e:
+            log.error("search_failed", "执行向量检索失败: {error}", collection=collection_name, error=e)
+            return None
+
+        if resp.status_code != 200 or resp.code != 0:
+            log.error("search_failed", "执行向量检索失败: {error}", collection=collection_name, error=resp.message)
+            return None
+        return [
+            to_record(dict(doc.get("fields") or {}, id=doc.get("id"), score=doc.get("score")), collection_name)
+            for doc in resp.body.get("output") or []
+        ]
+
+    def local_client(self, collection_name):
+        """获取已加载指定集合的本地检索客户端（SEARCH_BACKEND为local时使用）
+
+        每次检索新建客户端，并发检索之间不切换collection；集合的内存映射在进程内共享，
+        快照被替换后下一次检索使用新版本（见local_search.load_local_collection）
+
+        Returns:
+            LocalSearchClient或None（如果加载集合失败）
+        """
+        from local_search import LocalSearchClient
+        client = LocalSearchClient(APIConfig.LOCAL_INDEX_DIR)
+        if not client.get_collection(collection_name):
+            return None
+        return client
+
+    def _search_local(self, query_vector, collection_name, topk, output_fields, search_filter):
+        """在线程中执行本地检索"""
+        client = self.local_client(collection_name)
+        if client is None:
+            return None
+        return client.search(query_vector, topk, output_fields, include_vector=False, search_filter=search_filter)
+
+    async def search_many(self, query_vectors, collection_name, topk=10, output_fields=None, search_filter=None):
+        """对同一个collection并发执行多次向量检索
+
+        Returns:
+            list: 与query_vectors顺序一致的结果列表，失败的查询对应None
+        """
+        return list(await asyncio.gather(*(
+            self.search(vector, collection_name, topk, output_fields, search_filter) for vector in query_vectors
+        )))
+
+    async def search_by_text(self, text, collection_name, topk=10, min_score=None, print_results=False):
+        """通过文本执行向量检索
+
+        Args:
+            text: 查询文本
+            collection_name: 集合名称
+            topk: 返回结果数量
+            min_score: 最小分数阈值
+            print_results: 是否打印结果
+
+        Returns:
+            检索结果列表或None（如果检索失败）
+        """
+        query_vector = await self.text_to_vector(text)
+        if not query_vector:
+            log.warning("search_embedding_failed", "文本转向量失败，无法执行检索")
+            return None
+
+        results = await self.search(query_vector, collection_name, topk)
+        if not results:
+            log.info("search_empty", "检索未返回结果")
+            return None
+        if min_score is not None:
+            results = ResultProcessor.filter_results_by_score(results, min_score)
+        if print_results:
+            ResultProcessor.print_results(results, APIConfig.get_output_fields(collection_name))
+        return results
+
+    async def query(self, query_text, collection_name, topk, search_filter=None):
+        """执行一次带缓存的向量检索，与_SearchSession.query共用检索缓存
+
+        Args:
+            query_text: 规范化后的查询文本
+            collection_name: 集合名称
+            topk: 返回结果数量
+            search_filter: 元数据过滤条件
+
+        Returns:
+            list: 结果记录列表，失败时返回None，无结果时返回空列表
+        """
+        cache_key = search_digest(collection_name, query_text, topk, search_filter)
+        results = _SEARCH_CACHE.get(cache_key)
+        if results is not None:
+            return results
+
+        async def run():
+            query_vector = (await self.cached_vectors([query_text]))[0]
+            if not query_vector:
+                log.warning("embedding_failed", "文本 '{query}' 向量转换失败，无法执行检索", query=query_text)
+                return None
+            results = await self.search(query_vector, collection_name, topk, search_filter=search_filter)
+            if results:
+                _SEARCH_CACHE.set(cache_key, results)
+            return results
+
+        return await self._single_flight(cache_key, run)
+
+    async def run_dimensions(self, inputs, config=None):
+        """执行一次评估全部维度的检索
+
+        全部查询文本先一次批量向量化，各检索再并发发出；筛选、数据集结果的词法融合和合并与同步路径相同
+
+        Args:
+            inputs: canonicalize_inputs返回的规范化输入
+            config: 配置快照，默认为current_config()
+
+        Returns:
+            tuple: (dimension_outputs, failed)
+                - dimension_outputs: 维度名称到(filtered_count, filtered_docs)的映射，失败的维度为(0, [])
+                - failed: 检索失败的维度列表（区别于没有结果）
+        """
+        config = config or current_config()
+        queries = [query for query in describe_dimension_queries(inputs, config) if query["dimension"] != "dataset"]
+        keywords = list(inputs["variables"])
+        keyword_results, lexical = await asyncio.to_thread(local_dataset_results, keywords, True, config)
+        vector_keywords = [keyword for keyword in keywords if keyword not in keyword_results]
+
+        await self.cached_vectors([query["query_text"] for query in queries] + vector_keywords)
+        dataset_filter = dimension_filter("dataset", config)
+        results = await asyncio.gather(
+            *(self.query(query["query_text"], query["collection"], query["topk"], query["search_filter"])
+              for query in queries),
+            *(self.query(keyword, config.collection("dataset"), config.topk("dataset"), dataset_filter)
+              for keyword in vector_keywords)
+        )
+
+        dimension_outputs = {}
+        failed = []
+        for query, query_results in zip(queries, results[:len(queries)]):
+            if query_results is None:
+                failed.append(query["dimension"])
+            filtered_results = ResultProcessor.filter_results_by_score(query_results or [], query["threshold"])
+            dimension_outputs[query["dimension"]] = (len(filtered_results), filtered_results)
+        for keyword, query_results in zip(vector_keywords, results[len(queries):]):
+            if query_results and lexical is not None:
+                query_results = fuse_lexical_scores(lexical, keyword, query_results, config)
+            keyword_results[keyword] = query_results
+        if any(query_results is None for query_results in results[len(queries):]):
+            # 与同步路径相同，任一关键词失败时整个数据集维度按失败处理
+            failed.append("dataset")
+            dimension_outputs["dataset"] = (0, [])
+        else:
+            dataset_count, dataset_results, keyword_counts = merge_dataset_results(keywords, keyword_results, config)
+            dimension_outputs["dataset"] = (dataset_count, dataset_results)
+        for dimension in failed:
+            log.warning("dimension_failed", "{dimension} 维度检索失败", dimension=dimension)
+        return {dimension: dimension_outputs[dimension] for dimension in EVALUATION_DIMENSIONS}, failed
+
+    async def calculate_research_score(self, paper_topic, variable_settings, empirical_model="", use_store=True):
+        """计算论文选题评估得分，与search_functions.calculate_research_score结果相同
+
+        Args:
+            paper_topic: 论文选题
+            variable_settings: 变量设置
+            empirical_model: 实证模型，默认为空字符串
+            use_store: 是否读写持久化的评估结果存储
+
+        Returns:
+            dict: 评估得分和分析结果
+        """
+        inputs = canonicalize_inputs(paper_topic, variable_settings, empirical_model)
+        config = current_config()
+        cache_key = evaluation_digest(inputs["paper_topic"], inputs["variable_settings"], inputs["empirical_model"])
+        memory_key = evaluation_cache_key(cache_key, search_config_hash(config))
+        cached = _EVALUATION_CACHE.get(memory_key)
+        if cached is not None:
+            log.info("evaluation_cache_hit", "命中评估结果缓存: {paper_topic}", paper_topic=inputs["paper_topic"])
+            return dict(cached)
+        result = await self._single_flight(memory_key, lambda: self._evaluate(inputs, cache_key, use_store, config))
+        return dict(result)
+
+    async def _evaluate(self, inputs, cache_key, use_store, config):
+        """查询评估结果存储，未命中时执行检索并计算得分"""
+        store = get_default_store() if use_store else None
+        collection_versions = config.collection_versions()
+        config_hash = search_config_hash(config)
+        memory_key = evaluation_cache_key(cache_key, config_hash)
+        if store is not None:
+            stored = await asyncio.to_thread(store.get, cache_key, collection_versions, config_hash)
+            if stored is not None:
+                log.info("evaluation_store_hit", "命中评估结果存储: {paper_topic}", paper_topic=inputs["paper_topic"])
+                _EVALUATION_CACHE.set(memory_key, stored)
+                return stored
+
+        prompts = load_prompts(config)
+        if not prompts:
+            log.error("prompts_failed", "加载评估提示词失败")
+            return {}
+
+        dimension_outputs, failed = await self.run_dimensions(inputs, config)
+        score_results = build_score_results(dimension_outputs)
+        if failed:
+            # 失败不是没有结果，不缓存也不保存，下次评估重新检索
+            log.warning("evaluation_not_cached", "{paper_topic} 有维度检索失败，评估结果不缓存",
+                        paper_topic=inputs["paper_topic"], dimensions=failed)
+            return score_results
+        _EVALUATION_CACHE.set(memory_key, score_results)
+        if store is not None:
+            try:
+                queries = _resolve_query_vectors(inputs, config)
+                await asyncio.to_thread(store.put, cache_key, inputs, score_results, collection_versions, config_hash)
+                await asyncio.to_thread(store.put_queries, cache_key, collection_versions, config_hash, queries)
+            except Exception as e:
+                log.error("evaluation_store_failed", "保存评估结果失败: {error}", error=e)
+        return score_results
+
+
+async def calculate_research_score_async(paper_topic, variable_settings, empirical_model="", use_store=True, engine=None):
+    """calculate_research_score的异步版本
+
+    Args:
+        paper_topic: 论文选题
+        variable_settings: 变量设置
+        empirical_model: 实证模型，默认为空字符串
+        use_store: 是否读写持久化的评估结果存储
+        engine: 共享的AsyncVectorSearchEngine，默认为本次调用新建（并发评估应共用一个引擎）
+
+    Returns:
+        dict: 评估得分和分析结果
+    """
+    if engine is not None:
+        return await engine.calculate_research_score(paper_topic, variable_settings, empirical_model, use_store)
+    async with AsyncVectorSearchEngine() as engine:
+        return await engine.calculate_research_score(paper_topic, variable_settings, empirical_model, use_store)
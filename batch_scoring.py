@@ -0,0 +1,122 @@
+"""检索分数和评估得分的批量（列式）计算
+
+ScoreBatch把多次检索的分数按行填充为(m, k)的float64矩阵（m为检索次数，k为最长结果数），
+阈值掩码、筛选计数和平均分都是对整个矩阵的一次数组运算；batch_dimension_scores用同一组公式
+（search_functions.compute_dimension_scores）对整批评估计算各项得分。
+
+与逐条处理的ResultProcessor.filter_results_by_score、calculate_average_score和build_score_results
+结果逐项相等：缺少score的结果按0处理，平均分按结果顺序逐列累加（与sum()的求和顺序相同），
+不使用NumPy的成对求和。
+
+评估路径中只有数据集关键词的筛选（ResultProcessor.filter_results_by_score_many）走列式计算。
+批量评估入口（result_transport.evaluate_in_processes、report_archive.archive_research_reports）
+在工作进程中逐次调用calculate_research_score，每次评估要单独命中缓存、写入存储并跳过检索失败的维度，
+而得分公式只有几十次标量运算，远小于一次检索的耗时，因此不改用batch_dimension_scores；
+它和batch_dimension_counts用于基准测试和对已有dimension_outputs的离线统计。
+"""
+from itertools import compress
+
+import numpy as np
+
+from search_functions import compute_dimension_scores
+
+
+class ScoreBatch:
+    """一批检索结果的分数矩阵"""
+
+    def __init__(self, scores, lengths):
+        """
+        Args:
+            scores: (m, k)的float64分数矩阵，超出每行结果数的位置为NaN
+            lengths: (m,)的每行结果数
+        """
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.valid = np.arange(self.scores.shape[1]) < self.lengths[:, None]
+
+    @classmethod
+    def from_results(cls, results_list):
+        """由多次检索的结果列表创建
+
+        Args:
+            results_list: 检索结果列表的列表，None视为没有结果
+
+        Returns:
+            ScoreBatch
+        """
+        results_list = [results or [] for results in results_list]
+        lengths = np.array([len(results) for results in results_list], dtype=np.int64)
+        flat = np.fromiter((result.get('score', 0) for results in results_list for result in results),
+                           dtype=np.float64, count=int(lengths.sum()))
+        batch = cls(np.full((len(results_list), int(lengths.max(initial=0))), np.nan), lengths)
+        # 掩码按行优先顺序展开，与flat中结果的顺序一致
+        batch.scores[batch.valid] = flat
+        return batch
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def threshold_mask(self, min_score):
+        """分数大于等于阈值的位置，min_score可以是标量或每行一个阈值的数组"""
+        min_score = np.asarray(min_score, dtype=np.float64)
+        if min_score.ndim:
+            min_score = min_score[:, None]
+        return self.valid & (self.scores >= min_score)
+
+    def counts(self, min_score):
+        """每行分数大于等于阈值的结果数"""
+        return self.threshold_mask(min_score).sum(axis=1)
+
+    def totals(self):
+        """每行分数之和，按列顺序累加"""
+        totals = np.zeros(len(self.lengths))
+        filled = np.where(self.valid, self.scores, 0.0)
+        for column in range(filled.shape[1]):
+            totals += filled[:, column]
+        return totals
+
+    def averages(self):
+        """每行平均分，没有结果的行为0.0"""
+        averages = np.zeros(len(self.lengths))
+        nonempty = self.lengths > 0
+        averages[nonempty] = self.totals()[nonempty] / self.lengths[nonempty]
+        return averages
+
+    def select(self, results_list, min_score):
+        """按阈值掩码筛选每行的结果，保持原顺序
+
+        Args:
+            results_list: 创建该批次时使用的结果列表
+            min_score: 分数阈值（标量或每行一个阈值的数组）
+
+        Returns:
+            list: 每行筛选后的结果列表
+        """
+        mask = self.threshold_mask(min_score).tolist()
+        return [list(compress(results, row_mask)) if results else [] for results, row_mask in zip(results_list, mask)]
+
+
+def batch_dimension_scores(dimension_counts):
+    """对一批评估计算各项数值得分
+
+    Args:
+        dimension_counts: 维度名称（journal、journal_model、dataset、cfp、skjj）到
+            每次评估筛选后记录数的序列（列表或整数数组）
+
+    Returns:
+        dict: 得分名称到(m,)数组的映射，常数得分也展开为数组，与build_score_results中的得分逐项相等
+    """
+    counts = {dimension: np.asarray(values, dtype=np.int64) for dimension, values in dimension_counts.items()}
+    size = len(counts["journal"])
+    scores = compute_dimension_scores(counts["journal"], counts["journal_model"], counts["dataset"], counts["cfp"],
+                                      counts["skjj"], minimum=np.minimum)
+    return {name: np.broadcast_to(np.asarray(value), (size,)).copy() for name, value in scores.items()}
+
+
+def batch_dimension_counts(dimension_outputs_list):
+    """从多次评估的dimension_outputs（见run_dimension）提取各维度的记录数"""
+    dimensions = ("journal", "journal_model", "dataset", "cfp", "skjj")
+    return {
+        dimension: np.array([outputs[dimension][0] for outputs in dimension_outputs_list], dtype=np.int64)
+        for dimension in dimensions
+    }
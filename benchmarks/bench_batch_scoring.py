@@ -0,0 +1,83 @@
+"""批量评分与逐条评分的耗时对比
+
+用法：
+    python benchmarks/bench_batch_scoring.py --queries 20000 --topk 60
+
+合成多次检索的结果列表和多次评估的各维度记录数，分别用ResultProcessor的逐条方法、
+build_score_results和batch_scoring的列式路径计算筛选结果、平均分和各项得分，
+校验两条路径结果逐项相等并输出耗时。由结果dict构建分数矩阵仍需逐条读取score，单独计时；
+分数已经以数组形式保存时（如多轮阈值调整）只需后面的数组运算。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_search_core import ResultProcessor
+from search_functions import SearchConfig, build_score_results
+from batch_scoring import ScoreBatch, batch_dimension_scores, batch_dimension_counts
+
+DIMENSIONS = ("journal", "journal_model", "dataset", "cfp", "skjj")
+
+
+def timed(function):
+    started = time.perf_counter()
+    value = function()
+    return time.perf_counter() - started, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量评分与逐条评分的耗时对比")
+    parser.add_argument("--queries", type=int, default=20000, help="检索次数（也是评估次数）")
+    parser.add_argument("--topk", type=int, default=SearchConfig.MAX_JOURNAL_RESULTS, help="每次检索的最大结果数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results_list = [[{"id": str(index), "score": rng.random()} for index in range(rng.randint(0, args.topk))]
+                    for _ in range(args.queries)]
+    threshold = SearchConfig.JOURNAL_MAX_SCORE
+    outputs_list = [{dimension: (rng.randint(0, args.topk), []) for dimension in DIMENSIONS}
+                    for _ in range(args.queries)]
+
+    rows = []
+    build_time, batch_scores = timed(lambda: ScoreBatch.from_results(results_list))
+    rows.append(("构建分数矩阵", None, build_time))
+
+    scalar_time, scalar = timed(lambda: [ResultProcessor.filter_results_by_score(results, threshold)
+                                         for results in results_list])
+    batch_time, batch = timed(lambda: ResultProcessor.filter_results_by_score_many(results_list, threshold))
+    assert scalar == batch
+    rows.append(("阈值筛选（含构建）", scalar_time, batch_time))
+
+    scalar_time, scalar = timed(lambda: [len(ResultProcessor.filter_results_by_score(results, threshold))
+                                         for results in results_list])
+    batch_time, batch = timed(lambda: batch_scores.counts(threshold).tolist())
+    assert scalar == batch
+    rows.append(("阈值计数", scalar_time, batch_time))
+
+    scalar_time, scalar = timed(lambda: [ResultProcessor.calculate_average_score(results) for results in results_list])
+    batch_time, batch = timed(lambda: batch_scores.averages().tolist())
+    assert scalar == batch
+    rows.append(("平均分", scalar_time, batch_time))
+
+    scalar_time, scalar = timed(lambda: [build_score_results(outputs) for outputs in outputs_list])
+    batch_time, batch = timed(lambda: batch_dimension_scores(batch_dimension_counts(outputs_list)))
+    for name, values in batch.items():
+        assert [result[name] for result in scalar] == values.tolist(), name
+    rows.append(("维度得分", scalar_time, batch_time))
+
+    print(f"{args.queries} 次检索/评估，每次最多 {args.topk} 条结果（两条路径结果一致）")
+    print(f"{'计算':<12}{'逐条 ms':>12}{'批量 ms':>12}{'加速比':>10}")
+    for name, scalar_time, batch_time in rows:
+        if scalar_time is None:
+            print(f"{name:<12}{'-':>12}{batch_time * 1000:>12.1f}{'-':>10}")
+        else:
+            print(f"{name:<12}{scalar_time * 1000:>12.1f}{batch_time * 1000:>12.1f}{scalar_time / batch_time:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
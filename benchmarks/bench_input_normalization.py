@@ -0,0 +1,191 @@
+"""输入规范化对缓存命中率的影响基准
+
+用法：
+    python benchmarks/bench_input_normalization.py --log requests.jsonl
+    python benchmarks/bench_input_normalization.py --synthetic 5000
+
+日志为JSONL格式，每行至少包含paper_topic，可选variable_settings和empirical_model。
+未提供日志时，按线上常见的书写差异（中英文分隔符混用、全角字符、首尾空格、
+重复变量、变量顺序不同）合成输入分布。
+
+分别统计原始输入作为缓存键和规范化输入作为缓存键时，
+embedding、检索和评估三层缓存的命中率。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_search_core import APIConfig, LRUCache
+from search_functions import (
+    canonicalize_inputs, embedding_digest, search_digest, evaluation_digest,
+    _model_query_text, _digest, SearchConfig
+)
+
+# 合成输入使用的基础选题
+SEED_INPUTS = [
+    ("新质生产力对碳排放的影响路经分析", "新质生产力、碳排放、教育发展水平、经济发展水平、外商投资水平、产业聚集度、城镇化水平", "空间计量模型"),
+    ("企业人工智能水平对数字化转型的影响分析", "人工智能、数字化转型、人工智能创新发展试验区、净资产收益率、托宾Q、企业规模、研发强度、股权集中度", "双重差分模型"),
+    ("新质生产力对碳排放的影响路径", "新质生产力、碳排放、数字化转型、地区教育水平、地区金融发展水平、地区产业聚集水平", "空间计量模型"),
+    ("数字金融对农村居民消费的影响", "数字金融、农村居民消费、经济发展水平、城镇化水平、产业结构", "面板固定效应模型"),
+    ("环境规制对绿色技术创新的影响", "环境规制、绿色技术创新、外商投资水平、经济发展水平、研发投入", "门槛回归模型"),
+    ("碳排放权交易对企业绿色创新的影响", "碳排放权交易、绿色创新、企业规模、资产负债率、托宾Q", "双重差分模型"),
+]
+
+_SEPARATORS = ["、", "，", ",", "；", ";", "、 ", " , "]
+_FULLWIDTH = str.maketrans({chr(c): chr(c + 0xFEE0) for c in range(0x21, 0x7F)})
+
+
+def _perturb(paper_topic, variable_settings, empirical_model, rng):
+    """按真实输入中常见的书写差异扰动一条输入"""
+    variables = [v for v in variable_settings.split("、") if v]
+    if rng.random() < 0.5:
+        rng.shuffle(variables)
+    if rng.random() < 0.3:
+        variables.append(rng.choice(variables))
+    if rng.random() < 0.3:
+        variables = [v.translate(_FULLWIDTH) for v in variables]
+    variable_text = rng.choice(_SEPARATORS).join(variables)
+    if rng.random() < 0.3:
+        variable_text += rng.choice(["", " ", "、", "\n"])
+    if rng.random() < 0.3:
+        paper_topic = paper_topic + rng.choice([" ", "  ", "　"])
+    if rng.random() < 0.2:
+        empirical_model = " " + empirical_model.translate(_FULLWIDTH)
+    return paper_topic, variable_text, empirical_model
+
+
+def load_inputs(log_path=None, synthetic=2000, seed=7):
+    """读取日志或合成输入
+
+    Args:
+        log_path: JSONL日志路径
+        synthetic: 未提供日志时合成的输入数量
+        seed: 随机种子
+
+    Returns:
+        list: (paper_topic, variable_settings, empirical_model)元组列表
+    """
+    if log_path:
+        inputs = []
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if not record.get("paper_topic"):
+                    continue
+                inputs.append((record["paper_topic"], record.get("variable_settings", ""), record.get("empirical_model", "")))
+        return inputs
+
+    rng = random.Random(seed)
+    # 选题热度近似长尾分布
+    weights = [1.0 / (rank + 1) for rank in range(len(SEED_INPUTS))]
+    return [_perturb(*rng.choices(SEED_INPUTS, weights)[0], rng) for _ in range(synthetic)]
+
+
+def _raw_keys(paper_topic, variable_settings, empirical_model):
+    """规范化之前的缓存键：直接使用原始文本，变量按"、"拆分
+
+    Returns:
+        tuple: (searches, evaluation_key)，searches为(检索缓存键, embedding缓存键)列表
+    """
+    query_text = f"{paper_topic}；{empirical_model}" if empirical_model else paper_topic
+    model_text = f"{paper_topic}；{empirical_model}"
+    variables = [kw.strip() for kw in variable_settings.split("、") if kw.strip()]
+    queries = [
+        (APIConfig.JOURNAL_COLLECTION, query_text),
+        (APIConfig.JOURNAL_COLLECTION, model_text),
+        (APIConfig.CFP_COLLECTION, paper_topic),
+        (APIConfig.SKJJ_COLLECTION, paper_topic),
+    ] + [(APIConfig.DATASET_COLLECTION, v) for v in variables]
+    searches = [(_digest("raw-search", collection, text), _digest("raw-embedding", text)) for collection, text in queries]
+    evaluation_key = _digest("raw-evaluation", paper_topic, variable_settings, empirical_model)
+    return searches, evaluation_key
+
+
+def _canonical_keys(paper_topic, variable_settings, empirical_model):
+    """规范化之后的缓存键，与search_functions中的实际缓存键一致"""
+    inputs = canonicalize_inputs(paper_topic, variable_settings, empirical_model)
+    topic = inputs["paper_topic"]
+    query_text = _model_query_text(topic, inputs["empirical_model"])
+    model_text = f"{topic}；{inputs['empirical_model']}"
+    queries = [
+        (APIConfig.JOURNAL_COLLECTION, query_text, SearchConfig.MAX_JOURNAL_RESULTS),
+        (APIConfig.JOURNAL_COLLECTION, model_text, SearchConfig.MAX_JOURNAL_RESULTS),
+        (APIConfig.CFP_COLLECTION, topic, SearchConfig.MAX_CFP_RESULTS),
+        (APIConfig.SKJJ_COLLECTION, topic, SearchConfig.MAX_SKJJ_RESULTS),
+    ] + [(APIConfig.DATASET_COLLECTION, v, SearchConfig.MAX_DATASET_RESULTS) for v in inputs["variables"]]
+    searches = [(search_digest(collection, text, topk), embedding_digest(text)) for collection, text, topk in queries]
+    evaluation_key = evaluation_digest(topic, inputs["variable_settings"], inputs["empirical_model"])
+    return searches, evaluation_key
+
+
+def simulate(inputs, key_func, cache_size):
+    """按给定的缓存键函数回放输入，返回三层缓存各自的命中统计和耗时
+
+    三层缓存分别独立回放全部访问，命中率互不影响；
+    另外按实际调用链（评估缓存命中时不访问下层）统计需要发往后端的调用次数。
+    """
+    layers = {name: LRUCache(cache_size) for name in ("evaluation", "search", "embedding")}
+    chained = {name: LRUCache(cache_size) for name in ("evaluation", "search", "embedding")}
+
+    def lookup(cache, key):
+        if cache.get(key) is None:
+            cache.set(key, True)
+            return False
+        return True
+
+    backend_calls = 0
+    started = time.perf_counter()
+    for item in inputs:
+        searches, evaluation_key = key_func(*item)
+        lookup(layers["evaluation"], evaluation_key)
+        for search_key, embedding_key in searches:
+            lookup(layers["search"], search_key)
+            lookup(layers["embedding"], embedding_key)
+
+        if lookup(chained["evaluation"], evaluation_key):
+            continue
+        for search_key, embedding_key in searches:
+            if lookup(chained["search"], search_key):
+                continue
+            backend_calls += 1
+            if not lookup(chained["embedding"], embedding_key):
+                backend_calls += 1
+    elapsed = time.perf_counter() - started
+    stats = {name: cache.stats() for name, cache in layers.items()}
+    return stats, backend_calls, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="输入规范化缓存命中率基准")
+    parser.add_argument("--log", help="历史请求JSONL日志路径")
+    parser.add_argument("--synthetic", type=int, default=2000, help="未提供日志时合成的输入数量")
+    parser.add_argument("--cache-size", type=int, default=4096, help="每层缓存的容量")
+    args = parser.parse_args()
+
+    inputs = load_inputs(args.log, args.synthetic)
+    print(f"输入数量: {len(inputs)}（{'日志: ' + args.log if args.log else '合成分布'}）")
+
+    raw_stats, raw_calls, raw_elapsed = simulate(inputs, _raw_keys, args.cache_size)
+    canonical_stats, canonical_calls, canonical_elapsed = simulate(inputs, _canonical_keys, args.cache_size)
+
+    print(f"\n{'缓存':<12}{'原始键命中率':>14}{'规范化键命中率':>16}{'提升':>10}")
+    for name in ("evaluation", "search", "embedding"):
+        raw_rate = raw_stats[name]["hit_rate"]
+        canonical_rate = canonical_stats[name]["hit_rate"]
+        print(f"{name:<12}{raw_rate:>14.2%}{canonical_rate:>16.2%}{canonical_rate - raw_rate:>+10.2%}")
+
+    print(f"\n后端调用次数（embedding + 检索）: 原始 {raw_calls}, 规范化 {canonical_calls}, "
+          f"减少 {1 - canonical_calls / raw_calls if raw_calls else 0:.2%}")
+    print(f"计算缓存键耗时: 原始 {raw_elapsed * 1e6 / len(inputs):.1f}µs/条, "
+          f"规范化 {canonical_elapsed * 1e6 / len(inputs):.1f}µs/条")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""本地向量化后端吞吐基准
+
+用法：
+    python benchmarks/bench_local_embedding.py --texts 50000 --dimension 512
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_backends import HashedNgramEmbedding
+
+WORDS = ["新质生产力", "碳排放", "数字化转型", "城镇化水平", "外商投资", "产业聚集度", "绿色创新",
+         "环境规制", "数字金融", "农村居民消费", "人工智能", "企业规模", "研发强度", "影响路径", "空间溢出"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地向量化后端吞吐基准")
+    parser.add_argument("--texts", type=int, default=50000, help="文本数量")
+    parser.add_argument("--dimension", type=int, default=512, help="向量维度")
+    parser.add_argument("--batch-size", type=int, default=8192, help="批大小")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = ["".join(rng.choices(WORDS, k=rng.randint(2, 5))) for _ in range(args.texts)]
+    embedder = HashedNgramEmbedding(args.dimension).fit(texts[:10000])
+
+    # 冷启动（n-gram哈希缓存为空）和热启动分别计时
+    for label in ("冷启动", "热启动"):
+        started = time.perf_counter()
+        for start in range(0, len(texts), args.batch_size):
+            embedder.embed_batch(texts[start:start + args.batch_size])
+        elapsed = time.perf_counter() - started
+        print(f"{label}: {len(texts)} 条文本 {elapsed:.2f}s，{len(texts) / elapsed:,.0f} 条/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""检索结果记录的内存占用基准
+
+用法：
+    python benchmarks/bench_record_memory.py --results 200000
+
+为每个集合合成检索结果：先按DashVector返回的JSON逐条解析为dict（重复的期刊名、等级等字符串
+各自是独立对象，与实际一致），再转换为result_records中的紧凑记录，
+用tracemalloc分别测量两种表示每条结果占用的字节数。
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_search_core import APIConfig
+from result_records import to_record
+
+WORDS = ["数字经济", "碳排放", "城镇化", "产业结构", "绿色创新", "金融发展", "环境规制", "人力资本", "对外开放",
+         "技术进步", "全要素生产率", "乡村振兴", "共同富裕", "营商环境", "创新驱动", "高质量发展"]
+JOURNALS = [f"期刊{index:02d}" for index in range(60)]
+LEVELS = ["CSSCI", "北大核心", "CSCD", "普通期刊"]
+INDICATORS = [f"指标{index:03d}" for index in range(400)]
+
+
+def _text(rng, words):
+    return "".join(rng.choice(WORDS) for _ in range(words))
+
+
+def synthetic_result(collection, rng, index):
+    """按集合的输出字段合成一条检索结果（JSON字符串）"""
+    record = {"id": f"{collection}-{index}", "score": rng.random()}
+    if collection == APIConfig.JOURNAL_COLLECTION:
+        record.update(title=_text(rng, 4), source=rng.choice(JOURNALS), keywords=[rng.choice(WORDS) for _ in range(4)],
+                      descs=_text(rng, 30), publication_date=f"20{rng.randint(10, 24)}-0{rng.randint(1, 9)}",
+                      url=f"https://example.org/journal/{index}", journallevel=rng.choice(LEVELS))
+    elif collection == APIConfig.CFP_COLLECTION:
+        record.update(journal_name=rng.choice(JOURNALS), hot_topics=_text(rng, 6), call_for_papers_title=_text(rng, 3),
+                      url=f"https://example.org/cfp/{index}")
+    elif collection == APIConfig.DATASET_COLLECTION:
+        record.update(name=_text(rng, 2) + "数据", indicators=rng.sample(INDICATORS, 12),
+                      year_start=rng.randint(1990, 2010), year_end=rng.randint(2015, 2024),
+                      url=f"https://example.org/dataset/{index}")
+    else:
+        record.update(topic_name=_text(rng, 5))
+    return json.dumps(record, ensure_ascii=False)
+
+
+def measure(build):
+    """返回build()构造的对象占用的字节数（tracemalloc统计）和对象本身"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检索结果记录的内存占用基准")
+    parser.add_argument("--results", type=int, default=100000, help="每个集合的结果数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    collections = [APIConfig.JOURNAL_COLLECTION, APIConfig.CFP_COLLECTION, APIConfig.DATASET_COLLECTION,
+                   APIConfig.SKJJ_COLLECTION]
+    print(f"每个集合 {args.results} 条结果")
+    print(f"{'集合':<14}{'dict 字节/条':>14}{'记录 字节/条':>14}{'节省':>10}")
+    for collection in collections:
+        rng = random.Random(args.seed)
+        payloads = [synthetic_result(collection, rng, index) for index in range(args.results)]
+        dict_bytes, dicts = measure(lambda: [json.loads(payload) for payload in payloads])
+        del dicts
+        record_bytes, records = measure(lambda: [to_record(json.loads(payload), collection) for payload in payloads])
+        del records
+        print(f"{collection:<14}{dict_bytes / args.results:>14.0f}{record_bytes / args.results:>14.0f}"
+              f"{1 - record_bytes / dict_bytes:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""批量报告输出：逐个Markdown文件与压缩归档的对比
+
+用法：
+    python benchmarks/bench_report_archive.py --reports 5000
+    python benchmarks/bench_report_archive.py --reports 20000 --distinct 500 --directory /data/tmp
+
+按线上评估结果的规模合成评估结果（见bench_result_transport.synthetic_result），渲染报告后分别：
+
+    1. 逐个写入Markdown文件（write_report），另存一份得分JSON
+    2. 按批写入ReportArchive（报告和得分JSON压缩后追加到段文件，SQLite索引）
+
+对比写入耗时、占用的文件数和磁盘空间（按分配的块计算），以及随机读取一个报告、
+批量导出全部报告（读取全部文件 / 按存储顺序读取归档）的耗时。
+--distinct小于--reports时合成结果循环使用，只改变选题，以缩短合成时间。
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_result_transport import synthetic_result
+from report_archive import ReportArchive
+from report_generator import render_research_report, write_report
+from result_store import EvaluationStore
+from search_functions import evaluation_digest
+
+
+def disk_usage(directory):
+    """目录下的文件数和分配的磁盘空间（字节）"""
+    files = 0
+    allocated = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            files += 1
+            allocated += os.stat(os.path.join(root, name)).st_blocks * 512
+    return files, allocated
+
+
+def timed(function):
+    started = time.perf_counter()
+    value = function()
+    return time.perf_counter() - started, value
+
+
+def write_files(entries, directory):
+    with redirect_stdout(StringIO()):
+        for paper_topic, variable_settings, empirical_model, report_content, score_results in entries:
+            digest = evaluation_digest(paper_topic, variable_settings, empirical_model)
+            path = write_report(report_content, os.path.join(directory, f"{digest[:16]}.md"))
+            with open(os.path.splitext(path)[0] + ".json", "w", encoding="utf-8") as f:
+                json.dump(EvaluationStore.serialize_result(score_results), f, ensure_ascii=False)
+
+
+def write_archive(entries, directory, batch_size):
+    with ReportArchive(directory) as archive:
+        for start in range(0, len(entries), batch_size):
+            archive.append_many(entries[start:start + batch_size])
+
+
+def read_files(directory):
+    contents = []
+    for name in os.listdir(directory):
+        if name.endswith(".md"):
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                contents.append(f.read())
+    return contents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量报告输出：逐个Markdown文件与压缩归档的对比")
+    parser.add_argument("--reports", type=int, default=5000, help="报告数")
+    parser.add_argument("--distinct", type=int, default=200, help="合成的不同评估结果数")
+    parser.add_argument("--batch-size", type=int, default=64, help="归档每个索引事务写入的报告数")
+    parser.add_argument("--reads", type=int, default=1000, help="随机读取次数")
+    parser.add_argument("--directory", help="临时目录所在位置，默认为系统临时目录")
+    args = parser.parse_args()
+
+    results = [synthetic_result(seed) for seed in range(min(args.distinct, args.reports))]
+    entries = []
+    for index in range(args.reports):
+        paper_topic = f"选题{index}"
+        score_results = results[index % len(results)]
+        entries.append((paper_topic, "数字经济、碳排放", "双重差分模型",
+                        render_research_report(paper_topic, score_results), score_results))
+    digests = [evaluation_digest(*entry[:3]) for entry in entries]
+    sample = random.Random(0).choices(digests, k=args.reads)
+
+    workdir = tempfile.mkdtemp(prefix="bench-report-archive-", dir=args.directory)
+    try:
+        files_dir = os.path.join(workdir, "files")
+        archive_dir = os.path.join(workdir, "archive")
+        os.makedirs(files_dir)
+
+        files_write, _ = timed(lambda: write_files(entries, files_dir))
+        archive_write, _ = timed(lambda: write_archive(entries, archive_dir, args.batch_size))
+        files_count, files_bytes = disk_usage(files_dir)
+        archive_count, archive_bytes = disk_usage(archive_dir)
+
+        def read_file(digest):
+            with open(os.path.join(files_dir, f"{digest[:16]}.md"), "r", encoding="utf-8") as f:
+                return f.read()
+
+        with ReportArchive(archive_dir) as archive:
+            files_read, file_reports = timed(lambda: [read_file(digest) for digest in sample])
+            archive_read, archive_reports = timed(lambda: [archive.read_report(digest) for digest in sample])
+            assert file_reports == archive_reports
+            files_export, exported = timed(lambda: read_files(files_dir))
+            archive_export, archived = timed(lambda: [entry.report for entry in archive.iter_reports()])
+            assert sorted(exported) == sorted(archived)
+
+        print(f"{args.reports} 个报告（含得分JSON），两种方式读取的内容一致")
+        print(f"{'':<10}{'写入 s':>10}{'文件数':>10}{'磁盘 MB':>10}{'随机读取 ms':>14}{'导出全部报告 s':>18}")
+        print(f"{'逐个文件':<6}{files_write:>10.2f}{files_count:>10}{files_bytes / 2 ** 20:>10.1f}"
+              f"{files_read * 1000 / args.reads:>14.3f}{files_export:>18.2f}")
+        print(f"{'归档':<8}{archive_write:>10.2f}{archive_count:>10}{archive_bytes / 2 ** 20:>10.1f}"
+              f"{archive_read * 1000 / args.reads:>14.3f}{archive_export:>18.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
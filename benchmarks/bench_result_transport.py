@@ -0,0 +1,165 @@
+"""进程池结果传输：pickle与共享内存段文件的对比
+
+用法：
+    python benchmarks/bench_result_transport.py --results 2000 --processes 4
+    python benchmarks/bench_result_transport.py --results 500 --vector-dim 1024
+
+按线上评估结果的规模合成评估结果（期刊和实证模型文献各60条含摘要、数据集30条含指标、征稿启事20条、
+社科基金项目15条），分两部分对比：
+
+    1. 单进程：工作进程一侧的序列化（pickle.dumps / pack_results）和父进程一侧的反序列化
+       （pickle.loads / open_results）耗时及传输字节数，以及父进程渲染报告、转换为存储格式
+       （读取全部字段）各自的耗时
+    2. 进程池：工作进程生成结果后分别以两种方式返回，父进程渲染报告并转换为存储格式
+       （--render-only时只渲染报告），统计总耗时和父进程CPU时间
+
+共享内存方式下父进程打开段文件几乎没有开销，只渲染报告时摘要等长文本不会被解码；
+转换为存储格式需要读取全部字段，整列解码的开销与pickle反序列化相当。
+
+--vector-dim大于0时期刊记录附带该维度的向量。
+"""
+import argparse
+import concurrent.futures
+import os
+import pickle
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_records import JournalDoc, CfpDoc, DatasetDoc, SkjjDoc
+from result_store import EvaluationStore
+from result_transport import pack_results, open_results
+from report_generator import render_research_report
+from search_functions import build_score_results
+
+SOURCES = ["经济研究", "管理世界", "中国工业经济", "金融研究", "数量经济技术经济研究", "中国软科学"]
+LEVELS = ["CSSCI", "北大核心", "AMI核心"]
+WORDS = ["数字经济", "碳排放", "绿色创新", "产业结构", "空间溢出", "门槛效应", "异质性", "城镇化", "金融发展",
+         "环境规制", "技术进步", "全要素生产率", "区域差异", "政策评估", "中介效应", "面板数据"]
+
+
+def _text(rng, length):
+    return "".join(rng.choice(WORDS) for _ in range(length))
+
+
+def _journal_docs(rng, count, vector_dim):
+    docs = []
+    for index in range(count):
+        doc = JournalDoc(id=f"j{rng.randrange(10 ** 8)}", score=rng.random(), title=_text(rng, 8),
+                         source=rng.choice(SOURCES), keywords=[rng.choice(WORDS) for _ in range(5)],
+                         descs=_text(rng, 100), publication_date=f"20{rng.randint(10, 24)}-0{rng.randint(1, 9)}",
+                         url=f"https://example.com/journal/{index}", journallevel=rng.choice(LEVELS))
+        if vector_dim:
+            doc["vector"] = [rng.random() for _ in range(vector_dim)]
+        docs.append(doc)
+    return docs
+
+
+def synthetic_result(seed, vector_dim=0):
+    """合成一个评估结果"""
+    rng = random.Random(seed)
+    outputs = {
+        "journal": (60, _journal_docs(rng, 60, vector_dim)),
+        "journal_model": (60, _journal_docs(rng, 60, vector_dim)),
+        "dataset": (30, [DatasetDoc(id=f"d{index}", score=rng.random(), name=_text(rng, 4),
+                                    indicators=[rng.choice(WORDS) for _ in range(10)], year_start=rng.randint(1990, 2015),
+                                    year_end=rng.randint(2016, 2024), url=f"https://example.com/dataset/{index}")
+                         for index in range(30)]),
+        "cfp": (20, [CfpDoc(id=f"c{index}", score=rng.random(), journal_name=rng.choice(SOURCES),
+                            hot_topics=_text(rng, 20), call_for_papers_title=_text(rng, 6),
+                            url=f"https://example.com/cfp/{index}") for index in range(20)]),
+        "skjj": (15, [SkjjDoc(id=f"s{index}", score=rng.random(), topic_name=_text(rng, 6)) for index in range(15)]),
+    }
+    return build_score_results(outputs)
+
+
+def render(results):
+    """渲染报告（只读取每类文献的前几条）"""
+    return [render_research_report(f"选题{index}", score_results) for index, score_results in enumerate(results)]
+
+
+def serialize(results):
+    """转换为存储格式（读取全部字段）"""
+    return [EvaluationStore.serialize_result(score_results) for score_results in results]
+
+
+def consume(results, render_only=False):
+    """父进程对评估结果的处理：渲染报告并转换为存储格式"""
+    render(results)
+    if not render_only:
+        serialize(results)
+
+
+def _worker(seeds, vector_dim, transport):
+    results = [synthetic_result(seed, vector_dim) for seed in seeds]
+    return pack_results(results) if transport == "shared" else results
+
+
+def run_pool(seeds, args, transport):
+    """进程池中生成结果并返回父进程处理，返回(总耗时, 父进程CPU时间)
+
+    父进程CPU时间包含执行器线程中的反序列化
+    """
+    chunks = [seeds[start:start + args.chunk_size] for start in range(0, len(seeds), args.chunk_size)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.processes) as executor:
+        # 先启动全部工作进程，不计入耗时
+        list(executor.map(abs, range(args.processes)))
+        started = time.perf_counter()
+        started_cpu = time.process_time()
+        for value in executor.map(_worker, chunks, [args.vector_dim] * len(chunks), [transport] * len(chunks)):
+            consume(open_results(value) if transport == "shared" else value, args.render_only)
+        return time.perf_counter() - started, time.process_time() - started_cpu
+
+
+def timed(function):
+    started = time.perf_counter()
+    value = function()
+    return time.perf_counter() - started, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="进程池结果传输：pickle与共享内存段文件的对比")
+    parser.add_argument("--results", type=int, default=2000, help="评估结果数")
+    parser.add_argument("--chunk-size", type=int, default=8, help="每个任务的评估结果数（一个段文件）")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="工作进程数")
+    parser.add_argument("--vector-dim", type=int, default=0, help="期刊记录附带的向量维度，0表示不附带")
+    parser.add_argument("--render-only", action="store_true", help="进程池部分父进程只渲染报告")
+    args = parser.parse_args()
+
+    seeds = list(range(args.results))
+    sample = [synthetic_result(seed, args.vector_dim) for seed in seeds[:min(len(seeds), 256)]]
+    chunks = [sample[start:start + args.chunk_size] for start in range(0, len(sample), args.chunk_size)]
+
+    dumps_time, pickled = timed(lambda: [pickle.dumps(chunk, protocol=pickle.HIGHEST_PROTOCOL) for chunk in chunks])
+    loads_time, unpickled = timed(lambda: [result for blob in pickled for result in pickle.loads(blob)])
+    pack_time, handles = timed(lambda: [pack_results(chunk) for chunk in chunks])
+    handle_bytes = sum(len(pickle.dumps(handle, protocol=pickle.HIGHEST_PROTOCOL)) for handle in handles)
+    segment_bytes = sum(handle.size for handle in handles)
+    open_time, views = timed(lambda: [result for handle in handles for result in open_results(handle)])
+    render_pickle, pickle_reports = timed(lambda: render(unpickled))
+    render_shared, shared_reports = timed(lambda: render(views))
+    serialize_pickle, pickle_stored = timed(lambda: serialize(unpickled))
+    serialize_shared, shared_stored = timed(lambda: serialize(views))
+    assert pickle_reports == shared_reports and pickle_stored == shared_stored
+
+    count = len(sample)
+    print(f"单进程（{count} 个评估结果，每个段文件 {args.chunk_size} 个，两种方式结果一致）")
+    print(f"{'':<14}{'工作进程 ms':>12}{'父进程 ms':>12}{'渲染 ms':>10}{'存储格式 ms':>12}"
+          f"{'管道传输 KB':>14}{'段文件 KB':>12}")
+    print(f"{'pickle':<14}{dumps_time * 1000:>12.1f}{loads_time * 1000:>12.1f}{render_pickle * 1000:>10.1f}"
+          f"{serialize_pickle * 1000:>12.1f}{sum(len(blob) for blob in pickled) / 1024:>14.0f}{'-':>12}")
+    print(f"{'共享内存':<12}{pack_time * 1000:>12.1f}{open_time * 1000:>12.1f}{render_shared * 1000:>10.1f}"
+          f"{serialize_shared * 1000:>12.1f}{handle_bytes / 1024:>14.0f}{segment_bytes / 1024:>12.0f}")
+
+    print(f"\n进程池（{args.results} 个评估结果，{args.processes} 个工作进程，"
+          f"父进程{'只渲染报告' if args.render_only else '渲染报告并转换为存储格式'}）")
+    print(f"{'':<14}{'总耗时 s':>10}{'父进程CPU s':>14}")
+    for transport, name in (("pickle", "pickle        "), ("shared", "共享内存      ")):
+        elapsed, cpu = run_pool(seeds, args, transport)
+        print(f"{name[:14 - (4 if transport == 'shared' else 0)]}{elapsed:>10.2f}{cpu:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""本地分片并行检索的扩展性基准
+
+用法：
+    OPENBLAS_NUM_THREADS=1 python benchmarks/bench_sharded_search.py --rows 1000000 --dimension 1024
+    OPENBLAS_NUM_THREADS=1 python benchmarks/bench_sharded_search.py --shards 1 8 16 32 --dtype int8
+
+在临时目录生成合成快照，按不同分片数测量单查询延迟和吞吐，并核对结果与不分片时一致；
+最后比较逐条检索与search_top_k_many批量检索（一次矩阵-矩阵乘法）的吞吐。
+BLAS库自身的多线程会与分片线程争抢核心，测量时应将其线程数设为1。
+矩阵-向量乘法受内存带宽限制，float16/int8存储读取的字节更少，多核下扩展性更好。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_search_core import APIConfig
+from collection_snapshot import LocalCollection, write_snapshot
+from local_search import search_top_k, search_top_k_many
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地分片并行检索基准")
+    parser.add_argument("--rows", type=int, default=500000, help="向量数量")
+    parser.add_argument("--dimension", type=int, default=1024, help="向量维度")
+    parser.add_argument("--dtype", default="float32", help="向量存储类型")
+    parser.add_argument("--shards", type=int, nargs="+", help="待测分片数，默认为1到CPU核数的2的幂")
+    parser.add_argument("--queries", type=int, default=50, help="每个分片数下的查询次数")
+    parser.add_argument("--topk", type=int, default=60, help="检索数量")
+    parser.add_argument("--batch", type=int, default=16, help="批量检索每批的查询数")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    shard_counts = args.shards or sorted({min(cpus, 2 ** power) for power in range(cpus.bit_length() + 1)})
+    APIConfig.LOCAL_SHARD_MIN_ROWS = 1
+
+    directory = tempfile.mkdtemp(prefix="bench_sharded_")
+    try:
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((args.rows, args.dimension), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        write_snapshot(os.path.join(directory, "bench"), "bench", [str(i) for i in range(args.rows)], vectors,
+                       [{} for _ in range(args.rows)], args.dtype)
+        del vectors
+        collection = LocalCollection(os.path.join(directory, "bench"))
+        queries = rng.standard_normal((args.queries, args.dimension), dtype=np.float32)
+
+        # 预热页缓存，并以不分片的结果为基准
+        expected = [search_top_k(collection, query, args.topk, shards=1)[0] for query in queries]
+        print(f"{args.rows} 条 x {args.dimension} 维 {args.dtype}，CPU核数 {cpus}")
+        print(f"{'分片数':<8}{'ms/查询':>10}{'查询/秒':>10}{'加速比':>10}{'结果一致':>10}")
+        baseline = None
+        for shards in shard_counts:
+            started = time.perf_counter()
+            results = [search_top_k(collection, query, args.topk, shards=shards)[0] for query in queries]
+            elapsed = (time.perf_counter() - started) / len(queries)
+            baseline = baseline or elapsed
+            same = all(set(a.tolist()) == set(b.tolist()) for a, b in zip(results, expected))
+            print(f"{shards:<8}{elapsed * 1000:>10.2f}{1 / elapsed:>10.1f}{baseline / elapsed:>10.2f}{str(same):>10}")
+
+        started = time.perf_counter()
+        batched = []
+        for start in range(0, len(queries), args.batch):
+            batched += [top for top, _ in search_top_k_many(collection, queries[start:start + args.batch], args.topk)]
+        elapsed = (time.perf_counter() - started) / len(queries)
+        same = all(set(a.tolist()) == set(b.tolist()) for a, b in zip(batched, expected))
+        print(f"批量检索（每批 {args.batch} 条）: {elapsed * 1000:.2f} ms/查询，{1 / elapsed:.1f} 查询/秒，结果一致: {same}")
+        del collection
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
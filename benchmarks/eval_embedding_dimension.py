@@ -0,0 +1,157 @@
+"""向量维度对评估结果的影响评估
+
+用法：
+    python benchmarks/eval_embedding_dimension.py --dimensions 1024 512 256 --index-dir "local_index_d{dimension}"
+    python benchmarks/eval_embedding_dimension.py --log requests.jsonl --dimensions 1024 768 512 --index-dir "local_index_d{dimension}"
+
+每个维度需要一份按该维度构建的本地索引（见local_search.py --backend dashscope --dimension）。
+--index-dir中的{dimension}会替换为具体维度；省略--index-dir时使用当前配置的检索后端，
+此时DashVector集合只能检索默认维度。
+
+第一个维度作为基准，统计其余维度下各维度筛选后记录数和calculate_research_score
+各项得分相对基准的偏移，用于选择报告保持稳定的最小维度。
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_search_core import APIConfig
+from search_functions import (
+    canonicalize_inputs, run_dimension, build_score_results, EVALUATION_DIMENSIONS, SearchConfig
+)
+from bench_input_normalization import SEED_INPUTS, load_inputs
+
+# 由检索结果数量决定的得分，其余得分为常数
+COUNT_SCORES = [
+    "skjj_score", "cfp_reference_score", "research_perspective_score",
+    "model_innovation_score", "data_availability_score", "total_score"
+]
+
+
+def configure_dimension(dimension, index_dir_template=None):
+    """切换到指定维度的向量化配置和本地索引
+
+    各级缓存的键包含向量化模型标识，不同维度的向量和检索结果不会混用
+
+    Args:
+        dimension: 向量维度
+        index_dir_template: 本地索引目录模板，包含{dimension}占位符
+    """
+    APIConfig.EMBEDDING_DIMENSION = dimension
+    APIConfig.LOCAL_EMBEDDING_DIMENSION = dimension
+    if index_dir_template:
+        APIConfig.SEARCH_BACKEND = "local"
+        APIConfig.LOCAL_INDEX_DIR = index_dir_template.format(dimension=dimension)
+
+
+def evaluate(inputs):
+    """执行一次不读写存储的评估
+
+    Args:
+        inputs: canonicalize_inputs返回的规范化输入
+
+    Returns:
+        tuple: (各维度筛选后记录数, 得分字典)
+    """
+    dimension_outputs = {dimension: run_dimension(dimension, inputs) for dimension in EVALUATION_DIMENSIONS}
+    counts = {dimension: output[0] for dimension, output in dimension_outputs.items()}
+    score_results = build_score_results(dimension_outputs)
+    return counts, {name: score_results[name] for name in COUNT_SCORES}
+
+
+def compare(baseline, candidate):
+    """汇总候选维度相对基准维度的偏移
+
+    Args:
+        baseline: 基准维度下每条输入的(counts, scores)列表
+        candidate: 候选维度下每条输入的(counts, scores)列表
+
+    Returns:
+        dict: 各维度记录数偏移、总分偏移和报告稳定比例
+    """
+    pairs = [(base, other) for base, other in zip(baseline, candidate) if base is not None and other is not None]
+    if not pairs:
+        return {"inputs": 0}
+
+    count_drift = {}
+    for dimension in EVALUATION_DIMENSIONS:
+        diffs = [abs(other[0][dimension] - base[0][dimension]) for base, other in pairs]
+        count_drift[dimension] = {
+            "mean_abs": sum(diffs) / len(diffs),
+            "max_abs": max(diffs),
+            "unchanged": sum(1 for diff in diffs if diff == 0) / len(diffs)
+        }
+
+    score_diffs = [abs(other[1]["total_score"] - base[1]["total_score"]) for base, other in pairs]
+    stable = sum(1 for base, other in pairs if base[1] == other[1])
+    return {
+        "inputs": len(pairs),
+        "counts": count_drift,
+        "total_score_mean_abs": sum(score_diffs) / len(score_diffs),
+        "total_score_max_abs": max(score_diffs),
+        "stable_reports": stable / len(pairs)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量维度对评估结果的影响评估")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[1024, 768, 512, 256],
+                        help="待评估的维度，第一个为基准")
+    parser.add_argument("--index-dir", help="本地索引目录模板，如local_index_d{dimension}")
+    parser.add_argument("--log", help="历史请求JSONL日志路径，默认使用内置选题")
+    parser.add_argument("--limit", type=int, help="最多评估的输入数量")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    raw_inputs = load_inputs(args.log) if args.log else SEED_INPUTS
+    unique = {}
+    for paper_topic, variable_settings, empirical_model in raw_inputs:
+        inputs = canonicalize_inputs(paper_topic, variable_settings, empirical_model)
+        unique.setdefault((inputs["paper_topic"], inputs["variable_settings"], inputs["empirical_model"]), inputs)
+    inputs_list = list(unique.values())[:args.limit]
+    print(f"评估输入: {len(inputs_list)} 条，维度: {args.dimensions}")
+    if not args.index_dir and any(d != APIConfig.DEFAULT_EMBEDDING_DIMENSION for d in args.dimensions):
+        print(f"未指定--index-dir，{APIConfig.SEARCH_BACKEND} 集合只能检索 {APIConfig.DEFAULT_EMBEDDING_DIMENSION} 维向量")
+
+    outcomes = {}
+    for dimension in args.dimensions:
+        configure_dimension(dimension, args.index_dir)
+        outcomes[dimension] = []
+        for inputs in inputs_list:
+            try:
+                outcomes[dimension].append(evaluate(inputs))
+            except Exception as e:
+                print(f"{dimension}维评估失败: {inputs['paper_topic']}: {str(e)}")
+                outcomes[dimension].append(None)
+
+    baseline_dimension = args.dimensions[0]
+    report = {}
+    print(f"\n基准维度: {baseline_dimension}，阈值: 期刊 {SearchConfig.JOURNAL_MAX_SCORE}、数据集 {SearchConfig.DATASET_MAX_SCORE}、"
+          f"CFP {SearchConfig.CFP_MAX_SCORE}、SKJJ {SearchConfig.SKJJ_MAX_SCORE}")
+    header = "".join(f"{dimension:>16}" for dimension in EVALUATION_DIMENSIONS)
+    print(f"{'维度':<8}{'向量字节':>10}{header}{'总分平均偏移':>14}{'总分最大偏移':>14}{'报告不变':>10}")
+    for dimension in args.dimensions[1:]:
+        summary = compare(outcomes[baseline_dimension], outcomes[dimension])
+        report[dimension] = summary
+        if not summary["inputs"]:
+            print(f"{dimension:<8}没有可比较的结果")
+            continue
+        cells = "".join(
+            f"{summary['counts'][name]['mean_abs']:>9.2f}/{summary['counts'][name]['unchanged']:>6.0%}"
+            for name in EVALUATION_DIMENSIONS
+        )
+        print(f"{dimension:<8}{dimension * 4:>10}{cells}{summary['total_score_mean_abs']:>14.4f}"
+              f"{summary['total_score_max_abs']:>14.4f}{summary['stable_reports']:>10.0%}")
+    print("\n各维度单元格为: 记录数平均绝对偏移/记录数不变的比例")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"baseline": baseline_dimension, "results": report}, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""向量量化对检索精度的影响评估
+
+用法：
+    python benchmarks/eval_quantization.py --index-dir snapshots
+    python benchmarks/eval_quantization.py --synthetic 200000 --dimension 1024
+
+对每个集合分别比较float16、int8、int8+float32重排与float32精确检索：
+    - top-k召回率（检索数量取SearchConfig中的MAX_*）
+    - top-k分数的平均/最大绝对误差
+    - 按SearchConfig分数阈值筛选后的记录数与float32是否一致（评估得分只依赖这个数量）
+    - 向量占用内存和单次检索耗时
+
+查询向量为叠加了不同强度噪声的随机文档向量，top-k分数分布跨过各集合的阈值。
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_search_core import APIConfig
+from search_functions import SearchConfig
+from collection_snapshot import LocalCollection
+from quantization import quantize, quantized_scores
+
+# 各集合的检索数量和分数阈值
+COLLECTION_SETTINGS = {
+    APIConfig.JOURNAL_COLLECTION: (SearchConfig.MAX_JOURNAL_RESULTS, SearchConfig.JOURNAL_MAX_SCORE),
+    APIConfig.CFP_COLLECTION: (SearchConfig.MAX_CFP_RESULTS, SearchConfig.CFP_MAX_SCORE),
+    APIConfig.DATASET_COLLECTION: (SearchConfig.MAX_DATASET_RESULTS, SearchConfig.DATASET_MAX_SCORE),
+    APIConfig.SKJJ_COLLECTION: (SearchConfig.MAX_SKJJ_RESULTS, SearchConfig.SKJJ_MAX_SCORE),
+}
+
+VARIANTS = [("float16", False), ("int8", False), ("int8", True)]
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def synthetic_vectors(count, dimension, seed=0):
+    """生成带聚类结构的归一化向量"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((64, dimension)).astype(np.float32)
+    labels = rng.integers(0, len(centers), count)
+    return _normalize(centers[labels] + 0.9 * rng.standard_normal((count, dimension)).astype(np.float32))
+
+
+def make_queries(vectors, count, seed=1):
+    """在随机文档向量上叠加不同强度的噪声作为查询，使top-k分数分布跨过各集合的阈值"""
+    rng = np.random.default_rng(seed)
+    base = vectors[rng.integers(0, len(vectors), count)]
+    noise = _normalize(rng.standard_normal(base.shape).astype(np.float32))
+    strength = rng.uniform(0.1, 1.5, (count, 1)).astype(np.float32)
+    return _normalize(base + strength * noise)
+
+
+def _top_k(scores, k):
+    """每列分数最高的k个下标"""
+    k = min(k, scores.shape[0])
+    return np.argpartition(-scores, k - 1, axis=0)[:k]
+
+
+def evaluate_collection(vectors, queries, topk, threshold, rerank_factor):
+    """评估单个集合上各量化方式的精度
+
+    Args:
+        vectors: float32文档向量矩阵
+        queries: float32查询矩阵，每行一个查询
+        topk: 检索数量
+        threshold: 分数阈值
+        rerank_factor: 重排候选数相对topk的倍数
+
+    Returns:
+        list: 每种量化方式的指标字典
+    """
+    started = time.perf_counter()
+    exact = vectors @ queries.T
+    exact_elapsed = time.perf_counter() - started
+    exact_top = _top_k(exact, topk)
+    exact_top_scores = np.take_along_axis(exact, exact_top, axis=0)
+    exact_counts = (exact_top_scores >= threshold).sum(axis=0)
+
+    rows = [{
+        "variant": "float32", "bytes": vectors.nbytes, "recall": 1.0, "mean_error": 0.0, "max_error": 0.0,
+        "count_equal": 1.0, "count_diff": 0.0, "ms_per_query": exact_elapsed * 1000 / len(queries)
+    }]
+    for dtype, rerank in VARIANTS:
+        codes, scales = quantize(vectors, dtype)
+        started = time.perf_counter()
+        approx = quantized_scores(codes, scales, queries.T)
+        if rerank:
+            # 候选按量化分数选出，分数用float32向量重新计算
+            candidates = _top_k(approx, topk * rerank_factor)
+            rescored = np.einsum("kqd,qd->kq", vectors[candidates], queries)
+            order = _top_k(rescored, topk)
+            top = np.take_along_axis(candidates, order, axis=0)
+            top_scores = np.take_along_axis(rescored, order, axis=0)
+        else:
+            top = _top_k(approx, topk)
+            top_scores = np.take_along_axis(approx, top, axis=0)
+        elapsed = time.perf_counter() - started
+
+        recall = np.mean([len(np.intersect1d(top[:, q], exact_top[:, q])) / exact_top.shape[0]
+                          for q in range(len(queries))])
+        errors = np.abs(np.sort(top_scores, axis=0) - np.sort(exact_top_scores, axis=0))
+        counts = (top_scores >= threshold).sum(axis=0)
+        rows.append({
+            "variant": dtype + ("+rerank" if rerank else ""),
+            # float32重排向量为内存映射，只有候选行会被读入，不计入常驻内存
+            "bytes": codes.nbytes + (scales.nbytes if scales is not None else 0),
+            "recall": float(recall),
+            "mean_error": float(errors.mean()),
+            "max_error": float(errors.max()),
+            "count_equal": float(np.mean(counts == exact_counts)),
+            "count_diff": float(np.mean(np.abs(counts - exact_counts))),
+            "ms_per_query": elapsed * 1000 / len(queries)
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量量化精度评估")
+    parser.add_argument("--index-dir", help="float32快照根目录，默认使用合成数据")
+    parser.add_argument("--synthetic", type=int, default=100000, help="合成数据的向量数量")
+    parser.add_argument("--dimension", type=int, default=1024, help="合成数据的向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="每个集合的查询数量")
+    parser.add_argument("--rerank-factor", type=int, default=APIConfig.LOCAL_RERANK_FACTOR, help="重排候选倍数")
+    args = parser.parse_args()
+
+    for offset, (collection_name, (topk, threshold)) in enumerate(COLLECTION_SETTINGS.items()):
+        if args.index_dir:
+            collection = LocalCollection(os.path.join(args.index_dir, collection_name))
+            if collection.dtype != "float32":
+                print(f"{collection_name}: 快照已量化（{collection.dtype}），需要float32快照作为基准")
+                continue
+            vectors = collection.float_vectors()
+        else:
+            vectors = synthetic_vectors(args.synthetic, args.dimension, seed=offset)
+        queries = make_queries(vectors, args.queries, seed=offset + 100)
+        rows = evaluate_collection(vectors, queries, topk, threshold, args.rerank_factor)
+
+        print(f"\n{collection_name}: {len(vectors)} 条 x {vectors.shape[1]} 维，top{topk}，阈值 {threshold}")
+        print(f"{'存储类型':<16}{'内存MB':>10}{'召回率':>10}{'平均误差':>12}{'最大误差':>12}"
+              f"{'记录数一致':>12}{'记录数偏差':>12}{'ms/查询':>10}")
+        for row in rows:
+            print(f"{row['variant']:<16}{row['bytes'] / 2 ** 20:>10.1f}{row['recall']:>10.2%}"
+                  f"{row['mean_error']:>12.5f}{row['max_error']:>12.5f}{row['count_equal']:>12.2%}"
+                  f"{row['count_diff']:>12.3f}{row['ms_per_query']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
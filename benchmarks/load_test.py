@@ -0,0 +1,584 @@
+"""评估服务的并发压测
+
+用法：
+    python benchmarks/load_test.py --index-dir local_index --target library --concurrency 8
+    python benchmarks/load_test.py --index-dir local_index --log requests.jsonl --target async --rates 5,10,20
+    python benchmarks/load_test.py --target daemon --socket /tmp/topic_evaluation.sock --pid 12345
+    python benchmarks/load_test.py --index-dir local_index --rates 4 --batch-load 16 --rate-limit
+
+按开环到达（泊松或匀速）向评估入口发送请求：到达时间预先确定，不因前面的请求变慢而推迟，
+延迟从计划到达时间算起，排队时间计入延迟。入口可以是：
+
+    library    线程池中调用search_functions.calculate_research_score
+    async      事件循环中调用AsyncVectorSearchEngine.calculate_research_score
+    daemon     通过evaluation_client访问evaluation_daemon.py（未指定--socket时在本进程内启动守护进程）
+
+选题分布来自请求日志（JSONL，格式同cache_warmup.py，按日志中的出现频率抽样），或由词表合成：
+先组合出--distinct条不同输入，再按Zipf分布抽样，热门选题会命中缓存。
+
+默认使用本地向量化和本地检索后端（需要先用local_search.py构建本地索引），
+并在每次向量化和检索时注入对数正态分布的延迟，模拟DashScope/DashVector的网络耗时。
+指定--socket压测外部守护进程时，守护进程使用自身配置的后端，不注入延迟，CPU/RSS通过--pid统计。
+--rate-limit让注入延迟的每次调用经过进程内的端点限流器（RATE_LIMITS配置），与线上后端一样排队。
+
+压测请求以interactive优先级经评估调度器（evaluation_scheduler.py）执行。--batch-load指定批量背景负载的
+工作线程数：每个线程在压测期间以batch优先级连续评估（选题加编号，不命中评估缓存），
+统计只包含交互式请求，用于观察批量任务占满后端配额时交互式请求的延迟。
+
+每一档到达率运行--duration秒，输出吞吐、延迟p50/p95/p99、错误率、排队深度和进程CPU/RSS，
+吞吐明显低于到达率、p99超过SLA或错误率超过上限即视为饱和。未指定--rates时从--start-rate开始
+按--step倍数逐档提高，找到饱和档后在最后一个未饱和档与之间二分，给出单机可持续的最大到达率。
+--output保存每一档的统计和时间序列（JSON）。
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_search_core import APIConfig
+from search_functions import SearchConfig, _EMBEDDING_CACHE, _SEARCH_CACHE, _EVALUATION_CACHE
+
+# 合成选题使用的词表
+CONCEPTS = [
+    "数字经济", "新质生产力", "碳排放", "绿色金融", "人工智能", "数字化转型", "环境规制", "绿色技术创新",
+    "农村居民消费", "数字金融", "碳排放权交易", "企业创新", "产业结构升级", "共同富裕", "乡村振兴",
+    "全要素生产率", "营商环境", "供应链韧性", "ESG表现", "城乡收入差距",
+]
+CONTROLS = [
+    "城镇化水平", "外商投资水平", "产业聚集度", "经济发展水平", "教育发展水平", "研发投入", "金融发展水平",
+    "企业规模", "资产负债率", "托宾Q", "净资产收益率", "股权集中度", "政府干预程度", "人口密度",
+    "对外开放程度", "人力资本", "基础设施水平", "市场化程度",
+]
+MODELS = ["双重差分模型", "空间计量模型", "面板固定效应模型", "门槛回归模型", "中介效应模型", "工具变量法", ""]
+# 合成选题热度的Zipf指数
+ZIPF_EXPONENT = 1.1
+
+
+def synthesize_inputs(distinct, rng):
+    """由词表组合出distinct条不同的输入"""
+    inputs = []
+    seen = set()
+    while len(inputs) < distinct:
+        cause, effect = rng.sample(CONCEPTS, 2)
+        paper_topic = f"{cause}对{effect}的影响"
+        variables = [cause, effect] + rng.sample(CONTROLS, rng.randint(2, 6))
+        item = (paper_topic, "、".join(variables), rng.choice(MODELS))
+        if item not in seen:
+            seen.add(item)
+            inputs.append(item)
+    return inputs
+
+
+def load_topic_mix(args, rng):
+    """返回(输入列表, 抽样权重)"""
+    if args.log:
+        from cache_warmup import load_history
+        records = load_history(args.log)
+        if not records:
+            raise SystemExit(f"请求日志中没有可用记录: {args.log}")
+        inputs = [(record["paper_topic"], record.get("variable_settings") or "", record.get("empirical_model") or "")
+                  for record in records]
+        return inputs, None
+    inputs = synthesize_inputs(args.distinct, rng)
+    return inputs, [1.0 / (rank + 1) ** ZIPF_EXPONENT for rank in range(len(inputs))]
+
+
+def inject_latency(embedding_ms, search_ms, sigma, seed, rate_limit=False):
+    """给本地向量化和本地检索的每次调用加上模拟的网络延迟
+
+    延迟服从中位数为给定毫秒数的对数正态分布；search_many按SEARCH_MANY_CONCURRENCY条一轮计算轮数，
+    每轮一次延迟，与DashVector后端的并发批量检索相当。rate_limit为True时每次延迟（每轮）
+    占用dashscope/dashvector限流器的一个许可
+    """
+    from embedding_backends import HashedNgramEmbedding
+    from local_search import LocalSearchClient
+    from rate_limiter import get_rate_limiter
+
+    rng = random.Random(seed)
+
+    def delay(endpoint, median_ms, rounds=1):
+        if median_ms <= 0:
+            return
+        for _ in range(rounds):
+            with get_rate_limiter(endpoint).slot() if rate_limit else contextlib.nullcontext():
+                time.sleep(median_ms / 1000.0 * rng.lognormvariate(0.0, sigma))
+
+    def wrap(function, endpoint, median_ms, rounds=None):
+        def wrapper(self, *args, **kwargs):
+            delay(endpoint, median_ms, rounds(args[0] if args else kwargs["query_vectors"]) if rounds else 1)
+            return function(self, *args, **kwargs)
+        return wrapper
+
+    HashedNgramEmbedding.embed_batch = wrap(HashedNgramEmbedding.embed_batch, "dashscope", embedding_ms)
+    LocalSearchClient.search = wrap(LocalSearchClient.search, "dashvector", search_ms)
+    LocalSearchClient.search_many = wrap(
+        LocalSearchClient.search_many, "dashvector", search_ms,
+        lambda query_vectors: max(1, math.ceil(len(query_vectors) / APIConfig.SEARCH_MANY_CONCURRENCY))
+    )
+
+
+def make_scheduler(concurrency):
+    """library/async入口的评估调度器，batch的并发上限按默认配置的比例缩放"""
+    from evaluation_scheduler import DEFAULT_SCHEDULER_SETTINGS, EvaluationScheduler
+    ratio = DEFAULT_SCHEDULER_SETTINGS["class_limits"]["batch"] / DEFAULT_SCHEDULER_SETTINGS["concurrency"]
+    return EvaluationScheduler(concurrency, {"batch": max(1, int(concurrency * ratio))})
+
+
+def clear_caches():
+    """清空进程内的向量、检索和评估缓存"""
+    _EMBEDDING_CACHE.clear()
+    _SEARCH_CACHE.clear()
+    _EVALUATION_CACHE.clear()
+
+
+class _LoopThread:
+    """在后台线程中运行的事件循环"""
+
+    def __init__(self, executor_workers):
+        self.loop = asyncio.new_event_loop()
+        # 本地后端经asyncio.to_thread执行，注入的延迟代表非阻塞的网络等待，默认线程池（CPU核数+4）会把并发压低
+        self.loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=executor_workers))
+        self.thread = threading.Thread(target=self.loop.run_forever, name="load-test-loop", daemon=True)
+        self.thread.start()
+
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class LibraryTarget:
+    """线程池中经调度器调用同步接口，--concurrency限制同时进行的评估数"""
+
+    clears_caches = True
+
+    def __init__(self, concurrency, batch_load=0):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency + batch_load)
+        self.scheduler = make_scheduler(concurrency)
+
+    def submit(self, inputs, on_start, priority="interactive"):
+        from search_functions import calculate_research_score
+
+        def run():
+            with self.scheduler.slot(priority, "load-test"):
+                on_start()
+                if not calculate_research_score(*inputs, use_store=False, profile=False):
+                    raise RuntimeError("评估失败")
+        return self.executor.submit(run)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+class AsyncTarget:
+    """事件循环中经调度器调用异步引擎，--concurrency限制同时进行的评估数"""
+
+    clears_caches = True
+
+    def __init__(self, concurrency, batch_load=0, executor_workers=32):
+        from async_search import AsyncVectorSearchEngine
+        self.runner = _LoopThread(executor_workers)
+        self.engine = AsyncVectorSearchEngine()
+        self.scheduler = make_scheduler(concurrency)
+
+    async def _run(self, inputs, on_start, priority):
+        async with self.scheduler.slot_async(priority, "load-test"):
+            on_start()
+            if not await self.engine.calculate_research_score(*inputs, use_store=False):
+                raise RuntimeError("评估失败")
+
+    def submit(self, inputs, on_start, priority="interactive"):
+        return self.runner.submit(self._run(inputs, on_start, priority))
+
+    def close(self):
+        self.runner.submit(self.engine.close()).result()
+        self.runner.close()
+
+
+class DaemonTarget:
+    """通过客户端访问守护进程，未指定套接字时在本进程内启动守护进程"""
+
+    def __init__(self, concurrency, socket_path=None, batch_load=0, executor_workers=32):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency + batch_load)
+        self.runner = None
+        self.daemon = None
+        self.clears_caches = socket_path is None
+        if socket_path is None:
+            from evaluation_daemon import EvaluationDaemon
+            socket_path = os.path.join(tempfile.mkdtemp(prefix="load-test-"), "daemon.sock")
+            self.runner = _LoopThread(executor_workers)
+            self.daemon = EvaluationDaemon(socket_path)
+            self.runner.submit(self.daemon.start()).result()
+        self.socket_path = socket_path
+
+    def submit(self, inputs, on_start, priority="interactive"):
+        from evaluation_client import evaluate
+
+        def run():
+            on_start()
+            evaluate(*inputs, content=True, socket_path=self.socket_path, on_chunk=lambda data: None,
+                     priority=priority, tenant="load-test")
+        return self.executor.submit(run)
+
+    def close(self):
+        self.executor.shutdown()
+        if self.daemon is not None:
+            self.runner.submit(self.daemon.close()).result()
+            self.runner.close()
+            os.rmdir(os.path.dirname(self.socket_path))
+
+
+class ResourceMonitor:
+    """读取进程的累计CPU时间和当前RSS，优先使用/proc"""
+
+    def __init__(self, pid=None):
+        self.pid = pid
+        self.proc = f"/proc/{pid or 'self'}"
+        self.has_proc = os.path.exists(self.proc)
+        if pid is not None and not self.has_proc:
+            raise SystemExit(f"无法读取进程 {pid} 的资源占用")
+
+    def cpu_seconds(self):
+        if self.pid is None or not self.has_proc:
+            return time.process_time()
+        with open(f"{self.proc}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def rss_bytes(self):
+        if self.has_proc:
+            with open(f"{self.proc}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        import resource
+        # 没有/proc时只能取峰值（macOS单位为字节）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentile(sorted_values, q):
+    """最近秩百分位数"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q / 100.0 * len(sorted_values)) - 1))]
+
+
+def _batch_load(target, mix, workers, stop, completed):
+    """启动批量背景负载：每个线程以batch优先级连续评估，直到stop被设置
+
+    选题加上递增编号，每次评估都不命中评估缓存；completed记录各批量评估的完成时间
+    """
+    counter = itertools.count()
+
+    def work():
+        while not stop.is_set():
+            number = next(counter)
+            paper_topic, variable_settings, empirical_model = mix[number % len(mix)]
+            try:
+                target.submit((f"{paper_topic}（批量{number}）", variable_settings, empirical_model),
+                              lambda: None, "batch").result()
+            except Exception:
+                continue
+            completed.append(time.perf_counter())
+
+    threads = [threading.Thread(target=work, name=f"load-test-batch-{index}", daemon=True)
+               for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_step(target, mix, weights, rate, args, rng, monitor):
+    """以固定到达率运行一档压测
+
+    Returns:
+        dict: 本档统计和时间序列
+    """
+    if args.reset_caches and target.clears_caches:
+        clear_caches()
+    lock = threading.Lock()
+    counts = {"submitted": 0, "started": 0, "finished": 0}
+    requests = []
+    samples = []
+    stop = threading.Event()
+
+    def sample(started, last):
+        now = time.perf_counter()
+        cpu = monitor.cpu_seconds()
+        with lock:
+            snapshot = dict(counts)
+        samples.append({
+            "t": round(now - started, 3),
+            "submitted": snapshot["submitted"],
+            "finished": snapshot["finished"],
+            "queue_depth": snapshot["submitted"] - snapshot["started"],
+            "in_flight": snapshot["started"] - snapshot["finished"],
+            "throughput": (snapshot["finished"] - last[2]) / (now - last[0]),
+            "cpu_percent": 100.0 * (cpu - last[1]) / (now - last[0]),
+            "rss_mb": monitor.rss_bytes() / 1048576,
+        })
+        return now, cpu, snapshot["finished"]
+
+    def sampler(started):
+        last = (started, monitor.cpu_seconds(), 0)
+        while not stop.wait(args.sample_interval):
+            last = sample(started, last)
+
+    batch_stop = threading.Event()
+    batch_completed = []
+    batch_threads = _batch_load(target, mix, args.batch_load, batch_stop, batch_completed)
+    started = time.perf_counter()
+    sampler_thread = threading.Thread(target=sampler, args=(started,), name="load-test-sampler", daemon=True)
+    sampler_thread.start()
+
+    futures = []
+    arrival = started
+    while True:
+        arrival += rng.expovariate(rate) if args.arrival == "poisson" else 1.0 / rate
+        if arrival - started >= args.duration:
+            break
+        time.sleep(max(0.0, arrival - time.perf_counter()))
+        request = {"scheduled": arrival, "started": None, "finished": None, "error": None}
+
+        def on_start(request=request):
+            request["started"] = time.perf_counter()
+            with lock:
+                counts["started"] += 1
+
+        def on_done(future, request=request):
+            request["finished"] = time.perf_counter()
+            if future.cancelled():
+                request["error"] = "cancelled"
+            elif future.exception() is not None:
+                request["error"] = str(future.exception()) or type(future.exception()).__name__
+            with lock:
+                counts["finished"] += 1
+
+        inputs = rng.choices(mix, weights)[0]
+        with lock:
+            counts["submitted"] += 1
+        requests.append(request)
+        future = target.submit(inputs, on_start)
+        future.add_done_callback(on_done)
+        futures.append(future)
+    arrivals_end = time.perf_counter()
+    queue_at_end = counts["submitted"] - counts["started"]
+
+    _, pending = concurrent.futures.wait(futures, timeout=args.drain_timeout)
+    stop.set()
+    batch_stop.set()
+    sampler_thread.join()
+    window_end = started + args.duration
+    # 排空超时后仍未完成的请求记为超时；已开始的无法取消，等它们结束再进入下一档
+    timed_out = [request for request in requests if request["finished"] is None]
+    for future in pending:
+        future.cancel()
+    concurrent.futures.wait(pending)
+    for request in timed_out:
+        request["error"] = "timeout"
+    for thread in batch_threads:
+        thread.join()
+
+    ok = [request for request in requests if request["error"] is None]
+    latencies = sorted((request["finished"] - request["scheduled"]) * 1000 for request in ok)
+    service = sorted((request["finished"] - request["started"]) * 1000 for request in ok)
+    errors = {}
+    for request in requests:
+        if request["error"] is not None:
+            errors[request["error"]] = errors.get(request["error"], 0) + 1
+    submitted = len(requests)
+    cpu_values = [item["cpu_percent"] for item in samples]
+    return {
+        "rate": rate,
+        "offered": submitted / args.duration,
+        "throughput": sum(1 for request in ok if request["finished"] <= window_end) / args.duration,
+        "submitted": submitted,
+        "completed": len(ok),
+        "error_rate": (submitted - len(ok)) / submitted if submitted else 0.0,
+        "errors": errors,
+        "latency_ms": {"p50": _percentile(latencies, 50), "p95": _percentile(latencies, 95),
+                       "p99": _percentile(latencies, 99), "max": latencies[-1] if latencies else None},
+        "service_ms": {"p50": _percentile(service, 50), "p99": _percentile(service, 99)},
+        "queue_depth": {"max": max((item["queue_depth"] for item in samples), default=0), "end": queue_at_end},
+        "cpu_percent": sum(cpu_values) / len(cpu_values) if cpu_values else None,
+        "rss_mb": max((item["rss_mb"] for item in samples), default=monitor.rss_bytes() / 1048576),
+        "drain_seconds": time.perf_counter() - arrivals_end,
+        "batch_throughput": sum(1 for finished in batch_completed if started <= finished <= window_end) / args.duration,
+        "samples": samples,
+    }
+
+
+def saturation_reason(step, args):
+    """判断一档是否饱和，返回原因或None"""
+    if step["submitted"] == 0:
+        return None
+    if step["error_rate"] > args.max_error_rate:
+        return f"错误率 {step['error_rate']:.1%}"
+    if step["latency_ms"]["p99"] is not None and step["latency_ms"]["p99"] > args.sla_p99:
+        return f"p99 {step['latency_ms']['p99']:.0f} ms"
+    if step["throughput"] < args.min_throughput_ratio * step["offered"]:
+        return f"吞吐 {step['throughput']:.1f}/s < 到达 {step['offered']:.1f}/s"
+    return None
+
+
+def _format_ms(value):
+    return f"{value:.0f}" if value is not None else "-"
+
+
+def print_step(step, out):
+    latency = step["latency_ms"]
+    cpu = f"{step['cpu_percent']:.0f}" if step["cpu_percent"] is not None else "-"
+    print(f"{step['rate']:>8.2f}{step['offered']:>8.2f}{step['throughput']:>8.2f}{_format_ms(latency['p50']):>8}"
+          f"{_format_ms(latency['p95']):>8}{_format_ms(latency['p99']):>8}{step['error_rate']:>8.1%}"
+          f"{step['queue_depth']['max']:>7}{cpu:>7}{step['rss_mb']:>8.0f}  {step['saturated'] or '正常'}"
+          + (f"  批量 {step['batch_throughput']:.1f}/s" if step["batch_throughput"] else ""),
+          file=out, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评估服务的并发压测")
+    parser.add_argument("--target", choices=("library", "async", "daemon"), default="library", help="压测的入口")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时进行的评估数上限（library/daemon为工作线程数）")
+    parser.add_argument("--socket", help="daemon入口：已运行的守护进程的套接字路径，默认在本进程内启动")
+    parser.add_argument("--pid", type=int, help="统计CPU/RSS的进程号，默认为本进程（压测外部守护进程时指定）")
+    parser.add_argument("--log", help="JSONL请求日志，按出现频率抽样；默认合成选题")
+    parser.add_argument("--distinct", type=int, default=200, help="合成选题的不同输入数")
+    parser.add_argument("--backend", choices=("local", "configured"), default="local",
+                        help="local：本地向量化和检索后端并注入延迟；configured：沿用环境变量配置的后端")
+    parser.add_argument("--index-dir", default=APIConfig.LOCAL_INDEX_DIR, help="本地索引目录（local_search.py构建）")
+    parser.add_argument("--embedding-latency", type=float, default=80.0, help="注入的向量化延迟中位数（毫秒）")
+    parser.add_argument("--search-latency", type=float, default=40.0, help="注入的检索延迟中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="注入延迟的对数正态分布sigma")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="注入延迟的每次调用经过进程内的端点限流器（按RATE_LIMITS配置）")
+    parser.add_argument("--batch-load", type=int, default=0, help="批量背景负载的工作线程数（batch优先级连续评估）")
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson", help="到达过程")
+    parser.add_argument("--rates", help="逗号分隔的固定到达率（次/秒），不自动寻找饱和点")
+    parser.add_argument("--start-rate", type=float, default=1.0, help="自动寻找饱和点的起始到达率")
+    parser.add_argument("--step", type=float, default=1.5, help="逐档提高到达率的倍数")
+    parser.add_argument("--max-rate", type=float, default=1000.0, help="到达率上限")
+    parser.add_argument("--refine", type=int, default=2, help="找到饱和档后的二分次数")
+    parser.add_argument("--duration", type=float, default=20.0, help="每档的到达时长（秒）")
+    parser.add_argument("--drain-timeout", type=float, help="到达结束后等待请求完成的最长时间（秒），默认同--duration")
+    parser.add_argument("--warmup", type=int, help="正式压测前顺序执行的请求数（不计入统计），默认同--concurrency")
+    parser.add_argument("--sla-p99", type=float, default=2000.0, help="p99延迟SLA（毫秒）")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="可接受的错误率")
+    parser.add_argument("--min-throughput-ratio", type=float, default=0.9, help="吞吐低于到达率的该比例即视为饱和")
+    parser.add_argument("--keep-caches", dest="reset_caches", action="store_false",
+                        help="各档之间不清空进程内缓存（默认每档从空缓存开始）")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="时间序列的采样间隔（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", help="保存统计和时间序列的JSON路径")
+    parser.add_argument("--verbose", action="store_true", help="显示评估过程的输出")
+    args = parser.parse_args()
+    args.drain_timeout = args.duration if args.drain_timeout is None else args.drain_timeout
+    args.warmup = args.concurrency if args.warmup is None else args.warmup
+
+    rng = random.Random(args.seed)
+    mix, weights = load_topic_mix(args, rng)
+    if args.backend == "local":
+        APIConfig.EMBEDDING_BACKEND = "local"
+        APIConfig.SEARCH_BACKEND = "local"
+        APIConfig.LOCAL_INDEX_DIR = args.index_dir
+        inject_latency(args.embedding_latency, args.search_latency, args.latency_sigma, args.seed, args.rate_limit)
+    # 压测不读写持久化存储，否则后面的档位全部命中存储
+    os.environ["EVALUATION_STORE_PATH"] = ""
+    SearchConfig.PROFILE = ""
+
+    out = sys.stdout
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    # 评估过程的输出很多，默认丢弃；redirect_stdout对所有线程生效
+    with quiet as captured:
+        # --rate-limit时等待许可的调用阻塞在线程中，按每个评估同时发出的检索数放大线程池，
+        # 否则批量评估排队的调用占满线程池，交互式评估的调用在线程池中排在它们后面
+        executor_workers = args.concurrency * 32 if args.rate_limit else max(32, args.concurrency * 4)
+        if args.target == "library":
+            target = LibraryTarget(args.concurrency, args.batch_load)
+        elif args.target == "async":
+            target = AsyncTarget(args.concurrency, args.batch_load, executor_workers)
+        else:
+            target = DaemonTarget(args.concurrency, args.socket, args.batch_load, executor_workers)
+        monitor = ResourceMonitor(args.pid)
+        if not target.clears_caches and args.reset_caches:
+            print("外部守护进程的缓存无法清空，各档之间缓存保持预热状态", file=out)
+
+        steps = []
+        try:
+            for inputs in mix[:args.warmup]:
+                error = target.submit(inputs, lambda: None).exception()
+                if error is not None:
+                    print(f"预热请求失败: {str(error) or type(error).__name__}", file=out)
+            print(f"入口 {args.target}，并发 {args.concurrency}，{len(mix)} 条不同输入，每档 {args.duration:.0f} 秒，"
+                  f"SLA p99 {args.sla_p99:.0f} ms"
+                  + (f"，批量背景负载 {args.batch_load} 个线程" if args.batch_load else ""), file=out)
+            # 中文字符占两列，表头按显示宽度手工对齐
+            print("  到达率实际到达    吞吐     p50     p95     p99  错误率   排队   CPU%  RSS MB  状态", file=out)
+
+            def run(rate):
+                step = run_step(target, mix, weights, rate, args, rng, monitor)
+                step["saturated"] = saturation_reason(step, args)
+                steps.append(step)
+                print_step(step, out)
+                if captured is not None:
+                    captured.seek(0)
+                    captured.truncate()
+                return step
+
+            if args.rates:
+                for rate in (float(value) for value in args.rates.split(",")):
+                    run(rate)
+            else:
+                good, bad = None, None
+                rate = args.start_rate
+                while rate <= args.max_rate:
+                    step = run(rate)
+                    if step["saturated"]:
+                        bad = step
+                        break
+                    good = step
+                    rate *= args.step
+                for _ in range(args.refine if good and bad else 0):
+                    step = run((good["rate"] + bad["rate"]) / 2)
+                    if step["saturated"]:
+                        bad = step
+                    else:
+                        good = step
+        finally:
+            target.close()
+
+    sustainable = [step for step in steps if not step["saturated"]]
+    saturated = [step for step in steps if step["saturated"]]
+    if sustainable:
+        best = max(sustainable, key=lambda step: step["rate"])
+        print(f"可持续到达率: {best['rate']:.2f} 次/秒（吞吐 {best['throughput']:.2f}/s，"
+              f"p99 {_format_ms(best['latency_ms']['p99'])} ms）", file=out)
+    else:
+        print("所有档位均已饱和，请降低--start-rate", file=out)
+    if saturated:
+        first = min(saturated, key=lambda step: step["rate"])
+        print(f"饱和点: {first['rate']:.2f} 次/秒（{first['saturated']}）", file=out)
+    elif not args.rates:
+        print(f"到达率上限 {args.max_rate:.0f} 次/秒内未饱和", file=out)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "steps": steps}, f, ensure_ascii=False, indent=2)
+        print(f"统计已保存到 {args.output}", file=out)
+
+
+if __name__ == "__main__":
+    main()
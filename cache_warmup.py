@@ -0,0 +1,266 @@
+"""根据历史请求日志预热缓存
+
+部署或重启后进程内缓存全部为空。预热任务读取历史输入（JSONL，每行包含paper_topic、variable_settings、
+empirical_model，可选timestamp），规范化后按"随时间衰减的出现次数"排序，依次：
+
+    1. 评估结果存储中已有结果的输入直接载入评估缓存，不调用任何接口
+    2. 其余输入分块处理：块内全部查询文本一次批量向量化，再按集合用search_many批量检索，
+       最后执行calculate_research_score（此时各级缓存均已命中）填充评估缓存和存储
+
+预热受时间预算和调用配额（向量化文本数 + 检索次数）约束，预算用尽即停止。
+每块在评估调度器（evaluation_scheduler.py）的batch优先级下执行，不占用交互式请求的名额。
+start_background_warmup在后台线程中执行，服务可以同时处理请求。
+
+用法：
+    python cache_warmup.py --log requests.jsonl --time-budget 600 --max-calls 5000
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime
+
+from rate_limiter import ThrottledError
+from evaluation_scheduler import get_scheduler
+from result_store import get_default_store
+from search_functions import (
+    SearchConfig, _SearchSession, _EMBEDDING_CACHE, _SEARCH_CACHE, _EVALUATION_CACHE,
+    canonicalize_inputs, evaluation_digest, evaluation_cache_key, embedding_digest, search_digest, search_config_hash,
+    describe_dimension_queries, local_dataset_results, calculate_research_score
+)
+from evaluation_config import current_config
+from structured_log import get_logger
+
+log = get_logger("cache_warmup")
+
+# 输入排序时出现次数的半衰期（天）
+DEFAULT_HALF_LIFE_DAYS = 14.0
+
+
+def _record_time(record):
+    """读取日志记录的时间戳（秒），支持数值和ISO格式，缺失时返回None"""
+    value = record.get("timestamp", record.get("created_at"))
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def load_history(log_path):
+    """读取JSONL请求日志
+
+    Args:
+        log_path: 日志路径
+
+    Returns:
+        list: 日志记录字典列表（跳过空行、无法解析的行和没有paper_topic的记录）
+    """
+    records = []
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get("paper_topic"):
+                records.append(record)
+    return records
+
+
+def rank_inputs(records, half_life_days=DEFAULT_HALF_LIFE_DAYS, now=None):
+    """规范化输入并按频率和新近程度排序
+
+    每次出现的权重为0.5 ** (距今天数 / half_life_days)，没有时间戳的记录权重为1；
+    权重相同时最近出现的输入排在前面
+
+    Args:
+        records: 日志记录列表（按时间顺序）
+        half_life_days: 半衰期（天）
+        now: 当前时间戳，默认为time.time()
+
+    Returns:
+        list: 规范化输入字典列表，按优先级降序
+    """
+    now = time.time() if now is None else now
+    ranked = {}
+    for position, record in enumerate(records):
+        inputs = canonicalize_inputs(record["paper_topic"], record.get("variable_settings", ""),
+                                     record.get("empirical_model", ""))
+        key = evaluation_digest(inputs["paper_topic"], inputs["variable_settings"], inputs["empirical_model"])
+        timestamp = _record_time(record)
+        weight = 1.0 if timestamp is None else 0.5 ** (max(now - timestamp, 0.0) / 86400.0 / half_life_days)
+        entry = ranked.setdefault(key, {"inputs": inputs, "weight": 0.0, "last_seen": position})
+        entry["weight"] += weight
+        entry["last_seen"] = position
+    entries = sorted(ranked.values(), key=lambda entry: (-entry["weight"], -entry["last_seen"]))
+    return [entry["inputs"] for entry in entries]
+
+
+def _pending_work(inputs_list, config):
+    """一块输入中尚未缓存的向量化文本和检索，按(集合, topk, 过滤条件)分组
+
+    由变量可用性表或词法精确匹配回答的数据集关键词在评估时不会向量化和检索，不计入预热
+    """
+    texts = []
+    seen_texts = set()
+    groups = {}
+    for inputs in inputs_list:
+        answered, _ = local_dataset_results(list(inputs["variables"]), True, config)
+        for query in describe_dimension_queries(inputs, config):
+            if query["dimension"] == "dataset" and query["query_text"] in answered:
+                continue
+            search_filter = query["search_filter"]
+            if search_digest(query["collection"], query["query_text"], query["topk"], search_filter) in _SEARCH_CACHE:
+                continue
+            group_key = (query["collection"], query["topk"], search_filter.cache_key() if search_filter else "")
+            group = groups.setdefault(group_key, {"filter": search_filter, "texts": []})
+            if query["query_text"] not in group["texts"]:
+                group["texts"].append(query["query_text"])
+            if query["query_text"] not in seen_texts and embedding_digest(query["query_text"]) not in _EMBEDDING_CACHE:
+                seen_texts.add(query["query_text"])
+                texts.append(query["query_text"])
+    return texts, groups
+
+
+def warm_caches(inputs_list, time_budget=None, max_calls=None, chunk_size=32, use_store=True, stats=None):
+    """按顺序预热一组输入的各级缓存
+
+    Args:
+        inputs_list: rank_inputs返回的规范化输入列表（按优先级降序）
+        time_budget: 时间预算（秒），None表示不限
+        max_calls: 调用配额（向量化文本数 + 检索次数），None表示不限
+        chunk_size: 每块批量处理的输入数
+        use_store: 是否读写评估结果存储
+        stats: 用于实时更新进度的字典，默认新建
+
+    Returns:
+        dict: 统计信息（warmed、failed、from_store、embedded、queries、elapsed、stopped）
+    """
+    stats = {} if stats is None else stats
+    stats.update(total=len(inputs_list), warmed=0, failed=0, from_store=0, embedded=0, queries=0, elapsed=0.0,
+                 stopped=None)
+    started = time.perf_counter()
+    deadline = None if time_budget is None else started + time_budget
+    store = get_default_store() if use_store else None
+    config = current_config()
+    collection_versions = config.collection_versions()
+    config_hash = search_config_hash(config)
+
+    def out_of_time():
+        return deadline is not None and time.perf_counter() >= deadline
+
+    pending = []
+    for inputs in inputs_list:
+        key = evaluation_digest(inputs["paper_topic"], inputs["variable_settings"], inputs["empirical_model"])
+        if evaluation_cache_key(key, config_hash) in _EVALUATION_CACHE:
+            stats["warmed"] += 1
+            continue
+        stored = store.get(key, collection_versions, config_hash) if store is not None else None
+        if stored is not None:
+            _EVALUATION_CACHE.set(evaluation_cache_key(key, config_hash), stored)
+            stats["warmed"] += 1
+            stats["from_store"] += 1
+        else:
+            pending.append(inputs)
+
+    session = _SearchSession()
+    scheduler = get_scheduler()
+    try:
+        for start in range(0, len(pending), chunk_size):
+            if out_of_time():
+                stats["stopped"] = "time_budget"
+                break
+            with scheduler.slot("batch", "cache_warmup"):
+                _warm_chunk(pending[start:start + chunk_size], session, stats, max_calls, use_store, out_of_time, config)
+            if stats["stopped"]:
+                break
+    except ThrottledError:
+        stats["stopped"] = "throttled"
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+
+def _warm_chunk(chunk, session, stats, max_calls, use_store, out_of_time, config):
+    """批量预取一块输入的向量和检索结果，再逐个评估；预算用尽时设置stats["stopped"]"""
+    texts, groups = _pending_work(chunk, config)
+    calls = len(texts) + sum(len(group["texts"]) for group in groups.values())
+    if max_calls is not None and stats["embedded"] + stats["queries"] + calls > max_calls:
+        stats["stopped"] = "quota"
+        return
+
+    if texts:
+        session.texts_to_vectors(texts)
+        stats["embedded"] += len(texts)
+    for (collection, topk, _), group in groups.items():
+        session.query_many(group["texts"], collection, topk, "cache_warmup", group["filter"])
+        stats["queries"] += len(group["texts"])
+
+    for inputs in chunk:
+        if out_of_time():
+            stats["stopped"] = "time_budget"
+            return
+        try:
+            result = calculate_research_score(inputs["paper_topic"], inputs["variable_settings"],
+                                              inputs["empirical_model"], use_store=use_store)
+        except ThrottledError:
+            raise
+        except Exception as e:
+            log.warning("warmup_evaluation_failed", "预热评估失败: {paper_topic}: {error}",
+                        paper_topic=inputs["paper_topic"], error=e)
+            result = None
+        stats["warmed" if result else "failed"] += 1
+
+
+def start_background_warmup(log_path, limit=None, **kwargs):
+    """在后台线程中预热缓存，服务可以同时处理请求
+
+    Args:
+        log_path: JSONL请求日志路径
+        limit: 最多预热的输入数，默认为评估缓存容量（避免预热内容互相淘汰）
+        **kwargs: 传给warm_caches的预算参数
+
+    Returns:
+        tuple: (线程, 实时更新的统计字典)
+    """
+    stats = {"stopped": None}
+
+    def run():
+        try:
+            inputs_list = rank_inputs(load_history(log_path))[:limit or SearchConfig.EVALUATION_CACHE_SIZE]
+            warm_caches(inputs_list, stats=stats, **kwargs)
+            log.info("warmup_done", "缓存预热完成: {stats}", stats=dict(stats))
+        except Exception as e:
+            stats["stopped"] = "error"
+            log.warning("warmup_failed", "缓存预热失败: {error}", error=e)
+
+    thread = threading.Thread(target=run, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="根据历史请求日志预热缓存")
+    parser.add_argument("--log", required=True, help="JSONL请求日志路径")
+    parser.add_argument("--limit", type=int, default=SearchConfig.EVALUATION_CACHE_SIZE, help="最多预热的输入数")
+    parser.add_argument("--time-budget", type=float, help="时间预算（秒）")
+    parser.add_argument("--max-calls", type=int, help="调用配额（向量化文本数 + 检索次数）")
+    parser.add_argument("--chunk-size", type=int, default=32, help="每块批量处理的输入数")
+    parser.add_argument("--half-life-days", type=float, default=DEFAULT_HALF_LIFE_DAYS, help="出现次数的半衰期（天）")
+    args = parser.parse_args()
+
+    inputs_list = rank_inputs(load_history(args.log), args.half_life_days)[:args.limit]
+    stats = warm_caches(inputs_list, args.time_budget, args.max_calls, args.chunk_size)
+    print(f"预热 {stats['warmed']}/{stats['total']} 个输入（存储命中 {stats['from_store']}），"
+          f"向量化 {stats['embedded']} 条文本，检索 {stats['queries']} 次，耗时 {stats['elapsed']:.1f} 秒"
+          + (f"，因{stats['stopped']}提前停止" if stats["stopped"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,754 @@
+"""DashVector集合快照与增量同步
+
+将journal_new、CFP_v2、dataset_v4、SKJJ等集合导出为本地紧凑格式：
+
+    <快照目录>/<集合名> -> <集合名>.snapshot-<版本>/（符号链接，发布新快照时原子替换）
+        manifest.json           数量、维度、字段类型、同步游标和各文件的sha256
+        vectors.npy             连续存储的float32/float16/int8向量矩阵
+        vector_scales.npy       int8量化时每个向量的缩放系数
+        vectors.rerank.npy      量化时可选保留的float32向量，只用于候选重排
+        ids.offsets.npy         文档id（UTF-8拼接 + int64偏移）
+        ids.data.bin
+        columns/<字段>.*        元数据按列存储：字符串列为偏移+UTF-8数据，数值列为.npy
+        indexes/<字段>.*        过滤字段的二级索引：数值字段为排序数组，其他字段为倒排行号
+        lexical/                文本字段的词法倒排索引（精确匹配和BM25，见lexical_index.py）
+
+加载时全部通过内存映射完成，不复制数据，多个worker进程共享同一份页缓存。
+
+用法：
+    python collection_snapshot.py --collections journal_new CFP_v2 --marker-field update_time
+    python collection_snapshot.py --full --dtype float16
+    python collection_snapshot.py --full --dtype int8 --rerank
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from dashvector.common.types import OrderByField
+
+from vector_search_core import APIConfig, VectorSearchClient
+from quantization import QUANTIZATION_DTYPES, quantize, dequantize, quantized_scores
+from lexical_index import LexicalIndex
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def _sha256_file(path, chunk_size=1 << 20):
+    """计算文件的sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path, data):
+    """先写临时文件再原子替换，避免中断时留下半个文件"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _infer_column_kind(values):
+    """推断列类型：int、float、str或json"""
+    kinds = set()
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            kinds.add("json")
+        elif isinstance(value, int):
+            kinds.add("int")
+        elif isinstance(value, float):
+            kinds.add("float")
+        elif isinstance(value, str):
+            kinds.add("str")
+        else:
+            kinds.add("json")
+    if not kinds:
+        return "str"
+    if kinds <= {"int"}:
+        return "int"
+    if kinds <= {"int", "float"}:
+        return "float"
+    if kinds == {"str"}:
+        return "str"
+    return "json"
+
+
+def _write_string_column(prefix, values):
+    """写入字符串列：UTF-8数据拼接为一个文件，另存int64偏移"""
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    with open(prefix + ".data.bin", "wb") as f:
+        position = 0
+        for i, value in enumerate(values):
+            data = value.encode("utf-8")
+            f.write(data)
+            position += len(data)
+            offsets[i + 1] = position
+    np.save(prefix + ".offsets.npy", offsets)
+    return [prefix + ".offsets.npy", prefix + ".data.bin"]
+
+
+def _write_column(prefix, kind, values):
+    """按列类型写入一列元数据，返回写入的文件列表"""
+    if kind in ("int", "float"):
+        # 数值列统一存为float64，缺失值为NaN
+        column = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        np.save(prefix + ".npy", column)
+        return [prefix + ".npy"]
+    if kind == "str":
+        return _write_string_column(prefix, ["" if value is None else value for value in values])
+    return _write_string_column(prefix, [json.dumps(value, ensure_ascii=False) for value in values])
+
+
+class StringColumn:
+    """内存映射的字符串列，按需解码单个值"""
+
+    def __init__(self, prefix):
+        self.offsets = np.load(prefix + ".offsets.npy", mmap_mode="r")
+        if os.path.getsize(prefix + ".data.bin") > 0:
+            self.data = np.memmap(prefix + ".data.bin", dtype=np.uint8, mode="r")
+        else:
+            self.data = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class JsonColumn(StringColumn):
+    """以JSON编码存储的列（列表、布尔值或混合类型）"""
+
+    def __getitem__(self, index):
+        return json.loads(super().__getitem__(index))
+
+
+def _as_number(value):
+    """转换为float，无法转换时返回NaN"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class SortedIndex:
+    """数值字段的二级索引：按值排序的行号和对应的值，缺失值排在最后"""
+
+    def __init__(self, order, sorted_values):
+        self.order = order
+        self.sorted_values = sorted_values
+
+    @classmethod
+    def build(cls, values):
+        values = np.array([_as_number(value) for value in values], dtype=np.float64)
+        order = np.argsort(values, kind="stable")
+        return cls(order.astype(np.int64), values[order])
+
+    def range(self, low=None, high=None):
+        """值落在闭区间[low, high]内的行号（升序）"""
+        start = 0 if low is None else np.searchsorted(self.sorted_values, low, side="left")
+        end = np.searchsorted(self.sorted_values, np.inf if high is None else high, side="right")
+        return np.sort(self.order[start:end])
+
+    def lookup(self, values):
+        """值等于values之一的行号（升序）"""
+        parts = [self.range(number, number) for number in map(_as_number, values) if not np.isnan(number)]
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+
+class PostingsIndex:
+    """字符串和列表字段的二级索引：每个取值对应的升序行号（CSR格式）"""
+
+    def __init__(self, keys, offsets, rows):
+        self.keys = keys
+        self.positions = {key: position for position, key in enumerate(keys)}
+        self.offsets = offsets
+        self.rows = rows
+
+    @classmethod
+    def build(cls, values):
+        postings = {}
+        for row, value in enumerate(values):
+            for item in value if isinstance(value, (list, tuple)) else [value]:
+                if item is None or item == "":
+                    continue
+                postings.setdefault(str(item), []).append(row)
+        keys = sorted(postings)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[key]) for key in keys])
+        rows = np.array([row for key in keys for row in postings[key]], dtype=np.int64)
+        return cls(keys, offsets, rows)
+
+    def _rows_at(self, positions):
+        parts = [self.rows[self.offsets[position]:self.offsets[position + 1]] for position in positions]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return parts[0].copy() if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+    def lookup(self, values):
+        """取值为values之一的行号（升序）"""
+        return self._rows_at([self.positions[str(value)] for value in values if str(value) in self.positions])
+
+    def range(self, low=None, high=None):
+        """取值可转换为数值且落在闭区间[low, high]内的行号（升序）"""
+        positions = []
+        for position, key in enumerate(self.keys):
+            number = _as_number(key)
+            if np.isnan(number) or (low is not None and number < low) or (high is not None and number > high):
+                continue
+            positions.append(position)
+        return self._rows_at(positions)
+
+
+def _write_index(prefix, kind, values):
+    """写入一个字段的二级索引，返回(索引类型, 写入的文件列表)"""
+    if kind in ("int", "float"):
+        index = SortedIndex.build(values)
+        np.save(prefix + ".order.npy", index.order)
+        np.save(prefix + ".sorted.npy", index.sorted_values)
+        return "sorted", [prefix + ".order.npy", prefix + ".sorted.npy"]
+    index = PostingsIndex.build(values)
+    with open(prefix + ".keys.json", "w", encoding="utf-8") as f:
+        json.dump(index.keys, f, ensure_ascii=False)
+    np.save(prefix + ".offsets.npy", index.offsets)
+    np.save(prefix + ".rows.npy", index.rows)
+    return "postings", [prefix + ".keys.json", prefix + ".offsets.npy", prefix + ".rows.npy"]
+
+
+class LocalCollection:
+    """本地集合快照，向量和元数据均通过内存映射加载"""
+
+    def __init__(self, directory, verify=False):
+        """加载快照
+
+        Args:
+            directory: 快照目录（包含manifest.json）
+            verify: 是否校验全部文件的sha256
+        """
+        # 解析一次符号链接，之后延迟加载的列和索引与manifest来自同一个快照版本
+        directory = os.path.realpath(directory)
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if verify and not self.verify():
+            raise ValueError(f"快照校验失败: {directory}")
+
+        self.name = self.manifest["collection"]
+        self.count = self.manifest["count"]
+        self.dimension = self.manifest["dimension"]
+        self.fields = list(self.manifest["columns"])
+        self.dtype = self.manifest.get("dtype", "float32")
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self.scales = self._load_optional("vector_scales.npy")
+        self.rerank_vectors = self._load_optional("vectors.rerank.npy")
+        self.ids = StringColumn(os.path.join(directory, "ids"))
+        self._columns = {}
+        self._indexes = {}
+        self._lexical_index = None
+        self._id_index = None
+
+    def _load_optional(self, name):
+        """内存映射加载可选的.npy文件，不存在时返回None"""
+        path = os.path.join(self.directory, name)
+        return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+    def scores(self, query):
+        """在（可能量化的）向量矩阵上计算与查询的点积
+
+        Args:
+            query: 查询向量或形状为(d, m)的查询矩阵
+
+        Returns:
+            numpy.ndarray: float32分数
+        """
+        return quantized_scores(self.vectors, self.scales, query)
+
+    def float_vectors(self, indices=None):
+        """读取float32向量，有重排向量时直接读取，否则反量化
+
+        Args:
+            indices: 行号数组，默认为全部行
+
+        Returns:
+            numpy.ndarray: float32向量矩阵
+        """
+        if self.rerank_vectors is not None:
+            source = self.rerank_vectors if indices is None else self.rerank_vectors[indices]
+            return np.array(source, dtype=np.float32)
+        codes = self.vectors if indices is None else self.vectors[indices]
+        scales = None if self.scales is None else (self.scales if indices is None else self.scales[indices])
+        return dequantize(codes, None if scales is None else np.asarray(scales))
+
+    def verify(self):
+        """校验全部文件的sha256
+
+        Returns:
+            bool: 校验是否通过
+        """
+        for name, checksum in self.manifest["checksums"].items():
+            if _sha256_file(os.path.join(self.directory, name)) != checksum:
+                print(f"文件校验失败: {name}")
+                return False
+        return True
+
+    def column(self, field):
+        """获取一列元数据
+
+        Args:
+            field: 字段名
+
+        Returns:
+            数值列返回numpy数组（缺失值为NaN），其他列返回可按下标访问的列对象
+        """
+        if field not in self._columns:
+            kind = self.manifest["columns"][field]
+            prefix = os.path.join(self.directory, "columns", field)
+            if kind in ("int", "float"):
+                self._columns[field] = np.load(prefix + ".npy", mmap_mode="r")
+            elif kind == "str":
+                self._columns[field] = StringColumn(prefix)
+            else:
+                self._columns[field] = JsonColumn(prefix)
+        return self._columns[field]
+
+    def field_index(self, field):
+        """获取字段的二级索引，快照中没有该索引时按列数据在内存中构建
+
+        Args:
+            field: 字段名
+
+        Returns:
+            SortedIndex或PostingsIndex
+
+        Raises:
+            KeyError: 集合中没有该字段
+        """
+        if field not in self._indexes:
+            kind = self.manifest.get("indexes", {}).get(field)
+            prefix = os.path.join(self.directory, "indexes", field)
+            if kind == "sorted":
+                self._indexes[field] = SortedIndex(
+                    np.load(prefix + ".order.npy", mmap_mode="r"), np.load(prefix + ".sorted.npy", mmap_mode="r")
+                )
+            elif kind == "postings":
+                with open(prefix + ".keys.json", "r", encoding="utf-8") as f:
+                    keys = json.load(f)
+                self._indexes[field] = PostingsIndex(
+                    keys, np.load(prefix + ".offsets.npy", mmap_mode="r"), np.load(prefix + ".rows.npy", mmap_mode="r")
+                )
+            elif field not in self.manifest["columns"]:
+                raise KeyError(f"集合 {self.name} 没有字段: {field}")
+            elif self.manifest["columns"][field] in ("int", "float"):
+                self._indexes[field] = SortedIndex.build(self.column(field))
+            else:
+                self._indexes[field] = PostingsIndex.build(list(self.column(field)))
+        return self._indexes[field]
+
+    def lexical_index(self):
+        """获取文本字段的词法倒排索引，快照中没有时按APIConfig.LEXICAL_FIELDS在内存中构建
+
+        Returns:
+            LexicalIndex: 没有可索引的文本字段时返回None
+        """
+        if self._lexical_index is None:
+            if self.manifest.get("lexical"):
+                self._lexical_index = LexicalIndex.load(os.path.join(self.directory, "lexical"))
+            else:
+                fields = [field for field in APIConfig.LEXICAL_FIELDS.get(self.name, []) if field in self.manifest["columns"]]
+                if not fields:
+                    return None
+                self._lexical_index = LexicalIndex.build(list(zip(*[self.column(field) for field in fields])))
+        return self._lexical_index
+
+    def value(self, field, index):
+        """读取单个字段值，整数列还原为int，缺失值为None"""
+        kind = self.manifest["columns"][field]
+        value = self.column(field)[index]
+        if kind in ("int", "float"):
+            if np.isnan(value):
+                return None
+            return int(value) if kind == "int" else float(value)
+        return value
+
+    def doc(self, index, fields=None):
+        """读取一条文档
+
+        Args:
+            index: 行号
+            fields: 需要的字段列表，默认为全部字段
+
+        Returns:
+            dict: 包含id和各字段的字典
+        """
+        record = {"id": self.ids[index]}
+        for field in fields or self.fields:
+            if field in self.manifest["columns"]:
+                record[field] = self.value(field, index)
+        return record
+
+    def index_of(self, doc_id):
+        """根据文档id查找行号，不存在时返回None"""
+        if self._id_index is None:
+            self._id_index = {value: index for index, value in enumerate(self.ids)}
+        return self._id_index.get(doc_id)
+
+    def __len__(self):
+        return self.count
+
+
+def write_snapshot(directory, collection_name, ids, vectors, records, dtype="float32", extra=None, rerank=False,
+                   index_fields=None, lexical_fields=None):
+    """原子地写入一个完整快照
+
+    先写入临时目录，全部文件写完并计算校验和后再发布为新版本（见_publish_snapshot）
+
+    Args:
+        directory: 快照目录
+        collection_name: 集合名称
+        ids: 文档id列表
+        vectors: 向量矩阵（行数与ids一致）
+        records: 每条文档的字段字典列表
+        dtype: 向量存储类型，float32、float16或int8
+        extra: 写入manifest的其他信息（如同步游标）
+        rerank: 量化存储时是否另存一份float32向量，用于检索候选的精确重排
+        index_fields: 建立二级索引的字段，默认为APIConfig.INDEXED_FIELDS中该集合的配置
+        lexical_fields: 建立词法倒排索引的文本字段，默认为APIConfig.LEXICAL_FIELDS中该集合的配置
+    """
+    tmp_dir = directory + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_dir, "columns"))
+    os.makedirs(os.path.join(tmp_dir, "indexes"))
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    codes, scales = quantize(vectors, dtype)
+    np.save(os.path.join(tmp_dir, "vectors.npy"), codes)
+    files = ["vectors.npy"]
+    if scales is not None:
+        np.save(os.path.join(tmp_dir, "vector_scales.npy"), scales)
+        files.append("vector_scales.npy")
+    rerank = bool(rerank and dtype != "float32")
+    if rerank:
+        np.save(os.path.join(tmp_dir, "vectors.rerank.npy"), np.ascontiguousarray(vectors))
+        files.append("vectors.rerank.npy")
+    files += [os.path.relpath(path, tmp_dir) for path in _write_string_column(os.path.join(tmp_dir, "ids"), list(ids))]
+
+    fields = sorted({field for record in records for field in record})
+    columns = {}
+    for field in fields:
+        values = [record.get(field) for record in records]
+        columns[field] = _infer_column_kind(values)
+        written = _write_column(os.path.join(tmp_dir, "columns", field), columns[field], values)
+        files += [os.path.relpath(path, tmp_dir) for path in written]
+
+    if index_fields is None:
+        index_fields = APIConfig.INDEXED_FIELDS.get(collection_name, [])
+    indexes = {}
+    for field in index_fields:
+        if field not in columns:
+            continue
+        values = [record.get(field) for record in records]
+        indexes[field], written = _write_index(os.path.join(tmp_dir, "indexes", field), columns[field], values)
+        files += [os.path.relpath(path, tmp_dir) for path in written]
+
+    if lexical_fields is None:
+        lexical_fields = APIConfig.LEXICAL_FIELDS.get(collection_name, [])
+    lexical_fields = [field for field in lexical_fields if field in columns]
+    if lexical_fields:
+        lexical = LexicalIndex.build([[record.get(field) for field in lexical_fields] for record in records])
+        written = lexical.save(os.path.join(tmp_dir, "lexical"))
+        files += [os.path.relpath(path, tmp_dir) for path in written]
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "collection": collection_name,
+        "count": len(ids),
+        "dimension": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "dtype": dtype,
+        "rerank": rerank,
+        "columns": columns,
+        "indexes": indexes,
+        "lexical": lexical_fields,
+        "created_at": time.time(),
+        "checksums": {name: _sha256_file(os.path.join(tmp_dir, name)) for name in files}
+    }
+    manifest.update(extra or {})
+    _write_json_atomic(os.path.join(tmp_dir, "manifest.json"), manifest)
+
+    _publish_snapshot(directory, tmp_dir)
+
+
+def _publish_snapshot(directory, tmp_dir):
+    """将写好的临时目录发布为快照
+
+    快照内容位于带版本号的目录"<目录>.snapshot-<时间>"中，directory为指向它的符号链接，
+    发布时用os.replace原子替换符号链接，任何时刻打开directory的读者要么看到旧快照，要么看到新快照。
+    上一个版本保留到下一次发布，已经打开旧快照的LocalCollection仍可延迟加载列和索引。
+    directory是旧版本写出的真实目录时，迁移为符号链接需要先挪开目录，此时有一个很短的不可用窗口。
+    """
+    parent = os.path.dirname(directory) or "."
+    prefix = os.path.basename(directory) + ".snapshot-"
+    version_dir = f"{directory}.snapshot-{time.time_ns()}"
+    os.replace(tmp_dir, version_dir)
+
+    previous = None
+    if os.path.islink(directory):
+        previous = os.path.basename(os.path.realpath(directory))
+    elif os.path.isdir(directory):
+        previous = prefix + "0"
+        shutil.rmtree(os.path.join(parent, previous), ignore_errors=True)
+        os.replace(directory, os.path.join(parent, previous))
+
+    link_tmp = directory + ".link.tmp"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(os.path.basename(version_dir), link_tmp)
+    os.replace(link_tmp, directory)
+
+    # 删除更早的版本和旧版本遗留的.old目录
+    keep = {os.path.basename(version_dir), previous}
+    for name in os.listdir(parent):
+        if name.startswith(prefix) and name[len(prefix):].isdigit() and name not in keep:
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+    shutil.rmtree(directory + ".old", ignore_errors=True)
+
+
+def _filter_value(value):
+    """格式化DashVector过滤表达式中的值"""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "\\'") + "'"
+    return repr(value)
+
+
+class CollectionExporter:
+    """分页导出DashVector集合，支持断点续传和基于更新标记的增量同步
+
+    按更新标记字段升序分页，每页以"标记 >= 游标"过滤，
+    并跳过游标处已导出的id；每页落盘后更新进度文件，中断后从进度文件继续。
+    """
+
+    def __init__(self, collection_name, out_dir, marker_field, page_size=500, dtype="float32", search_client=None,
+                 rerank=False):
+        """初始化导出器
+
+        Args:
+            collection_name: 集合名称
+            out_dir: 快照根目录
+            marker_field: 更新标记字段（数值或可比较的字符串，如更新时间戳）
+            page_size: 每页导出的文档数
+            dtype: 向量存储类型，float32、float16或int8
+            search_client: 已初始化的VectorSearchClient，默认按APIConfig创建
+        """
+        self.collection_name = collection_name
+        self.directory = os.path.join(out_dir, collection_name)
+        self.staging_dir = self.directory + ".partial"
+        self.marker_field = marker_field
+        self.page_size = page_size
+        self.dtype = dtype
+        self.rerank = rerank
+        self.search_client = search_client
+        self.output_fields = APIConfig.get_output_fields(collection_name)
+        if marker_field not in self.output_fields:
+            self.output_fields = self.output_fields + [marker_field]
+
+    def _progress_path(self):
+        return os.path.join(self.staging_dir, "progress.json")
+
+    def _load_progress(self, initial_cursor, initial_seen):
+        """读取断点进度，不存在时初始化"""
+        if os.path.exists(self._progress_path()):
+            with open(self._progress_path(), "r", encoding="utf-8") as f:
+                progress = json.load(f)
+            print(f"从断点继续导出 {self.collection_name}: 已导出 {progress['exported']} 条")
+            return progress
+        os.makedirs(self.staging_dir, exist_ok=True)
+        return {"cursor": initial_cursor, "seen_at_cursor": list(initial_seen), "pages": 0, "exported": 0}
+
+    def _fetch_page(self, collection, cursor):
+        """按更新标记升序获取一页文档"""
+        filter_expr = None
+        if cursor is not None:
+            filter_expr = f"{self.marker_field} >= {_filter_value(cursor)}"
+        response = collection.query(
+            topk=self.page_size,
+            filter=filter_expr,
+            include_vector=True,
+            output_fields=self.output_fields,
+            order_by_fields=OrderByField(self.marker_field)
+        )
+        if not response:
+            raise RuntimeError(f"导出 {self.collection_name} 失败: {response.message}")
+        return list(response)
+
+    def _export_pages(self, initial_cursor, initial_seen=()):
+        """分页导出到暂存目录，返回进度字典"""
+        progress = self._load_progress(initial_cursor, initial_seen)
+        if self.search_client is None:
+            self.search_client = VectorSearchClient(api_key=APIConfig.DASHVECTOR_API_KEY, endpoint=APIConfig.CLUSTER_ENDPOINT)
+        if not self.search_client.get_collection(self.collection_name):
+            raise RuntimeError(f"获取集合 {self.collection_name} 失败")
+        collection = self.search_client.collection
+
+        while True:
+            cursor = progress["cursor"]
+            seen = set(progress["seen_at_cursor"])
+            docs = self._fetch_page(collection, cursor)
+            fresh = [
+                doc for doc in docs
+                if not ((doc.fields or {}).get(self.marker_field) == cursor and doc.id in seen)
+            ]
+            if not fresh:
+                if len(docs) >= self.page_size:
+                    raise RuntimeError(f"同一更新标记下的文档数超过page_size({self.page_size})，请增大--page-size")
+                break
+
+            page_name = f"page-{progress['pages'] + 1:06d}"
+            np.save(os.path.join(self.staging_dir, page_name + ".npy"), np.asarray([doc.vector for doc in fresh], dtype=np.float32))
+            _write_json_atomic(os.path.join(self.staging_dir, page_name + ".json"), {
+                "ids": [doc.id for doc in fresh],
+                "fields": [dict(doc.fields or {}) for doc in fresh]
+            })
+
+            markers = [(doc.fields or {}).get(self.marker_field) for doc in fresh]
+            if any(marker is None for marker in markers):
+                raise RuntimeError(f"{self.collection_name} 中存在缺少更新标记字段 {self.marker_field} 的文档")
+            new_cursor = max(markers)
+            at_cursor = [doc.id for doc in fresh if (doc.fields or {}).get(self.marker_field) == new_cursor]
+            if new_cursor == cursor:
+                at_cursor = list(seen) + at_cursor
+            progress.update({
+                "cursor": new_cursor,
+                "seen_at_cursor": at_cursor,
+                "pages": progress["pages"] + 1,
+                "exported": progress["exported"] + len(fresh)
+            })
+            _write_json_atomic(self._progress_path(), progress)
+            print(f"{self.collection_name}: 第 {progress['pages']} 页，累计 {progress['exported']} 条，游标 {new_cursor}")
+
+            if len(docs) < self.page_size:
+                break
+        return progress
+
+    def _iter_staged_pages(self, pages):
+        """按顺序读取暂存的分页"""
+        for page in range(1, pages + 1):
+            page_name = f"page-{page:06d}"
+            vectors = np.load(os.path.join(self.staging_dir, page_name + ".npy"))
+            with open(os.path.join(self.staging_dir, page_name + ".json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            yield meta["ids"], vectors, meta["fields"]
+
+    def run(self, full=False):
+        """执行导出或增量同步
+
+        已有快照且full为False时，只导出更新标记不小于快照游标的文档，
+        按id合并：已存在的id被新版本替换，新id追加在末尾。
+
+        Args:
+            full: 是否忽略已有快照执行全量导出
+
+        Returns:
+            dict: 本次同步的增量，{"added": {doc_id: vector}, "removed": []}，
+                可直接传给incremental_refresh.refresh_evaluations（更新的文档也视为新增）
+        """
+        existing = None
+        if not full and os.path.exists(os.path.join(self.directory, "manifest.json")):
+            existing = LocalCollection(self.directory)
+            if existing.manifest.get("marker_field") != self.marker_field:
+                print(f"快照的更新标记字段与本次不同，执行全量导出: {self.collection_name}")
+                existing = None
+
+        initial_cursor, initial_seen = None, ()
+        if existing is not None:
+            initial_cursor = existing.manifest.get("cursor")
+            initial_seen = existing.manifest.get("seen_at_cursor", ())
+        progress = self._export_pages(initial_cursor, initial_seen)
+
+        # 按id合并：ids和records覆盖全部文档，向量分为已有矩阵和新增列表两部分
+        ids, records = [], []
+        base_vectors = np.zeros((0, 0), dtype=np.float32)
+        if existing is not None:
+            ids = list(existing.ids)
+            records = [existing.doc(index) for index in range(len(existing))]
+            for record in records:
+                record.pop("id")
+            base_vectors = existing.float_vectors()
+        positions = {doc_id: index for index, doc_id in enumerate(ids)}
+
+        added = {}
+        new_vectors = []
+        for page_ids, page_vectors, page_fields in self._iter_staged_pages(progress["pages"]):
+            for doc_id, vector, fields in zip(page_ids, page_vectors, page_fields):
+                added[doc_id] = vector.tolist()
+                position = positions.get(doc_id)
+                if position is None:
+                    positions[doc_id] = len(ids)
+                    ids.append(doc_id)
+                    records.append(fields)
+                    new_vectors.append(vector)
+                    continue
+                records[position] = fields
+                if position < len(base_vectors):
+                    base_vectors[position] = vector
+                else:
+                    new_vectors[position - len(base_vectors)] = vector
+
+        parts = [part for part in (base_vectors, np.asarray(new_vectors, dtype=np.float32)) if len(part)]
+        all_vectors = np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+        if existing is not None:
+            # 释放内存映射后才能在Windows上替换目录
+            del existing
+        write_snapshot(self.directory, self.collection_name, ids, all_vectors, records, self.dtype, {
+            "marker_field": self.marker_field,
+            "cursor": progress["cursor"],
+            "seen_at_cursor": progress["seen_at_cursor"]
+        }, rerank=self.rerank)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        print(f"{self.collection_name} 快照完成: 共 {len(ids)} 条，本次新增或更新 {len(added)} 条")
+        return {"added": added, "removed": []}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DashVector集合快照与增量同步")
+    parser.add_argument("--collections", nargs="+", default=[
+        APIConfig.JOURNAL_COLLECTION, APIConfig.CFP_COLLECTION, APIConfig.DATASET_COLLECTION, APIConfig.SKJJ_COLLECTION
+    ], help="要导出的集合")
+    parser.add_argument("--out", default=APIConfig.LOCAL_SNAPSHOT_DIR, help="快照根目录")
+    parser.add_argument("--marker-field", default=APIConfig.SNAPSHOT_MARKER_FIELD, help="更新标记字段")
+    parser.add_argument("--page-size", type=int, default=500, help="每页导出的文档数")
+    parser.add_argument("--dtype", choices=QUANTIZATION_DTYPES, default="float32", help="向量存储类型")
+    parser.add_argument("--rerank", action="store_true", help="量化存储时另存float32向量用于候选重排")
+    parser.add_argument("--full", action="store_true", help="忽略已有快照，执行全量导出")
+    parser.add_argument("--verify", action="store_true", help="只校验已有快照的校验和")
+    args = parser.parse_args()
+
+    for collection_name in args.collections:
+        if args.verify:
+            ok = LocalCollection(os.path.join(args.out, collection_name)).verify()
+            print(f"{collection_name}: {'校验通过' if ok else '校验失败'}")
+            continue
+        exporter = CollectionExporter(collection_name, args.out, args.marker_field, args.page_size, args.dtype,
+                                      rerank=args.rerank)
+        exporter.run(full=args.full)
+
+
+if __name__ == "__main__":
+    main()
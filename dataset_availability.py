@@ -0,0 +1,229 @@
+"""变量到数据集的可用性预计算表
+
+经济发展水平、外商投资水平、城镇化水平等控制变量几乎出现在每次评估中。离线任务统计日志和评估存储中
+最常见的变量，预先执行dataset_v4检索并按配置快照中的DATASET_MAX_SCORE筛选，结果保存为gzip压缩的JSON：
+
+    {
+        "format_version": 1,
+        "collection_version": dataset_v4的集合版本,
+        "config_hash": 生成时的search_config_hash(),
+        "created_at": 生成时间,
+        "docs": [去重后的文档字典, ...],
+        "variables": {变量: [[文档下标, 分数], ...], ...}
+    }
+
+search_functions在检索前加载该表，表中的变量直接查字典；集合版本或检索配置变化后旧表自动失效，
+用--if-stale重新运行即可刷新（未提供日志时沿用旧表的变量列表）。
+
+用法：
+    python dataset_availability.py --log requests.jsonl --top 500
+    python dataset_availability.py --if-stale
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+from collections import Counter
+
+from vector_search_core import ResultProcessor
+
+TABLE_FORMAT_VERSION = 1
+
+
+class AvailabilityTable:
+    """变量可用性查找表，变量按忽略大小写匹配"""
+
+    def __init__(self, data):
+        if data.get("format_version") != TABLE_FORMAT_VERSION:
+            raise ValueError(f"不支持的变量可用性表版本: {data.get('format_version')}")
+        self.collection_version = data["collection_version"]
+        self.config_hash = data["config_hash"]
+        self.created_at = data.get("created_at")
+        self.docs = data["docs"]
+        self.variables = list(data["variables"])
+        self._hits = {variable.casefold(): hits for variable, hits in data["variables"].items()}
+
+    @classmethod
+    def load(cls, path):
+        """读取表文件
+
+        Raises:
+            OSError: 文件无法读取
+            ValueError: 文件格式无效
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def matches(self, collection_version, config_hash):
+        """表是否对应当前的集合版本和检索配置"""
+        return self.collection_version == str(collection_version) and self.config_hash == config_hash
+
+    def get(self, variable):
+        """查询变量的筛选后结果
+
+        Args:
+            variable: 规范化后的变量
+
+        Returns:
+            list: 结果字典列表（包含score），变量不在表中时返回None
+        """
+        hits = self._hits.get(variable.casefold())
+        if hits is None:
+            return None
+        return [dict(self.docs[index], score=score) for index, score in hits]
+
+    def __len__(self):
+        return len(self._hits)
+
+
+def write_table(path, variable_results, collection_version, config_hash):
+    """原子地写入变量可用性表，文档在各变量之间去重
+
+    Args:
+        path: 输出路径
+        variable_results: 变量到筛选后结果字典列表的映射
+        collection_version: dataset_v4的集合版本
+        config_hash: 检索配置摘要
+    """
+    docs = []
+    doc_index = {}
+    variables = {}
+    for variable, results in variable_results.items():
+        hits = []
+        for record in results:
+            record = dict(record)
+            score = record.pop("score", None)
+            key = record.get("id") or record.get("url") or json.dumps(record, ensure_ascii=False, sort_keys=True)
+            if key not in doc_index:
+                doc_index[key] = len(docs)
+                docs.append(record)
+            hits.append([doc_index[key], score])
+        variables[variable] = hits
+
+    data = {
+        "format_version": TABLE_FORMAT_VERSION,
+        "collection_version": str(collection_version),
+        "config_hash": config_hash,
+        "created_at": time.time(),
+        "docs": docs,
+        "variables": variables,
+    }
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"), default=str)
+    os.replace(tmp_path, path)
+
+
+def count_variables(log_paths=(), store=None, store_limit=100000):
+    """统计日志和评估存储中各变量出现的次数
+
+    Args:
+        log_paths: JSONL请求日志路径列表（每行包含variable_settings）
+        store: 评估结果存储，为None时不读取
+        store_limit: 从评估存储读取的最大记录数
+
+    Returns:
+        Counter: 规范化变量（忽略大小写合并）到出现次数的映射
+    """
+    from search_functions import split_variables
+
+    counts = Counter()
+    spellings = {}
+
+    def add(variable_settings):
+        for variable in split_variables(variable_settings):
+            key = variable.casefold()
+            spellings.setdefault(key, variable)
+            counts[key] += 1
+
+    for log_path in log_paths:
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    add(json.loads(line).get("variable_settings", ""))
+    if store is not None:
+        for record in store.find_by_date_range(limit=store_limit):
+            add(record["variable_settings"])
+    return Counter({spellings[key]: count for key, count in counts.items()})
+
+
+def build_table(variables, path, batch_size=64):
+    """对变量执行数据集检索并写入可用性表
+
+    检索失败或没有结果的变量不写入，查询时回退到实时检索
+
+    Args:
+        variables: 变量列表
+        path: 输出路径
+        batch_size: 每批检索的变量数
+
+    Returns:
+        int: 写入表中的变量数
+    """
+    from evaluation_config import current_config
+    from search_functions import _SearchSession, search_dataset_keywords, search_config_hash
+
+    config = current_config()
+    collection_version = config.collection_versions()[config.collection("dataset")]
+    config_hash = search_config_hash(config)
+    session = _SearchSession()
+    variable_results = {}
+    for start in range(0, len(variables), batch_size):
+        batch = variables[start:start + batch_size]
+        keyword_results = search_dataset_keywords(batch, session, use_table=False, config=config)
+        for variable in batch:
+            results = keyword_results.get(variable)
+            if not results:
+                continue
+            records = [ResultProcessor.to_dict(result) for result in results]
+            variable_results[variable] = ResultProcessor.filter_results_by_score(records, config.threshold("dataset"))
+        print(f"已检索 {min(start + batch_size, len(variables))}/{len(variables)} 个变量")
+
+    write_table(path, variable_results, collection_version, config_hash)
+    return len(variable_results)
+
+
+def main():
+    from evaluation_config import current_config
+    from search_functions import SearchConfig, search_config_hash
+    from result_store import get_default_store
+
+    parser = argparse.ArgumentParser(description="预计算常见变量的数据集可用性")
+    parser.add_argument("--log", nargs="*", default=[], help="JSONL请求日志路径")
+    parser.add_argument("--no-store", action="store_true", help="不统计评估结果存储中的变量")
+    parser.add_argument("--top", type=int, default=500, help="预计算出现次数最多的变量数")
+    parser.add_argument("--min-count", type=int, default=2, help="变量最少出现次数")
+    parser.add_argument("--out", default=SearchConfig.DATASET_AVAILABILITY_PATH, help="输出路径")
+    parser.add_argument("--if-stale", action="store_true", help="只在表不存在或已过期（集合版本、检索配置变化）时重建")
+    parser.add_argument("--batch-size", type=int, default=64, help="每批检索的变量数")
+    args = parser.parse_args()
+
+    existing = None
+    if os.path.exists(args.out):
+        try:
+            existing = AvailabilityTable.load(args.out)
+        except (OSError, ValueError) as e:
+            print(f"读取旧表失败: {str(e)}")
+    config = current_config()
+    collection_version = config.collection_versions()[config.collection("dataset")]
+    if args.if_stale and existing is not None and existing.matches(collection_version, search_config_hash(config)):
+        print(f"变量可用性表仍然有效: {args.out}（{len(existing)} 个变量）")
+        return
+
+    counts = count_variables(args.log, None if args.no_store else get_default_store())
+    variables = [variable for variable, count in counts.most_common(args.top) if count >= args.min_count]
+    if not variables and existing is not None:
+        print("日志中没有符合条件的变量，沿用旧表的变量列表")
+        variables = existing.variables
+    if not variables:
+        print("没有需要预计算的变量")
+        return
+
+    written = build_table(variables, args.out, args.batch_size)
+    print(f"变量可用性表已写入 {args.out}：{written} 个变量")
+
+
+if __name__ == "__main__":
+    main()
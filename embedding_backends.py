@@ -0,0 +1,173 @@
+import json
+import os
+import unicodedata
+import zlib
+
+import numpy as np
+
+
+class EmbeddingBackend:
+    """文本向量化后端接口
+
+    子类需要实现embed_batch，并提供model_id（参与缓存键计算）和dimension
+    """
+
+    model_id = None
+    dimension = None
+
+    def embed_batch(self, texts):
+        """批量将文本转换为向量
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            numpy.ndarray: 形状为(len(texts), dimension)的float32矩阵
+        """
+        raise NotImplementedError
+
+    def embed(self, text):
+        """将单条文本转换为向量
+
+        Args:
+            text: 文本
+
+        Returns:
+            list: 向量
+        """
+        return self.embed_batch([text])[0].tolist()
+
+
+class HashedNgramEmbedding(EmbeddingBackend):
+    """本地CPU向量化后端：字符n-gram特征哈希 + TF-IDF
+
+    不依赖网络。每个字符n-gram经crc32哈希到固定维度（另取一位哈希值作为符号，
+    减少冲突带来的偏差），词频做对数缩放后乘以按语料拟合的IDF，最后L2归一化，
+    因此向量点积即余弦相似度。整批文本的特征在一次bincount中汇总。
+    """
+
+    VERSION = 1
+
+    def __init__(self, dimension=512, ngram_range=(1, 3), idf=None, cache_size=1 << 20):
+        """初始化后端
+
+        Args:
+            dimension: 向量维度
+            ngram_range: 字符n-gram的长度范围（闭区间）
+            idf: 每个哈希桶的IDF权重，None表示不加权
+            cache_size: n-gram哈希结果缓存的最大条目数
+        """
+        self.dimension = int(dimension)
+        self.ngram_range = tuple(ngram_range)
+        self.idf = None if idf is None else np.asarray(idf, dtype=np.float32)
+        self.cache_size = cache_size
+        self._hash_cache = {}
+        self.model_id = f"local-hashed-ngram-v{self.VERSION}-d{self.dimension}-n{self.ngram_range[0]}{self.ngram_range[1]}"
+        if self.idf is not None:
+            self.model_id += "-idf" + format(zlib.crc32(self.idf.tobytes()), "08x")
+
+    @staticmethod
+    def _prepare(text):
+        """规范化全角/半角并统一为小写"""
+        return unicodedata.normalize("NFKC", text or "").lower()
+
+    def _features(self, text):
+        """返回文本全部n-gram对应的(桶, 符号)列表"""
+        text = self._prepare(text)
+        cache = self._hash_cache
+        buckets = []
+        signs = []
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for start in range(len(text) - n + 1):
+                gram = text[start:start + n]
+                hashed = cache.get(gram)
+                if hashed is None:
+                    value = zlib.crc32(gram.encode("utf-8"))
+                    hashed = (value % self.dimension, 1.0 if value & 0x80000000 else -1.0)
+                    if len(cache) < self.cache_size:
+                        cache[gram] = hashed
+                buckets.append(hashed[0])
+                signs.append(hashed[1])
+        return buckets, signs
+
+    def _term_matrix(self, texts):
+        """统计每条文本在各哈希桶上的带符号词频"""
+        rows, buckets, signs = [], [], []
+        for row, text in enumerate(texts):
+            text_buckets, text_signs = self._features(text)
+            rows.extend([row] * len(text_buckets))
+            buckets.extend(text_buckets)
+            signs.extend(text_signs)
+        flat = np.asarray(rows, dtype=np.int64) * self.dimension + np.asarray(buckets, dtype=np.int64)
+        counts = np.bincount(flat, weights=np.asarray(signs, dtype=np.float64), minlength=len(texts) * self.dimension)
+        return counts.reshape(len(texts), self.dimension).astype(np.float32)
+
+    def embed_batch(self, texts):
+        """批量将文本转换为L2归一化的向量
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            numpy.ndarray: 形状为(len(texts), dimension)的float32矩阵
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        matrix = self._term_matrix(texts)
+        # 对数词频：保留符号，抑制高频n-gram
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        if self.idf is not None:
+            matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def fit(self, texts):
+        """按语料拟合每个哈希桶的IDF权重
+
+        Args:
+            texts: 语料文本列表（通常为集合中用于建索引的文本）
+
+        Returns:
+            HashedNgramEmbedding: 带IDF权重的新后端
+        """
+        document_frequency = np.zeros(self.dimension, dtype=np.float64)
+        batch_size = 4096
+        for start in range(0, len(texts), batch_size):
+            matrix = self._term_matrix(texts[start:start + batch_size])
+            document_frequency += (matrix != 0).sum(axis=0)
+        idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+        return HashedNgramEmbedding(self.dimension, self.ngram_range, idf)
+
+    def save(self, path):
+        """保存后端参数，建索引和查询必须使用同一组参数
+
+        Args:
+            path: 保存目录
+        """
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "embedder.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "type": "hashed_ngram",
+                "dimension": self.dimension,
+                "ngram_range": list(self.ngram_range),
+                "has_idf": self.idf is not None
+            }, f)
+        if self.idf is not None:
+            np.save(os.path.join(path, "embedder_idf.npy"), self.idf)
+
+    @classmethod
+    def load(cls, path):
+        """读取save保存的后端参数
+
+        Args:
+            path: 保存目录
+
+        Returns:
+            HashedNgramEmbedding: 后端
+        """
+        with open(os.path.join(path, "embedder.json"), "r", encoding="utf-8") as f:
+            params = json.load(f)
+        idf = np.load(os.path.join(path, "embedder_idf.npy")) if params.get("has_idf") else None
+        return cls(params["dimension"], params["ngram_range"], idf)
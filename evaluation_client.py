@@ -0,0 +1,135 @@
+"""评估守护进程的命令行客户端
+
+通过Unix域套接字把(论文选题, 变量设置, 实证模型)发送给evaluation_daemon.py，读取返回的报告路径或报告内容。
+只依赖标准库，不导入检索SDK，启动开销在毫秒级。
+
+用法：
+    python evaluation_client.py "数字经济对碳排放的影响" "城镇化水平、外商投资" "双重差分模型"
+    python evaluation_client.py "数字经济对碳排放的影响" "城镇化水平" --content > report.md
+    python evaluation_client.py "数字经济对碳排放的影响" "城镇化水平" --priority batch --tenant teacher01
+    python evaluation_client.py --stats
+
+协议：每条消息为一行JSON（UTF-8）。请求为
+    {"command": "evaluate", "paper_topic": ..., "variable_settings": ..., "empirical_model": ...,
+     "output_file": 可选, "content": 是否返回报告内容, "priority": "interactive"或"batch", "tenant": 租户}
+或{"command": "stats"}；守护进程依次返回若干事件行：
+    {"event": "chunk", "data": 报告内容片段}      （content为true时）
+    {"event": "done", "report_path": ..., "elapsed": 秒, "queued": 排队秒数}
+    {"event": "stats", ...}
+    {"event": "error", "message": ...}
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+
+# 默认套接字路径，可通过环境变量EVALUATION_DAEMON_SOCKET修改
+DEFAULT_SOCKET_PATH = os.environ.get("EVALUATION_DAEMON_SOCKET", "/tmp/topic_evaluation.sock")
+
+
+def request_events(payload, socket_path=DEFAULT_SOCKET_PATH, timeout=None):
+    """发送一条请求并逐条读取守护进程返回的事件
+
+    Args:
+        payload: 请求字典
+        socket_path: 守护进程的套接字路径
+        timeout: 读取超时秒数，None表示一直等待
+
+    Yields:
+        dict: 事件字典
+
+    Raises:
+        OSError: 无法连接守护进程或连接中断
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as stream:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def evaluate(paper_topic, variable_settings, empirical_model="", output_file=None, content=False,
+             socket_path=DEFAULT_SOCKET_PATH, timeout=None, on_chunk=None, priority="interactive", tenant=None):
+    """请求守护进程完成一次评估并生成报告
+
+    Args:
+        paper_topic: 论文选题
+        variable_settings: 变量设置
+        empirical_model: 实证模型
+        output_file: 报告输出路径（守护进程所在机器上的路径），默认为守护进程的默认路径
+        content: 是否返回报告内容
+        socket_path: 守护进程的套接字路径
+        timeout: 读取超时秒数
+        on_chunk: 收到报告内容片段时的回调，默认拼接后放在返回值的content中
+        priority: 调度优先级，interactive（交互式）或batch（批量任务）
+        tenant: 租户（用户）标识，同一优先级内按租户公平排队，默认为守护进程的default
+
+    Returns:
+        dict: done事件（包含report_path、elapsed、queued，content为True且未提供on_chunk时包含content）
+
+    Raises:
+        OSError: 无法连接守护进程
+        RuntimeError: 守护进程返回错误
+    """
+    payload = {"command": "evaluate", "paper_topic": paper_topic, "variable_settings": variable_settings,
+               "empirical_model": empirical_model, "output_file": output_file, "content": content,
+               "priority": priority, "tenant": tenant}
+    chunks = []
+    for event in request_events(payload, socket_path, timeout):
+        if event["event"] == "chunk":
+            (on_chunk or chunks.append)(event["data"])
+        elif event["event"] == "error":
+            raise RuntimeError(event.get("message", "守护进程返回错误"))
+        elif event["event"] == "done":
+            if content and on_chunk is None:
+                event["content"] = "".join(chunks)
+            return event
+    raise RuntimeError("守护进程未返回结果就关闭了连接")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评估守护进程的命令行客户端")
+    parser.add_argument("paper_topic", nargs="?", help="论文选题")
+    parser.add_argument("variable_settings", nargs="?", default="", help="变量设置")
+    parser.add_argument("empirical_model", nargs="?", default="", help="实证模型")
+    parser.add_argument("--output", help="报告输出路径（默认由守护进程决定）")
+    parser.add_argument("--content", action="store_true", help="把报告内容输出到标准输出，而不是报告路径")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="守护进程的套接字路径")
+    parser.add_argument("--timeout", type=float, help="等待结果的超时秒数")
+    parser.add_argument("--priority", choices=("interactive", "batch"), default="interactive",
+                        help="调度优先级，批量脚本请使用batch")
+    parser.add_argument("--tenant", help="租户（用户）标识，同一优先级内按租户公平排队")
+    parser.add_argument("--stats", action="store_true", help="输出守护进程的调度、缓存和请求统计")
+    args = parser.parse_args()
+
+    try:
+        if args.stats:
+            for event in request_events({"command": "stats"}, args.socket, args.timeout):
+                print(json.dumps(event, ensure_ascii=False, indent=2))
+            return 0
+        if not args.paper_topic:
+            parser.error("缺少论文选题")
+        write = sys.stdout.write if args.content else None
+        result = evaluate(args.paper_topic, args.variable_settings, args.empirical_model, args.output, args.content,
+                          args.socket, args.timeout, on_chunk=write, priority=args.priority, tenant=args.tenant)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"无法连接评估守护进程（{args.socket}），请先运行 python evaluation_daemon.py", file=sys.stderr)
+        return 2
+    except (OSError, RuntimeError) as e:
+        print(f"评估失败: {str(e)}", file=sys.stderr)
+        return 1
+
+    if args.content:
+        sys.stdout.flush()
+    else:
+        print(result["report_path"])
+    print(f"耗时 {result['elapsed'] * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
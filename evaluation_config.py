@@ -0,0 +1,292 @@
+"""评估配置快照
+
+一次评估用到的评估提示词、各集合的检索数量（topk）、分数阈值、检索前过滤条件、词法检索参数和集合名称
+在加载时汇总为一个不可变的ConfigSnapshot，并计算内容摘要config_hash：
+
+    - 默认值来自SearchConfig和APIConfig
+    - EVALUATION_SETTINGS_PATH（默认为项目目录下的evaluation_settings.json，可不存在）中的
+      {"search": {"JOURNAL_MAX_SCORE": 0.4, ...}, "collections": {"journal": "journal_new", ...}}覆盖默认值
+    - 评估提示词来自EVALUATION_PROMPTS_PATH（默认为项目目录下的evaluation_prompts.json）
+
+覆盖值按默认值的类型和范围校验（检索数量为正整数，分数阈值为0到1之间的数，JOURNAL_LEVELS/CFP_JOURNALS为
+字符串列表，集合名称为非空字符串等）。current_config()返回当前快照，最多每EVALUATION_CONFIG_CHECK_INTERVAL秒
+检查一次两个文件的修改时间，变化时重新加载（文件不完整、格式错误或取值无效时保留原快照）。快照的config_hash参与search_config_hash，
+进而进入评估结果缓存和存储的键，阈值或提示词修改后不会命中按旧配置计算的得分。
+一次评估开始时取一次快照并在各维度间传递，评估过程中配置重新加载也不会混用两份配置。
+
+代码中直接修改SearchConfig/APIConfig的默认值后需要调用reload_config()。
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from structured_log import get_logger
+
+log = get_logger("evaluation_config")
+
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROMPTS_PATH = os.environ.get("EVALUATION_PROMPTS_PATH", os.path.join(_MODULE_DIR, "evaluation_prompts.json"))
+SETTINGS_PATH = os.environ.get("EVALUATION_SETTINGS_PATH", os.path.join(_MODULE_DIR, "evaluation_settings.json"))
+# 检查配置文件修改时间的最小间隔（秒），0表示每次都检查
+CHECK_INTERVAL = float(os.environ.get("EVALUATION_CONFIG_CHECK_INTERVAL", "1"))
+
+# 快照中的检索配置项（SearchConfig中的同名属性为默认值）
+SEARCH_SETTINGS = (
+    "MAX_JOURNAL_RESULTS", "MAX_DATASET_RESULTS", "MAX_CFP_RESULTS", "MAX_SKJJ_RESULTS",
+    "JOURNAL_MAX_SCORE", "DATASET_MAX_SCORE", "CFP_MAX_SCORE", "SKJJ_MAX_SCORE",
+    "JOURNAL_LEVELS", "CFP_JOURNALS", "DATASET_YEAR_RANGE",
+    "DATASET_LEXICAL_SEARCH", "DATASET_EXACT_MATCH_SCORE", "DATASET_LEXICAL_WEIGHT",
+)
+
+
+
+def _is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _is_unit_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and 0 <= value <= 1
+
+
+def _is_string_list(value):
+    return value is None or (isinstance(value, list) and all(isinstance(item, str) and item for item in value))
+
+
+def _is_year_range(value):
+    return value is None or (isinstance(value, list) and len(value) == 2
+                             and all(isinstance(year, int) and not isinstance(year, bool) for year in value)
+                             and value[0] <= value[1])
+
+
+# 检索配置项覆盖值的校验：(判断函数, 期望的取值)
+_SEARCH_CHECKS = dict(
+    {name: (_is_count, "正整数") for name in SEARCH_SETTINGS if name.startswith("MAX_")},
+    **{name: (_is_unit_number, "0到1之间的数") for name in SEARCH_SETTINGS if name.endswith("_MAX_SCORE")},
+    JOURNAL_LEVELS=(_is_string_list, "非空字符串的列表或null"),
+    CFP_JOURNALS=(_is_string_list, "非空字符串的列表或null"),
+    DATASET_YEAR_RANGE=(_is_year_range, "[起始年份, 结束年份]或null"),
+    DATASET_LEXICAL_SEARCH=(lambda value: isinstance(value, bool), "true或false"),
+    DATASET_EXACT_MATCH_SCORE=(_is_unit_number, "0到1之间的数"),
+    DATASET_LEXICAL_WEIGHT=(_is_unit_number, "0到1之间的数"),
+)
+
+# 集合别名到APIConfig中默认集合名称属性的映射
+COLLECTION_SETTINGS = {
+    "journal": "JOURNAL_COLLECTION",
+    "cfp": "CFP_COLLECTION",
+    "dataset": "DATASET_COLLECTION",
+    "skjj": "SKJJ_COLLECTION",
+}
+
+# 评估维度使用的集合别名、检索数量和分数阈值配置项
+_DIMENSION_SETTINGS = {
+    "journal": ("journal", "MAX_JOURNAL_RESULTS", "JOURNAL_MAX_SCORE"),
+    "journal_model": ("journal", "MAX_JOURNAL_RESULTS", "JOURNAL_MAX_SCORE"),
+    "dataset": ("dataset", "MAX_DATASET_RESULTS", "DATASET_MAX_SCORE"),
+    "cfp": ("cfp", "MAX_CFP_RESULTS", "CFP_MAX_SCORE"),
+    "skjj": ("skjj", "MAX_SKJJ_RESULTS", "SKJJ_MAX_SCORE"),
+}
+
+
+def _freeze(value):
+    """将JSON值转换为只读结构：dict为MappingProxyType，list为tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """_freeze的逆过程，用于计算摘要"""
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class ConfigSnapshot(namedtuple("ConfigSnapshot", ["prompts", "search", "collections", "config_hash",
+                                                   "prompts_hash", "sources", "loaded_at"])):
+    """不可变的评估配置
+
+    Attributes:
+        prompts: 评估提示词（只读映射）
+        search: 检索配置项（只读映射，键见SEARCH_SETTINGS）
+        collections: 集合别名（journal/cfp/dataset/skjj）到集合名称的只读映射
+        config_hash: 提示词、检索配置和集合名称的内容摘要
+        prompts_hash: 评估提示词的内容摘要
+        sources: 加载时各配置文件的(修改时间, 大小)，文件不存在时为None
+        loaded_at: 加载时间
+    """
+
+    __slots__ = ()
+
+    def collection(self, dimension):
+        """评估维度检索的集合名称"""
+        return self.collections[_DIMENSION_SETTINGS[dimension][0]]
+
+    def topk(self, dimension):
+        """评估维度的检索数量"""
+        return self.search[_DIMENSION_SETTINGS[dimension][1]]
+
+    def threshold(self, dimension):
+        """评估维度的分数阈值（score大于等于阈值的记录计入）"""
+        return self.search[_DIMENSION_SETTINGS[dimension][2]]
+
+    def collection_versions(self):
+        """快照中各集合的版本号，版本号仍由APIConfig.COLLECTION_VERSIONS配置"""
+        from vector_search_core import APIConfig
+        return {name: str(APIConfig.COLLECTION_VERSIONS.get(name, "1")) for name in self.collections.values()}
+
+
+def _file_state(path):
+    """文件的(修改时间, 大小)，不存在时为None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_json(path, state):
+    """读取JSON配置文件，文件不存在时返回空dict
+
+    Raises:
+        OSError: 无法读取
+        ValueError: 不是合法的JSON对象
+    """
+    if state is None:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        value = json.load(f)
+    if not isinstance(value, dict):
+        raise ValueError(f"配置文件应为JSON对象: {path}")
+    return value
+
+
+def _content_hash(value):
+    payload = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _validate_overrides(overrides, settings_path):
+    """检查覆盖文件的配置项名称和取值
+
+    Raises:
+        ValueError: 包含未知的配置项或取值无效
+    """
+    for section in ("search", "collections"):
+        if not isinstance(overrides.get(section, {}), dict):
+            raise ValueError(f"配置项{section}应为JSON对象（{settings_path}）")
+    unknown = set(overrides) - {"search", "collections"}
+    unknown |= set(overrides.get("search", {})) - set(SEARCH_SETTINGS)
+    unknown |= set(overrides.get("collections", {})) - set(COLLECTION_SETTINGS)
+    if unknown:
+        raise ValueError(f"未知的配置项: {sorted(unknown)}（{settings_path}）")
+
+    invalid = [f"{name}={value!r}（应为{_SEARCH_CHECKS[name][1]}）"
+               for name, value in overrides.get("search", {}).items() if not _SEARCH_CHECKS[name][0](value)]
+    invalid += [f"collections.{alias}={value!r}（应为非空字符串）"
+                for alias, value in overrides.get("collections", {}).items() if not (isinstance(value, str) and value)]
+    if invalid:
+        raise ValueError(f"配置项取值无效: {'；'.join(invalid)}（{settings_path}）")
+
+
+def load_snapshot(prompts_path=None, settings_path=None):
+    """从默认值和配置文件构建快照
+
+    Args:
+        prompts_path: 评估提示词文件，默认为PROMPTS_PATH
+        settings_path: 检索配置覆盖文件，默认为SETTINGS_PATH
+
+    Returns:
+        ConfigSnapshot: 配置快照
+
+    Raises:
+        OSError: 配置文件无法读取
+        ValueError: 配置文件格式错误、包含未知的配置项或取值无效
+    """
+    from search_functions import SearchConfig
+    from vector_search_core import APIConfig
+    prompts_path = prompts_path or PROMPTS_PATH
+    settings_path = settings_path or SETTINGS_PATH
+    sources = {prompts_path: _file_state(prompts_path), settings_path: _file_state(settings_path)}
+
+    prompts = _read_json(prompts_path, sources[prompts_path])
+    if sources[prompts_path] is None:
+        log.error("prompts_missing", "提示词文件不存在: {path}", path=prompts_path)
+    overrides = _read_json(settings_path, sources[settings_path])
+    _validate_overrides(overrides, settings_path)
+
+    search = {name: getattr(SearchConfig, name) for name in SEARCH_SETTINGS}
+    search.update(overrides.get("search", {}))
+    collections = {alias: getattr(APIConfig, attribute) for alias, attribute in COLLECTION_SETTINGS.items()}
+    collections.update(overrides.get("collections", {}))
+
+    prompts_hash = _content_hash(prompts)
+    search = _freeze(search)
+    config_hash = _content_hash({"prompts": prompts_hash, "search": _thaw(search), "collections": collections})
+    return ConfigSnapshot(_freeze(prompts), search, _freeze(collections), config_hash, prompts_hash,
+                          MappingProxyType(sources), time.time())
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _changed(snapshot):
+    return any(_file_state(path) != state for path, state in snapshot.sources.items())
+
+
+def current_config():
+    """当前的配置快照，配置文件修改后重新加载
+
+    Returns:
+        ConfigSnapshot: 配置快照
+    """
+    global _snapshot, _checked_at
+    snapshot = _snapshot
+    now = time.monotonic()
+    if snapshot is not None and now - _checked_at < CHECK_INTERVAL:
+        return snapshot
+    with _lock:
+        if _snapshot is not None and now - _checked_at < CHECK_INTERVAL:
+            return _snapshot
+        _checked_at = now
+        if _snapshot is None or _changed(_snapshot):
+            try:
+                snapshot = load_snapshot()
+            except (OSError, ValueError) as e:
+                if _snapshot is None:
+                    raise
+                log.error("config_reload_failed", "重新加载评估配置失败，继续使用原配置: {error}", error=e)
+                return _snapshot
+            if _snapshot is not None and snapshot.config_hash != _snapshot.config_hash:
+                log.info("config_reloaded", "评估配置已重新加载: {old} -> {new}", old=_snapshot.config_hash[:12],
+                         new=snapshot.config_hash[:12])
+            _snapshot = snapshot
+        return _snapshot
+
+
+def reload_config():
+    """立即重新加载配置快照
+
+    Returns:
+        ConfigSnapshot: 新的配置快照
+
+    Raises:
+        OSError: 配置文件无法读取
+        ValueError: 配置文件格式错误
+    """
+    global _snapshot, _checked_at
+    with _lock:
+        _snapshot = load_snapshot()
+        _checked_at = time.monotonic()
+        return _snapshot
@@ -0,0 +1,237 @@
+"""常驻评估守护进程
+
+每次运行python report_generator.py都要重新启动解释器、导入SDK、创建客户端，且各级缓存都是空的。
+守护进程常驻运行，进程内保持AsyncVectorSearchEngine（HTTP连接池和本地检索客户端）、向量缓存、
+检索缓存、评估缓存以及本地索引和变量可用性表，通过Unix域套接字接收evaluation_client.py的请求，
+返回报告路径或以分块方式返回报告内容。命中评估缓存的请求端到端只需几毫秒。
+
+协议见evaluation_client.py。多个请求并发处理，相同输入的并发评估只执行一次。
+评估按请求的priority（interactive/batch）和tenant经评估调度器（evaluation_scheduler.py）排队，
+批量任务运行时交互式请求仍有保留的名额并优先调度。
+
+用法：
+    python evaluation_daemon.py
+    python evaluation_daemon.py --socket /run/topic_evaluation.sock --warmup-log requests.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import time
+
+from evaluation_client import DEFAULT_SOCKET_PATH
+from evaluation_scheduler import get_scheduler
+from async_search import AsyncVectorSearchEngine
+from report_generator import render_research_report, write_report
+from search_functions import (
+    _EMBEDDING_CACHE, _SEARCH_CACHE, _EVALUATION_CACHE, availability_table, lexical_collection, evaluation_digest
+)
+from evaluation_config import current_config
+from vector_search_core import APIConfig
+from rate_limiter import rate_limiter_stats
+
+# 报告内容每个分块的字符数
+CHUNK_SIZE = 64 * 1024
+# 单条请求的最大字节数
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+def _remove_stale_socket(socket_path):
+    """删除上次异常退出遗留的套接字文件
+
+    Raises:
+        RuntimeError: 已有守护进程在监听该路径
+    """
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"评估守护进程已在运行: {socket_path}")
+
+
+class EvaluationDaemon:
+    """监听Unix域套接字的评估服务"""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, engine=None, scheduler=None):
+        """初始化守护进程
+
+        Args:
+            socket_path: 监听的套接字路径
+            engine: AsyncVectorSearchEngine，默认在start()时创建
+            scheduler: EvaluationScheduler，默认为进程内共享的调度器
+        """
+        self.socket_path = socket_path
+        self.engine = engine
+        self.scheduler = scheduler or get_scheduler()
+        self.started_at = None
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self._server = None
+
+    async def start(self):
+        """预加载本地数据并开始监听
+
+        Raises:
+            RuntimeError: 已有守护进程在监听同一路径
+        """
+        self.engine = self.engine or AsyncVectorSearchEngine()
+        await asyncio.to_thread(self.preload)
+        _remove_stale_socket(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path, limit=MAX_REQUEST_BYTES)
+        os.chmod(self.socket_path, 0o600)
+        self.started_at = time.time()
+        print(f"评估守护进程已启动: {self.socket_path}")
+
+    def preload(self):
+        """加载首个请求会用到的本地数据：变量可用性表、词法索引和本地检索集合"""
+        config = current_config()
+        availability_table(config)
+        if config.search["DATASET_LEXICAL_SEARCH"]:
+            lexical_collection(config.collection("dataset"))
+        if APIConfig.SEARCH_BACKEND == "local":
+            for collection_name in config.collection_versions():
+                self.engine.local_client(collection_name)
+
+    async def close(self):
+        """停止监听，关闭连接池并删除套接字文件"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.engine is not None:
+            await self.engine.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        print("评估守护进程已停止")
+
+    async def serve_forever(self):
+        """运行直到收到SIGINT或SIGTERM"""
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        await self.start()
+        try:
+            await stop.wait()
+        finally:
+            await self.close()
+
+    def stats(self):
+        """返回请求、调度、缓存和限流统计"""
+        return {
+            "uptime": time.time() - self.started_at if self.started_at else 0.0,
+            "requests": self.requests,
+            "errors": self.errors,
+            "active": self.active,
+            "scheduler": self.scheduler.stats(),
+            "caches": {
+                "embedding": _EMBEDDING_CACHE.stats(),
+                "search": _SEARCH_CACHE.stats(),
+                "evaluation": _EVALUATION_CACHE.stats(),
+            },
+            "rate_limiters": rate_limiter_stats(),
+        }
+
+    @staticmethod
+    async def _send(writer, event):
+        writer.write(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        """处理一个连接上的一条请求"""
+        try:
+            try:
+                request = json.loads(await reader.readline())
+                if not isinstance(request, dict):
+                    raise ValueError("请求必须是JSON对象")
+            except (ValueError, asyncio.LimitOverrunError) as e:
+                await self._send(writer, {"event": "error", "message": f"无效的请求: {str(e)}"})
+                return
+
+            command = request.get("command", "evaluate")
+            if command == "stats":
+                await self._send(writer, dict(self.stats(), event="stats"))
+            elif command == "evaluate":
+                await self._evaluate(request, writer)
+            else:
+                await self._send(writer, {"event": "error", "message": f"未知的命令: {command}"})
+        except ConnectionError:
+            # 客户端已断开
+            pass
+        except Exception as e:
+            self.errors += 1
+            print(f"处理请求时发生异常: {str(e)}")
+            try:
+                await self._send(writer, {"event": "error", "message": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _evaluate(self, request, writer):
+        """执行评估，写入报告并返回报告路径或报告内容"""
+        started = time.perf_counter()
+        self.requests += 1
+        self.active += 1
+        try:
+            paper_topic = request.get("paper_topic")
+            if not paper_topic:
+                await self._send(writer, {"event": "error", "message": "缺少论文选题"})
+                return
+            queued = time.perf_counter()
+            async with self.scheduler.slot_async(request.get("priority") or "interactive",
+                                                 request.get("tenant") or "default"):
+                queued = time.perf_counter() - queued
+                score_results = await self.engine.calculate_research_score(
+                    paper_topic, request.get("variable_settings") or "", request.get("empirical_model") or "")
+            if not score_results:
+                self.errors += 1
+                await self._send(writer, {"event": "error", "message": "评估失败，详见守护进程日志"})
+                return
+
+            report_content = render_research_report(paper_topic, score_results)
+            report_path = None
+            if request.get("output_file") or not request.get("content"):
+                digest = evaluation_digest(paper_topic, request.get("variable_settings") or "",
+                                           request.get("empirical_model") or "")
+                report_path = await asyncio.to_thread(write_report, report_content, request.get("output_file"), digest)
+            if request.get("content"):
+                for start in range(0, len(report_content), CHUNK_SIZE):
+                    await self._send(writer, {"event": "chunk", "data": report_content[start:start + CHUNK_SIZE]})
+            await self._send(writer, {"event": "done", "report_path": report_path,
+                                      "elapsed": time.perf_counter() - started, "queued": queued})
+        finally:
+            self.active -= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻评估守护进程")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="监听的套接字路径")
+    parser.add_argument("--warmup-log", help="启动后按该JSONL请求日志在后台预热缓存（见cache_warmup.py）")
+    parser.add_argument("--warmup-time-budget", type=float, help="预热的时间预算（秒）")
+    args = parser.parse_args()
+
+    if args.warmup_log:
+        from cache_warmup import start_background_warmup
+        start_background_warmup(args.warmup_log, time_budget=args.warmup_time_budget)
+    try:
+        asyncio.run(EvaluationDaemon(args.socket).serve_forever())
+    except RuntimeError as e:
+        print(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""评估请求的优先级和按租户公平调度
+
+交互式的单个选题评估和整学期的批量评估共用同一份后端配额。调度器放在评估流程前面，
+限制同时进行的评估数，并决定排队的评估谁先执行：
+
+    - 优先级分为interactive（交互式）和batch（批量），有空闲名额时先调度interactive
+    - 每个优先级有并发上限；batch的上限小于总并发数，保证批量任务占满时交互式请求仍有名额
+    - slot/slot_async在名额内设置rate_limiter.request_priority，评估发出的后端调用在限流器中按同一优先级
+      分通道排队，交互式评估的调用不会排在已经排队的大量批量调用后面
+    - 同一优先级内按租户（用户）加权公平排队（起始时间公平排队，SFQ）：每个请求的虚拟起始时间为
+      max(该优先级的虚拟时间, 该租户上一个请求的虚拟结束时间)，结束时间再加1/权重，按起始时间调度，
+      提交了几千个批量请求的用户不会让其他用户的少量请求一直等待
+    - 防饿死：排队超过starvation_timeout秒的低优先级请求在下一个空闲名额上优先调度（仍受其并发上限约束）
+
+线程（slot）和协程（slot_async）共用同一个调度器：守护进程处理的请求和后台预热线程的评估一起排队。
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from rate_limiter import PRIORITY_LANES, request_priority
+
+# 优先级，从高到低
+PRIORITY_CLASSES = PRIORITY_LANES
+
+# 默认配置，可通过环境变量EVALUATION_SCHEDULER以JSON覆盖，
+# 如{"concurrency": 32, "class_limits": {"batch": 8}, "tenant_weights": {"teacher": 2}}
+DEFAULT_SCHEDULER_SETTINGS = {
+    "concurrency": 16,
+    "class_limits": {"interactive": 16, "batch": 12},
+    "tenant_weights": {},
+    "starvation_timeout": 30.0,
+}
+
+# 租户虚拟结束时间表超过该条目数时清理已落后于虚拟时间的租户
+_TENANT_PRUNE_SIZE = 1024
+
+
+class _Waiter:
+    """排队中的一次评估"""
+
+    __slots__ = ("priority", "tenant", "start_tag", "enqueued", "state", "event", "loop", "future")
+
+    def __init__(self, priority, tenant, start_tag, enqueued):
+        self.priority = priority
+        self.tenant = tenant
+        self.start_tag = start_tag
+        self.enqueued = enqueued
+        # waiting/granted/abandoned
+        self.state = "waiting"
+        self.event = None
+        self.loop = None
+        self.future = None
+
+
+class EvaluationScheduler:
+    """按优先级、并发上限和租户权重分配评估名额"""
+
+    def __init__(self, concurrency=16, class_limits=None, tenant_weights=None, starvation_timeout=30.0):
+        """初始化调度器
+
+        Args:
+            concurrency: 同时进行的评估总数上限
+            class_limits: 各优先级的并发上限，未列出的优先级不超过concurrency
+            tenant_weights: 租户权重，未列出的租户权重为1
+            starvation_timeout: 低优先级请求排队超过该秒数后优先调度，None表示不提升
+        """
+        self.concurrency = concurrency
+        self.class_limits = {priority: min(concurrency, (class_limits or {}).get(priority, concurrency))
+                             for priority in PRIORITY_CLASSES}
+        self.tenant_weights = dict(tenant_weights or {})
+        self.starvation_timeout = starvation_timeout
+
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._queues = {priority: [] for priority in PRIORITY_CLASSES}
+        # 低优先级请求的到达顺序，用于防饿死
+        self._arrivals = {priority: deque() for priority in PRIORITY_CLASSES[1:]}
+        self._virtual_time = {priority: 0.0 for priority in PRIORITY_CLASSES}
+        self._tenant_finish = {priority: {} for priority in PRIORITY_CLASSES}
+        self._waiting = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._running = {priority: 0 for priority in PRIORITY_CLASSES}
+
+        # 统计信息
+        self._granted = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._promoted = 0
+        self._total_wait = {priority: 0.0 for priority in PRIORITY_CLASSES}
+        self._max_wait = {priority: 0.0 for priority in PRIORITY_CLASSES}
+
+    def _enqueue(self, priority, tenant):
+        """加入排队并尝试调度（调用方持有锁）
+
+        Raises:
+            ValueError: 未知的优先级
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"未知的评估优先级: {priority}，可选: {PRIORITY_CLASSES}")
+        finish = self._tenant_finish[priority]
+        start_tag = max(self._virtual_time[priority], finish.get(tenant, 0.0))
+        finish[tenant] = start_tag + 1.0 / self.tenant_weights.get(tenant, 1.0)
+        if len(finish) > _TENANT_PRUNE_SIZE:
+            virtual_time = self._virtual_time[priority]
+            for name in [name for name, tag in finish.items() if tag <= virtual_time]:
+                del finish[name]
+
+        waiter = _Waiter(priority, tenant, start_tag, time.monotonic())
+        heapq.heappush(self._queues[priority], (start_tag, next(self._sequence), waiter))
+        if priority != PRIORITY_CLASSES[0]:
+            self._arrivals[priority].append(waiter)
+        self._waiting[priority] += 1
+        return waiter
+
+    def _next_waiter(self, now):
+        """选出下一个获得名额的排队请求（调用方持有锁）"""
+        # 排队过久的低优先级请求先于高优先级调度，多个时最早到达的优先
+        if self.starvation_timeout is not None:
+            starved = None
+            for priority in PRIORITY_CLASSES[1:]:
+                arrivals = self._arrivals[priority]
+                while arrivals and arrivals[0].state != "waiting":
+                    arrivals.popleft()
+                if (arrivals and self._running[priority] < self.class_limits[priority]
+                        and now - arrivals[0].enqueued >= self.starvation_timeout
+                        and (starved is None or arrivals[0].enqueued < starved.enqueued)):
+                    starved = arrivals[0]
+            if starved is not None:
+                self._promoted += 1
+                return starved
+
+        for priority in PRIORITY_CLASSES:
+            if self._running[priority] >= self.class_limits[priority]:
+                continue
+            queue = self._queues[priority]
+            while queue and queue[0][2].state != "waiting":
+                heapq.heappop(queue)
+            if queue:
+                return queue[0][2]
+        return None
+
+    def _dispatch(self):
+        """把空闲名额分配给排队请求（调用方持有锁）"""
+        now = time.monotonic()
+        while sum(self._running.values()) < self.concurrency:
+            waiter = self._next_waiter(now)
+            if waiter is None:
+                return
+            priority = waiter.priority
+            waiter.state = "granted"
+            self._waiting[priority] -= 1
+            self._running[priority] += 1
+            self._virtual_time[priority] = max(self._virtual_time[priority], waiter.start_tag)
+            waited = now - waiter.enqueued
+            self._granted[priority] += 1
+            self._total_wait[priority] += waited
+            self._max_wait[priority] = max(self._max_wait[priority], waited)
+            if waiter.event is not None:
+                waiter.event.set()
+            else:
+                waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+
+    def _abandon(self, waiter):
+        """放弃排队；已获得名额时归还（调用方持有锁）"""
+        if waiter.state == "granted":
+            self._running[waiter.priority] -= 1
+            self._dispatch()
+        elif waiter.state == "waiting":
+            self._waiting[waiter.priority] -= 1
+        waiter.state = "abandoned"
+
+    def acquire(self, priority="interactive", tenant="default", timeout=None):
+        """排队获取一个评估名额
+
+        Args:
+            priority: 优先级，见PRIORITY_CLASSES
+            tenant: 租户（用户）标识
+            timeout: 最长等待秒数，None表示一直等待
+
+        Returns:
+            名额凭据，用完后传给release
+
+        Raises:
+            ValueError: 未知的优先级
+            TimeoutError: 超时仍未获得名额
+        """
+        with self._lock:
+            waiter = self._enqueue(priority, tenant)
+            waiter.event = threading.Event()
+            self._dispatch()
+        try:
+            if waiter.event.wait(timeout):
+                return waiter
+        except BaseException:
+            with self._lock:
+                self._abandon(waiter)
+            raise
+        with self._lock:
+            if waiter.state == "granted":
+                return waiter
+            self._abandon(waiter)
+        raise TimeoutError(f"等待评估名额超时（{priority}/{tenant}）")
+
+    async def acquire_async(self, priority="interactive", tenant="default"):
+        """在事件循环中排队获取一个评估名额，等待期间不阻塞线程
+
+        Args:
+            priority: 优先级，见PRIORITY_CLASSES
+            tenant: 租户（用户）标识
+
+        Returns:
+            名额凭据，用完后传给release
+
+        Raises:
+            ValueError: 未知的优先级
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            waiter = self._enqueue(priority, tenant)
+            waiter.loop = loop
+            waiter.future = loop.create_future()
+            self._dispatch()
+        try:
+            await waiter.future
+        except BaseException:
+            # 取消时可能已经获得名额，_abandon会归还
+            with self._lock:
+                self._abandon(waiter)
+            raise
+        return waiter
+
+    def release(self, waiter):
+        """归还评估名额"""
+        with self._lock:
+            if waiter.state == "granted":
+                self._running[waiter.priority] -= 1
+                waiter.state = "abandoned"
+                self._dispatch()
+
+    @contextmanager
+    def slot(self, priority="interactive", tenant="default", timeout=None):
+        """获取名额并在退出时归还的上下文管理器，名额内的后端调用按priority在限流器中排队"""
+        waiter = self.acquire(priority, tenant, timeout)
+        token = request_priority.set(priority)
+        try:
+            yield waiter
+        finally:
+            request_priority.reset(token)
+            self.release(waiter)
+
+    @asynccontextmanager
+    async def slot_async(self, priority="interactive", tenant="default"):
+        """slot的协程版本"""
+        waiter = await self.acquire_async(priority, tenant)
+        token = request_priority.set(priority)
+        try:
+            yield waiter
+        finally:
+            request_priority.reset(token)
+            self.release(waiter)
+
+    def stats(self):
+        """返回调度统计
+
+        Returns:
+            dict: 各优先级的排队数、执行数、并发上限和排队等待时间，以及防饿死提升次数
+        """
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "promoted": self._promoted,
+                "classes": {
+                    priority: {
+                        "limit": self.class_limits[priority],
+                        "waiting": self._waiting[priority],
+                        "running": self._running[priority],
+                        "granted": self._granted[priority],
+                        "avg_wait": (self._total_wait[priority] / self._granted[priority]
+                                     if self._granted[priority] else 0.0),
+                        "max_wait": self._max_wait[priority],
+                    }
+                    for priority in PRIORITY_CLASSES
+                },
+            }
+
+
+def _resolve(future):
+    """在事件循环线程中唤醒等待名额的协程（已取消的不处理）"""
+    if not future.done():
+        future.set_result(None)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """获取进程内共享的评估调度器
+
+    Returns:
+        EvaluationScheduler: 调度器
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            settings = dict(DEFAULT_SCHEDULER_SETTINGS)
+            settings.update(json.loads(os.environ.get("EVALUATION_SCHEDULER", "{}")))
+            settings["class_limits"] = dict(DEFAULT_SCHEDULER_SETTINGS["class_limits"], **settings["class_limits"])
+            _scheduler = EvaluationScheduler(**settings)
+        return _scheduler
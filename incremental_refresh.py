@@ -0,0 +1,140 @@
+import numpy as np
+
+from result_store import get_default_store
+from search_functions import (
+    EVALUATION_DIMENSIONS, run_dimension, build_score_results, canonicalize_inputs, SearchFailedError,
+    invalidate_dimension_queries, search_config_hash, evaluation_cache_key, _EVALUATION_CACHE
+)
+from evaluation_config import current_config
+
+
+def _normalize_rows(matrix):
+    """按行做L2归一化，零向量保持不变"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def find_affected_evaluations(deltas, collection_versions, config_hash=None, store=None):
+    """找出受集合增量影响的评估及其维度
+
+    新增文档：与已保存的查询向量计算余弦相似度，达到该查询的分数阈值
+    （与ResultProcessor.filter_results_by_score的判定一致）即认为会进入筛选结果；
+    删除文档：出现在已保存评估对应维度的筛选结果中即认为受影响；
+    没有查询向量的查询（词法精确匹配、变量可用性表或向量已被缓存淘汰）无法判断，集合有任何增量即认为受影响。
+
+    Args:
+        deltas: 集合名称到增量的映射，增量为{"added": {doc_id: vector}, "removed": [doc_id, ...]}
+        collection_versions: 增量之前的集合版本字典
+        config_hash: 检索配置摘要，默认为当前配置
+        store: 评估结果存储，默认使用get_default_store()
+
+    Returns:
+        dict: 规范化输入摘要到受影响维度集合的映射
+    """
+    store = store or get_default_store()
+    config_hash = config_hash or search_config_hash()
+    affected = {}
+
+    for collection, delta in deltas.items():
+        added = delta.get("added") or {}
+        if not added and not delta.get("removed"):
+            continue
+        queries = store.get_queries(collection, collection_versions, config_hash)
+        for query in queries:
+            if query["vector"] is None:
+                affected.setdefault(query["digest"], set()).add(query["dimension"])
+        queries = [query for query in queries if query["vector"] is not None]
+        if not added or not queries:
+            continue
+
+        query_matrix = _normalize_rows(np.asarray([query["vector"] for query in queries], dtype=np.float32))
+        doc_matrix = _normalize_rows(np.asarray(list(added.values()), dtype=np.float32))
+        thresholds = np.asarray([query["threshold"] for query in queries], dtype=np.float32)
+
+        # 每个查询与全部新增文档的最高相似度，一次矩阵乘法完成
+        best_scores = (query_matrix @ doc_matrix.T).max(axis=1)
+        for index in np.nonzero(best_scores >= thresholds)[0]:
+            query = queries[index]
+            affected.setdefault(query["digest"], set()).add(query["dimension"])
+
+    removed = {
+        collection: set(delta.get("removed") or [])
+        for collection, delta in deltas.items()
+        if delta.get("removed")
+    }
+    if removed:
+        config = current_config()
+        dimension_collections = {dimension: config.collection(dimension) for dimension in EVALUATION_DIMENSIONS}
+        for record in store.list_evaluations(collection_versions, config_hash):
+            result = record["result"]
+            for dimension, result_key in EVALUATION_DIMENSIONS.items():
+                removed_ids = removed.get(dimension_collections[dimension])
+                if not removed_ids:
+                    continue
+                if any(doc.get("id") in removed_ids for doc in result.get(result_key, [])):
+                    affected.setdefault(record["digest"], set()).add(dimension)
+
+    return affected
+
+
+def refresh_evaluations(deltas, collection_versions, new_collection_versions, store=None):
+    """集合更新后增量刷新已保存的评估结果
+
+    只有受增量影响的维度会重新检索，其余维度沿用已保存的结果；
+    不受影响的评估直接复制到新集合版本下，不调用任何检索服务；重新检索失败的评估不写入新集合版本，
+    之后由实时评估重新计算。
+    刷新完成后应将APIConfig.COLLECTION_VERSIONS切换为new_collection_versions。
+
+    Args:
+        deltas: 集合名称到增量的映射，格式见find_affected_evaluations
+        collection_versions: 增量之前的集合版本字典
+        new_collection_versions: 增量之后的集合版本字典
+        store: 评估结果存储，默认使用get_default_store()
+
+    Returns:
+        dict: 刷新统计，包含evaluations、refreshed、copied、failed和dimension_runs
+    """
+    store = store or get_default_store()
+    config = current_config()
+    config_hash = search_config_hash(config)
+    affected = find_affected_evaluations(deltas, collection_versions, config_hash, store)
+
+    summary = {"evaluations": 0, "refreshed": 0, "copied": 0, "failed": 0, "dimension_runs": 0}
+    for record in store.list_evaluations(collection_versions, config_hash):
+        summary["evaluations"] += 1
+        digest = record["digest"]
+        score_results = record["result"]
+        dimensions = affected.get(digest)
+
+        if dimensions:
+            inputs = canonicalize_inputs(record["paper_topic"], record["variable_settings"], record["empirical_model"])
+            invalidate_dimension_queries(inputs, dimensions, config)
+
+            dimension_outputs = {}
+            try:
+                for dimension, result_key in EVALUATION_DIMENSIONS.items():
+                    if dimension in dimensions:
+                        print(f"重新检索 {record['paper_topic']} 的 {dimension} 维度")
+                        summary["dimension_runs"] += 1
+                        dimension_outputs[dimension] = run_dimension(dimension, inputs, config)
+                    else:
+                        previous = score_results.get(result_key, [])
+                        dimension_outputs[dimension] = (len(previous), previous)
+            except SearchFailedError as e:
+                print(f"重新检索 {record['paper_topic']} 失败，不写入新集合版本: {str(e)}")
+                summary["failed"] += 1
+                _EVALUATION_CACHE.pop(evaluation_cache_key(digest, config_hash))
+                continue
+            score_results = build_score_results(dimension_outputs)
+            summary["refreshed"] += 1
+        else:
+            summary["copied"] += 1
+
+        store.put(digest, record, score_results, new_collection_versions, config_hash)
+        store.copy_queries(digest, collection_versions, new_collection_versions, config_hash)
+        _EVALUATION_CACHE.pop(evaluation_cache_key(digest, config_hash))
+
+    print(f"增量刷新完成: 共 {summary['evaluations']} 个评估，重新计算 {summary['refreshed']} 个，"
+          f"直接复制 {summary['copied']} 个，失败 {summary['failed']} 个，重新检索 {summary['dimension_runs']} 个维度")
+    return summary
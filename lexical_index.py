@@ -0,0 +1,191 @@
+"""集合文本字段的词法倒排索引
+
+每条文档的文本字段（如dataset_v4的indicators）先按分隔符切分为词条，词条再切分为字符二元组：
+
+    词条索引        规范化后的完整词条 -> 行号，用于精确匹配（如变量名与某个指标完全相同）
+    二元组索引      字符二元组 -> (行号, 词频)，用于BM25打分
+
+两者都以CSR格式存储（键列表 + 偏移 + 行号），随集合快照写入lexical/目录，加载时内存映射。
+"""
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+# 词条分隔符（NFKC之后中文逗号、分号已转换为半角）
+TERM_SEPARATORS = re.compile(r"[、,;/|\n\r\t]+")
+_WHITESPACE = re.compile(r"\s+")
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def normalize_term(text):
+    """规范化单个词条：NFKC、忽略大小写并去掉空白"""
+    return _WHITESPACE.sub("", unicodedata.normalize("NFKC", str(text or ""))).casefold()
+
+
+def split_terms(value):
+    """将字段值切分为规范化的词条列表，列表字段的每个元素再按分隔符切分"""
+    items = value if isinstance(value, (list, tuple)) else [value]
+    terms = []
+    for item in items:
+        if item is None:
+            continue
+        for part in TERM_SEPARATORS.split(unicodedata.normalize("NFKC", str(item))):
+            term = normalize_term(part)
+            if term:
+                terms.append(term)
+    return terms
+
+
+def tokenize(term):
+    """词条的字符二元组，单字词条返回自身"""
+    if len(term) <= 1:
+        return [term] if term else []
+    return [term[start:start + 2] for start in range(len(term) - 1)]
+
+
+def _csr(postings, with_counts=False):
+    """{键: [行号, ...]}转换为(键列表, 偏移, 行号[, 计数])，同一键下的行号升序且去重"""
+    keys = sorted(postings)
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    rows = []
+    counts = []
+    for position, key in enumerate(keys):
+        unique, key_counts = np.unique(np.asarray(postings[key], dtype=np.int64), return_counts=True)
+        rows.append(unique)
+        counts.append(key_counts)
+        offsets[position + 1] = offsets[position] + len(unique)
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    if not with_counts:
+        return keys, offsets, rows
+    counts = np.concatenate(counts).astype(np.int32) if counts else np.zeros(0, dtype=np.int32)
+    return keys, offsets, rows, counts
+
+
+class LexicalIndex:
+    """词条精确匹配和字符二元组BM25打分"""
+
+    FILES = ("terms.json", "term_offsets.npy", "term_rows.npy",
+             "tokens.json", "token_offsets.npy", "token_rows.npy", "token_counts.npy", "lengths.npy")
+
+    def __init__(self, terms, term_offsets, term_rows, tokens, token_offsets, token_rows, token_counts, lengths):
+        self.terms = {term: position for position, term in enumerate(terms)}
+        self.term_offsets = term_offsets
+        self.term_rows = term_rows
+        self.tokens = {token: position for position, token in enumerate(tokens)}
+        self.token_offsets = token_offsets
+        self.token_rows = token_rows
+        self.token_counts = token_counts
+        self.lengths = lengths
+        self.count = len(lengths)
+        self.average_length = (float(np.mean(lengths)) if len(lengths) else 0.0) or 1.0
+
+    @classmethod
+    def build(cls, documents):
+        """由每条文档的字段值构建索引
+
+        Args:
+            documents: 每行一个字段值列表（字符串或字符串列表）
+
+        Returns:
+            LexicalIndex
+        """
+        term_postings = {}
+        token_postings = {}
+        lengths = np.zeros(len(documents), dtype=np.int32)
+        for row, values in enumerate(documents):
+            for value in values:
+                for term in split_terms(value):
+                    term_postings.setdefault(term, []).append(row)
+                    for token in tokenize(term):
+                        token_postings.setdefault(token, []).append(row)
+                        lengths[row] += 1
+        terms, term_offsets, term_rows = _csr(term_postings)
+        tokens, token_offsets, token_rows, token_counts = _csr(token_postings, with_counts=True)
+        return cls(terms, term_offsets, term_rows, tokens, token_offsets, token_rows, token_counts, lengths)
+
+    def save(self, directory):
+        """写入目录，返回写入的文件路径列表"""
+        os.makedirs(directory, exist_ok=True)
+        for name, keys in (("terms.json", self.terms), ("tokens.json", self.tokens)):
+            with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+                json.dump(sorted(keys, key=keys.get), f, ensure_ascii=False)
+        arrays = {
+            "term_offsets.npy": self.term_offsets, "term_rows.npy": self.term_rows,
+            "token_offsets.npy": self.token_offsets, "token_rows.npy": self.token_rows,
+            "token_counts.npy": self.token_counts, "lengths.npy": self.lengths,
+        }
+        for name, values in arrays.items():
+            np.save(os.path.join(directory, name), np.asarray(values))
+        return [os.path.join(directory, name) for name in self.FILES]
+
+    @classmethod
+    def load(cls, directory):
+        """内存映射加载save写入的索引"""
+        def keys(name):
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        def array(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        return cls(
+            keys("terms.json"), array("term_offsets.npy"), array("term_rows.npy"),
+            keys("tokens.json"), array("token_offsets.npy"), array("token_rows.npy"),
+            array("token_counts.npy"), array("lengths.npy")
+        )
+
+    def exact_rows(self, text):
+        """字段中有词条与text完全相同（规范化后）的行号
+
+        Args:
+            text: 查询词条
+
+        Returns:
+            numpy.ndarray: 升序行号
+        """
+        position = self.terms.get(normalize_term(text))
+        if position is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.asarray(self.term_rows[self.term_offsets[position]:self.term_offsets[position + 1]])
+
+    def scores(self, text):
+        """text与各行的BM25分数，按查询自身作为文档时的分数归一化到[0, 1]
+
+        Args:
+            text: 查询文本
+
+        Returns:
+            tuple: (行号数组, 分数数组)，只包含至少命中一个二元组的行
+        """
+        query_tokens = sorted({token for term in split_terms(text) for token in tokenize(term)})
+        if not query_tokens or not self.count:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        scores = np.zeros(self.count, dtype=np.float64)
+        matched = np.zeros(self.count, dtype=bool)
+        # 查询自身作为文档（每个二元组出现一次）时的分数，作为归一化基准
+        self_norm = 1 + BM25_K1 * (1 - BM25_B + BM25_B * len(query_tokens) / self.average_length)
+        best = 0.0
+        for token in query_tokens:
+            position = self.tokens.get(token)
+            frequency = 0 if position is None else int(self.token_offsets[position + 1] - self.token_offsets[position])
+            idf = np.log(1 + (self.count - frequency + 0.5) / (frequency + 0.5))
+            best += idf * (BM25_K1 + 1) / self_norm
+            if not frequency:
+                continue
+            start, end = self.token_offsets[position], self.token_offsets[position + 1]
+            rows = np.asarray(self.token_rows[start:end])
+            counts = np.asarray(self.token_counts[start:end], dtype=np.float64)
+            lengths = np.asarray(self.lengths[rows], dtype=np.float64)
+            scores[rows] += idf * counts * (BM25_K1 + 1) / (
+                counts + BM25_K1 * (1 - BM25_B + BM25_B * lengths / self.average_length)
+            )
+            matched[rows] = True
+        rows = np.nonzero(matched)[0]
+        return rows, np.minimum(scores[rows] / best, 1.0).astype(np.float32)
@@ -0,0 +1,402 @@
+"""本地向量索引与检索
+
+LocalSearchClient与VectorSearchClient接口一致，在内存映射的本地集合快照上做精确检索，
+不需要网络。设置SEARCH_BACKEND=local后，search_functions中的全部检索都会走本地索引。
+
+构建使用本地向量化后端的索引（需要先用collection_snapshot.py导出快照）：
+    python local_search.py --source snapshots --out local_index --dimension 512
+    EMBEDDING_BACKEND=local SEARCH_BACKEND=local LOCAL_INDEX_DIR=local_index python report_generator.py
+
+构建降维的DashScope索引（DashVector集合维度固定，非默认维度只能走本地索引）：
+    python local_search.py --source snapshots --out local_index_d256 --backend dashscope --dimension 256
+    EMBEDDING_DIMENSION=256 SEARCH_BACKEND=local LOCAL_INDEX_DIR=local_index_d256 python report_generator.py
+"""
+import argparse
+import heapq
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from vector_search_core import APIConfig, TextVectorizer, embedding_model_id
+from collection_snapshot import LocalCollection, write_snapshot
+from embedding_backends import HashedNgramEmbedding
+from quantization import QUANTIZATION_DTYPES, quantized_scores
+from structured_log import get_logger
+
+log = get_logger("local_search")
+
+_collections = {}
+_collections_lock = threading.Lock()
+_shard_executor = None
+_shard_executor_lock = threading.Lock()
+
+
+def load_local_collection(collection_name, index_dir=None):
+    """加载本地集合，同一进程内共享同一份内存映射
+
+    快照发布时替换符号链接且只保留最近两个版本（见collection_snapshot._publish_snapshot），
+    缓存按解析后的版本目录和manifest修改时间判断，快照被替换后重新加载，不会一直读取被删除的旧版本
+
+    Args:
+        collection_name: 集合名称
+        index_dir: 本地索引目录，默认为APIConfig.LOCAL_INDEX_DIR
+
+    Returns:
+        LocalCollection: 本地集合
+    """
+    directory = os.path.join(index_dir or APIConfig.LOCAL_INDEX_DIR, collection_name)
+    version_dir = os.path.realpath(directory)
+    version = (version_dir, os.path.getmtime(os.path.join(version_dir, "manifest.json")))
+    with _collections_lock:
+        cached = _collections.get(directory)
+        if cached is None or cached[0] != version:
+            cached = (version, LocalCollection(version_dir))
+            _collections[directory] = cached
+        return cached[1]
+
+
+def _get_shard_executor():
+    """进程内共享的分片检索线程池，线程数为CPU核数"""
+    global _shard_executor
+    with _shard_executor_lock:
+        if _shard_executor is None:
+            _shard_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="local-search")
+        return _shard_executor
+
+
+def shard_bounds(count, shards):
+    """将count行均分为至多shards个连续分片
+
+    Returns:
+        list: (start, end)列表
+    """
+    step = max(1, -(-count // max(1, shards)))
+    return [(start, min(count, start + step)) for start in range(0, count, step)]
+
+
+def _shard_top(collection, queries, start, end, k, rows=None):
+    """在一个分片上为每个查询打分并取top-k
+
+    Args:
+        queries: 形状为(m, d)的查询矩阵
+        start, end: 分片范围；rows不为None时是rows中的位置范围，否则是行号范围
+        rows: 预过滤后参与打分的行号
+
+    Returns:
+        list: 每个查询一个按分数降序的(score, index)列表
+    """
+    if rows is None:
+        scales = None if collection.scales is None else collection.scales[start:end]
+        scores = quantized_scores(collection.vectors[start:end], scales, queries.T)
+    else:
+        scores = quantized_scores(collection.vectors, collection.scales, queries.T, rows=rows[start:end])
+    k = min(k, end - start)
+    if k < end - start:
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+    else:
+        top = np.broadcast_to(np.arange(end - start)[:, np.newaxis], scores.shape)
+    top_scores = np.take_along_axis(scores, top, axis=0)
+    order = np.argsort(-top_scores, axis=0, kind="stable")
+    top = np.take_along_axis(top, order, axis=0) + start
+    if rows is not None:
+        top = rows[top]
+    top_scores = np.take_along_axis(top_scores, order, axis=0)
+    return [list(zip(top_scores[:, column].tolist(), top[:, column].tolist())) for column in range(scores.shape[1])]
+
+
+def search_top_k_many(collection, queries, k, shards=None, rows=None):
+    """在本地集合上为多个查询执行精确top-k检索
+
+    全部查询在每个分片上用一次矩阵-矩阵乘法打分；大集合按行分片后在线程池中并行计算，
+    矩阵乘法和类型转换期间NumPy会释放GIL，各分片可以在不同核上同时计算。
+    每个分片各自取top-k，再按分数归并得到全局top-k。
+
+    Args:
+        collection: LocalCollection
+        queries: 形状为(m, d)的float32查询矩阵
+        k: 每个查询的返回数量
+        shards: 分片数，默认为APIConfig.LOCAL_SEARCH_SHARDS（0表示CPU核数）；
+            每个分片不少于APIConfig.LOCAL_SHARD_MIN_ROWS行
+        rows: 元数据预过滤得到的升序行号，只对这些行打分；None表示全部行
+
+    Returns:
+        list: 每个查询一个(下标数组, 分数数组)，按分数降序
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    count = len(collection) if rows is None else len(rows)
+    k = min(k, count)
+    if k <= 0:
+        return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in range(len(queries))]
+
+    shards = shards or APIConfig.LOCAL_SEARCH_SHARDS or os.cpu_count() or 1
+    shards = max(1, min(shards, count // max(1, APIConfig.LOCAL_SHARD_MIN_ROWS)))
+    bounds = shard_bounds(count, shards)
+    if len(bounds) == 1:
+        parts = [_shard_top(collection, queries, 0, count, k, rows)]
+    else:
+        executor = _get_shard_executor()
+        futures = [executor.submit(_shard_top, collection, queries, start, end, k, rows) for start, end in bounds]
+        parts = [future.result() for future in futures]
+
+    results = []
+    for column in range(len(queries)):
+        merged = list(islice(heapq.merge(*(part[column] for part in parts), key=lambda item: -item[0]), k))
+        results.append((
+            np.array([index for _, index in merged], dtype=np.int64),
+            np.array([score for score, _ in merged], dtype=np.float32)
+        ))
+    return results
+
+
+def search_top_k(collection, query, k, shards=None, rows=None):
+    """单个查询的search_top_k_many
+
+    Returns:
+        tuple: (下标数组, 分数数组)，按分数降序
+    """
+    return search_top_k_many(collection, np.asarray(query, dtype=np.float32)[np.newaxis, :], k, shards, rows)[0]
+
+
+class LocalSearchClient:
+    """本地向量检索客户端，接口与VectorSearchClient一致
+
+    分数为查询向量与文档向量的点积（向量均已L2归一化时即余弦相似度），分数越高越相关。
+    集合以float16/int8量化存储时直接在量化矩阵上打分；快照中保留了float32向量时，
+    先按量化分数取rerank_factor倍的候选，再用float32向量精确重排。
+    """
+
+    def __init__(self, index_dir=None, rerank_factor=None, shards=None):
+        """初始化本地检索客户端
+
+        Args:
+            index_dir: 本地索引目录，默认为APIConfig.LOCAL_INDEX_DIR
+            rerank_factor: 重排候选数相对topk的倍数，默认为APIConfig.LOCAL_RERANK_FACTOR，小于等于1时不重排
+            shards: 并行检索的分片数，默认为APIConfig.LOCAL_SEARCH_SHARDS
+        """
+        self.index_dir = index_dir or APIConfig.LOCAL_INDEX_DIR
+        self.rerank_factor = APIConfig.LOCAL_RERANK_FACTOR if rerank_factor is None else rerank_factor
+        self.shards = shards
+        self.collection = None
+
+    def get_cluster(self, cluster_name):
+        """本地索引没有集群概念，直接返回True"""
+        return True
+
+    def get_collection(self, collection_name):
+        """加载指定的本地集合
+
+        Args:
+            collection_name: 集合名称
+
+        Returns:
+            成功返回True，失败返回False
+        """
+        try:
+            collection = load_local_collection(collection_name, self.index_dir)
+        except Exception as e:
+            log.error("local_collection_failed", "加载本地集合失败: {error}", collection=collection_name, error=e)
+            return False
+
+        # 索引中的向量必须与查询使用同一个向量化模型
+        index_model = collection.manifest.get("embedding_model", APIConfig.EMBEDDING_MODEL)
+        if index_model != embedding_model_id():
+            log.error("local_collection_model_mismatch",
+                      "本地集合 {collection} 的向量模型为 {index_model}，与当前向量化模型 {model} 不一致",
+                      collection=collection_name, index_model=index_model, model=embedding_model_id())
+            return False
+
+        self.collection = collection
+        return True
+
+    def _to_result(self, index, score, output_fields, include_vector):
+        """将一行数据转换为检索结果字典"""
+        result = self.collection.doc(index, output_fields)
+        result["score"] = float(score)
+        if include_vector:
+            result["vector"] = self.collection.float_vectors([index])[0].tolist()
+        return result
+
+    def _finish(self, query, top, top_scores, topk, output_fields, include_vector):
+        """对候选做可选的float32重排并转换为结果字典"""
+        if len(top) > topk:
+            # 量化分数只用于挑选候选，返回的分数来自float32向量
+            top = np.sort(top)
+            exact = self.collection.float_vectors(top) @ query
+            order = _top_indices(exact, topk)
+            top, top_scores = top[order], exact[order]
+        return [self._to_result(index, score, output_fields, include_vector) for index, score in zip(top, top_scores)]
+
+    def _candidate_count(self, topk):
+        """量化集合保留了float32向量时多取候选用于重排"""
+        if self.collection.rerank_vectors is not None and self.rerank_factor > 1:
+            return topk * self.rerank_factor
+        return topk
+
+    def search(self, query_vector, topk=10, output_fields=None, include_vector=True, search_filter=None):
+        """执行精确向量检索
+
+        Args:
+            query_vector: 查询向量
+            topk: 返回结果数量
+            output_fields: 返回字段列表
+            include_vector: 是否包含向量数据
+            search_filter: 元数据过滤条件（SearchFilter），只对满足条件的文档打分
+
+        Returns:
+            检索结果字典列表（按分数降序）或None（如果检索失败）
+        """
+        results = self.search_many([query_vector], topk, output_fields, include_vector, search_filter)
+        return None if results is None else results[0]
+
+    def search_many(self, query_vectors, topk=10, output_fields=None, include_vector=True, search_filter=None):
+        """对同一个collection批量执行精确向量检索，全部查询一次矩阵乘法完成打分
+
+        Args:
+            query_vectors: 查询向量列表
+            topk: 每个查询的返回结果数量
+            output_fields: 返回字段列表
+            include_vector: 是否包含向量数据
+            search_filter: 元数据过滤条件（SearchFilter），通过二级索引求出满足条件的行后只对这些行打分
+
+        Returns:
+            list: 与query_vectors顺序一致的检索结果列表（每项按分数降序），
+                未设置collection、向量维度不一致或过滤条件无效时返回None
+        """
+        if self.collection is None:
+            log.error("search_no_collection", "未设置collection，无法执行检索")
+            return None
+
+        if len(query_vectors) == 0:
+            return []
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.collection.dimension:
+            log.error("search_dimension_mismatch", "查询向量维度 {shape} 与本地集合维度 {dimension} 不一致",
+                      shape=queries.shape[1:], dimension=self.collection.dimension)
+            return None
+
+        rows = None
+        if search_filter:
+            if isinstance(search_filter, str):
+                log.error("search_filter_unsupported", "本地检索不支持字符串形式的过滤表达式，请使用SearchFilter")
+                return None
+            try:
+                rows = search_filter.rows(self.collection)
+            except KeyError as e:
+                log.error("search_filter_invalid", "过滤条件无效: {error}", error=e)
+                return None
+
+        topk = min(topk, len(self.collection) if rows is None else len(rows))
+        if topk <= 0:
+            return [[] for _ in range(len(queries))]
+
+        candidates = search_top_k_many(self.collection, queries, self._candidate_count(topk), self.shards, rows)
+        return [
+            self._finish(query, top, top_scores, topk, output_fields, include_vector)
+            for query, (top, top_scores) in zip(queries, candidates)
+        ]
+
+
+def _top_indices(scores, k):
+    """返回分数最高的k个下标，按分数降序排列"""
+    if k >= len(scores):
+        top = np.arange(len(scores))
+    else:
+        top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _document_text(record, text_fields):
+    """拼接参与向量化的字段"""
+    parts = []
+    for field in text_fields:
+        value = record.get(field)
+        if isinstance(value, (list, tuple)):
+            value = "，".join(str(item) for item in value)
+        if value:
+            parts.append(str(value))
+    return "；".join(parts)
+
+
+def build_local_index(source_dir, out_dir, collections=None, dimension=None, fit_idf=True, batch_size=8192,
+                      backend="local", dtype="float32", rerank=False):
+    """为集合快照重新生成向量，构建本地索引
+
+    backend为local时，全部集合共用同一个本地向量化后端（IDF在全部集合的文本上拟合），
+    参数保存在索引根目录，查询时由get_embedding_backend加载，保证与建索引时一致。
+    backend为dashscope时，按指定维度调用DashScope重新向量化，用于构建降维索引。
+
+    Args:
+        source_dir: collection_snapshot.py导出的快照根目录
+        out_dir: 本地索引输出目录
+        collections: 集合名称列表，默认为全部四个集合
+        dimension: 向量维度，默认为APIConfig.LOCAL_EMBEDDING_DIMENSION（local）
+            或APIConfig.EMBEDDING_DIMENSION（dashscope）
+        fit_idf: 是否在集合文本上拟合IDF权重（仅local）
+        batch_size: 向量化批大小
+        backend: 向量化后端，local或dashscope
+        dtype: 向量存储类型，float32、float16或int8
+        rerank: 量化存储时是否保留float32向量用于候选重排
+
+    Returns:
+        建索引使用的向量化器（HashedNgramEmbedding或TextVectorizer）
+    """
+    collections = collections or list(APIConfig.INDEX_TEXT_FIELDS)
+    if backend == "dashscope":
+        embedder = TextVectorizer(api_key=APIConfig.DASHSCOPE_API_KEY, dimension=dimension)
+    elif backend == "local":
+        embedder = HashedNgramEmbedding(dimension or APIConfig.LOCAL_EMBEDDING_DIMENSION)
+    else:
+        raise ValueError(f"未知的向量化后端: {backend}")
+
+    sources = {name: LocalCollection(os.path.join(source_dir, name)) for name in collections}
+    texts = {}
+    records = {}
+    for name, source in sources.items():
+        records[name] = [source.doc(index) for index in range(len(source))]
+        texts[name] = [_document_text(record, APIConfig.INDEX_TEXT_FIELDS.get(name, [])) for record in records[name]]
+
+    if backend == "local" and fit_idf:
+        embedder = embedder.fit([text for name in collections for text in texts[name]])
+
+    for name in collections:
+        vectors = np.zeros((len(texts[name]), embedder.dimension), dtype=np.float32)
+        for start in range(0, len(texts[name]), batch_size):
+            batch = texts[name][start:start + batch_size]
+            if backend == "local":
+                vectors[start:start + batch_size] = embedder.embed_batch(batch)
+                continue
+            for offset, vector in enumerate(embedder.texts_to_vectors(batch)):
+                if vector is None:
+                    raise RuntimeError(f"{name} 第 {start + offset} 条文本向量化失败")
+                vectors[start + offset] = vector
+        ids = [record.pop("id") for record in records[name]]
+        write_snapshot(os.path.join(out_dir, name), name, ids, vectors, records[name], dtype, extra={
+            "embedding_model": embedder.model_id
+        }, rerank=rerank)
+        print(f"{name}: 已用 {embedder.model_id} 重建 {len(ids)} 条向量")
+
+    if backend == "local":
+        embedder.save(out_dir)
+    return embedder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重新向量化集合快照，构建本地索引")
+    parser.add_argument("--source", default=APIConfig.LOCAL_SNAPSHOT_DIR, help="集合快照根目录")
+    parser.add_argument("--out", required=True, help="本地索引输出目录")
+    parser.add_argument("--collections", nargs="+", help="集合名称，默认为全部集合")
+    parser.add_argument("--backend", choices=["local", "dashscope"], default="local", help="向量化后端")
+    parser.add_argument("--dimension", type=int, help="向量维度，默认为所选后端的配置维度")
+    parser.add_argument("--no-idf", action="store_true", help="不拟合IDF权重")
+    parser.add_argument("--dtype", choices=QUANTIZATION_DTYPES, default="float32", help="向量存储类型")
+    parser.add_argument("--rerank", action="store_true", help="量化存储时保留float32向量用于候选重排")
+    args = parser.parse_args()
+    build_local_index(args.source, args.out, args.collections, args.dimension, fit_idf=not args.no_idf,
+                      backend=args.backend, dtype=args.dtype, rerank=args.rerank)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""单次评估的按需性能分析
+
+生产环境中个别评估很慢时，不需要重新部署即可定位原因：对calculate_research_score或
+generate_research_report传入profile参数，或设置环境变量EVALUATION_PROFILE，即对该次调用执行性能分析：
+
+    cprofile    cProfile确定性分析，输出<前缀>.pstats（可用pstats、snakeviz等查看）
+    sampling    采样分析，按固定间隔记录进程内全部线程的调用栈，输出<前缀>.collapsed
+                （每行"[线程名];栈帧;栈帧;... 次数"，可直接交给flamegraph.pl或speedscope生成火焰图）
+
+向量化和检索有一部分在工作线程中执行（VectorSearchClient.search_many的线程池、本地检索的分片线程池、
+异步接口的asyncio.to_thread）。cProfile只记录调用线程，这部分在pstats中只表现为等待future的耗时；
+sampling模式按线程名区分各线程的调用栈，能看到工作线程内部。同一进程中同时进行的其他评估也会被采样到。
+
+两种模式都同时用tracemalloc记录内存峰值和分配最多的代码行（EVALUATION_PROFILE_MEMORY=0时关闭），
+并输出<前缀>.json汇总。生成报告时前缀为报告路径去掉扩展名加".profile"，单独评估时写入SearchConfig.PROFILE_DIR。
+未启用时调用方只多一次条件判断，不导入本模块。
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+# 采样间隔（秒）
+SAMPLE_INTERVAL = float(os.environ.get("EVALUATION_PROFILE_INTERVAL", "0.005"))
+# 是否同时记录内存分配（tracemalloc会使被测代码明显变慢）
+TRACE_MEMORY = os.environ.get("EVALUATION_PROFILE_MEMORY", "1") == "1"
+# 汇总中列出的函数和分配位置数
+TOP_N = 30
+
+# tracemalloc是进程级的：由run_profiled启动时按引用计数共用，最后一个结束的分析才停止
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+
+def _acquire_tracemalloc():
+    """开始记录内存分配，没有其他分析在进行时重置内存峰值
+
+    Returns:
+        bool: 是否由run_profiled管理，为True时结束后需调用_release_tracemalloc；
+            其他代码已在使用tracemalloc时沿用，返回False，结束后不停止
+    """
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            external = tracemalloc.is_tracing()
+            if not external:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            if external:
+                return False
+        _tracemalloc_users += 1
+        return True
+
+
+def _release_tracemalloc():
+    """_acquire_tracemalloc的配对调用，最后一个使用者停止tracemalloc"""
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+
+
+def _frame_label(frame):
+    """栈帧的显示名称：函数名 (文件名:起始行)"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """在后台线程中定期采样调用栈，每条栈以"[线程名]"开头"""
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL, all_threads=True):
+        """
+        Args:
+            thread_id: 被采样的线程标识，默认为创建分析器的线程
+            interval: 采样间隔（秒）
+            all_threads: 是否同时采样其他线程（检索的工作线程），为False时只采样thread_id
+        """
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.all_threads = all_threads
+        self.stacks = Counter()
+        self.thread_samples = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="evaluation-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        sampler_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id not in frames:
+                continue
+            if not self.all_threads:
+                frames = {self.thread_id: frames[self.thread_id]}
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id == sampler_id:
+                    continue
+                name = names.get(thread_id, str(thread_id))
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(f"[{name}]".replace(";", ":"))
+                self.stacks[";".join(reversed(stack))] += 1
+                self.thread_samples[name] += 1
+            self.samples += 1
+
+    def write_collapsed(self, path):
+        """按折叠栈格式写入采样结果"""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def summary(self, top_n=TOP_N):
+        """采样汇总：每个函数作为栈顶（自身）和出现在栈中（累计）的采样数，以及各线程的采样数"""
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        return {
+            "samples": self.samples,
+            "interval": self.interval,
+            "threads": dict(self.thread_samples.most_common()),
+            "top_self": [{"function": name, "samples": count} for name, count in self_counts.most_common(top_n)],
+            "top_cumulative": [{"function": name, "samples": count} for name, count in total_counts.most_common(top_n)],
+        }
+
+
+def _pstats_summary(profiler, top_n=TOP_N):
+    """cProfile汇总：按累计耗时排序的函数"""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (primitive_calls, calls, self_time, cumulative, _) in stats.stats.items():
+        rows.append({"function": f"{name} ({os.path.basename(filename)}:{line})", "calls": calls,
+                     "self_time": self_time, "cumulative_time": cumulative})
+    rows.sort(key=lambda row: -row["cumulative_time"])
+    return {"total_calls": stats.total_calls, "top_cumulative": rows[:top_n],
+            "top_self": sorted(rows, key=lambda row: -row["self_time"])[:top_n]}
+
+
+def _memory_summary(snapshot, peak, top_n=TOP_N):
+    """tracemalloc汇总：内存峰值和分配最多的代码行"""
+    return {
+        "peak_bytes": peak,
+        "top_allocations": [
+            {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "size_bytes": stat.size,
+             "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:top_n]
+        ],
+    }
+
+
+def run_profiled(mode, output_prefix, func, *args, label=None, **kwargs):
+    """在性能分析下执行func(*args, **kwargs)并写出分析结果
+
+    Args:
+        mode: 分析模式，见PROFILE_MODES
+        output_prefix: 输出文件路径前缀，目录不存在时自动创建
+        func: 被分析的函数
+        label: 写入JSON汇总的说明（如论文选题）
+
+    Returns:
+        func的返回值
+
+    Raises:
+        ValueError: 不支持的分析模式
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"不支持的性能分析模式: {mode}，可选: {PROFILE_MODES}")
+    directory = os.path.dirname(os.path.abspath(output_prefix))
+    os.makedirs(directory, exist_ok=True)
+
+    # 并发的分析共用tracemalloc，内存峰值和分配位置包含同时进行的其他评估
+    trace_memory = TRACE_MEMORY
+    managed_tracing = trace_memory and _acquire_tracemalloc()
+
+    profiler = cProfile.Profile() if mode == "cprofile" else SamplingProfiler()
+    started = time.perf_counter()
+    started_cpu = time.process_time()
+    if mode == "cprofile":
+        profiler.enable()
+    else:
+        profiler.start()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # 分析结果的汇总和写出失败不影响被分析函数的返回值或异常
+        try:
+            if mode == "cprofile":
+                profiler.disable()
+            else:
+                profiler.stop()
+            elapsed = time.perf_counter() - started
+            cpu_time = time.process_time() - started_cpu
+            memory = None
+            if trace_memory:
+                memory = _memory_summary(tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()[1])
+            _write_results(mode, output_prefix, profiler, label, elapsed, cpu_time, memory)
+        except Exception as e:
+            print(f"写入性能分析结果失败: {str(e)}")
+        finally:
+            if managed_tracing:
+                _release_tracemalloc()
+
+
+def _write_results(mode, output_prefix, profiler, label, elapsed, cpu_time, memory):
+    """写出分析数据文件和JSON汇总"""
+    files = {"summary": output_prefix + ".json"}
+    if mode == "cprofile":
+        files["pstats"] = output_prefix + ".pstats"
+        profiler.dump_stats(files["pstats"])
+        profile_summary = _pstats_summary(profiler)
+    else:
+        files["collapsed"] = output_prefix + ".collapsed"
+        profiler.write_collapsed(files["collapsed"])
+        profile_summary = profiler.summary()
+
+    summary = {"mode": mode, "label": label, "created_at": time.time(), "elapsed": elapsed, "cpu_time": cpu_time,
+               "files": files, "profile": profile_summary, "memory": memory}
+    with open(files["summary"], "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"性能分析结果已写入: {', '.join(files.values())}（耗时 {elapsed:.3f} 秒）")
@@ -0,0 +1,114 @@
+"""向量标量量化
+
+支持三种存储类型：
+    float32     不量化
+    float16     半精度，占用减半
+    int8        每个向量单独取缩放系数（max|x|/127），占用为float32的1/4
+
+点积直接在量化后的矩阵上分块计算：每次只把一块行转换为float32再做矩阵乘法，
+临时内存与块大小成正比，不会把整个矩阵展开。int8的结果再乘以每行的缩放系数。
+"""
+import numpy as np
+
+QUANTIZATION_DTYPES = ("float32", "float16", "int8")
+
+# 分块计算点积时每块的行数
+SCORE_CHUNK_ROWS = 4096
+
+
+def quantize(vectors, dtype="float32"):
+    """量化向量矩阵
+
+    Args:
+        vectors: 形状为(n, d)的向量矩阵
+        dtype: 存储类型，float32、float16或int8
+
+    Returns:
+        tuple: (codes, scales)，codes为量化后的矩阵，scales为int8的每行缩放系数（其他类型为None）
+    """
+    if dtype not in QUANTIZATION_DTYPES:
+        raise ValueError(f"不支持的量化类型: {dtype}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype != "int8":
+        return np.ascontiguousarray(vectors, dtype=np.dtype(dtype)), None
+
+    if vectors.ndim == 1:
+        codes, scales = quantize(vectors[np.newaxis, :], dtype)
+        return codes[0], scales[0]
+    scales = np.abs(vectors).max(axis=1) / 127.0 if vectors.size else np.zeros(len(vectors), dtype=np.float32)
+    scales = scales.astype(np.float32)
+    safe = np.where(scales > 0, scales, 1.0)
+    codes = np.clip(np.rint(vectors / safe[:, np.newaxis]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def dequantize(codes, scales=None):
+    """还原为float32向量
+
+    Args:
+        codes: 量化后的向量或矩阵
+        scales: int8的缩放系数，其他类型为None
+
+    Returns:
+        numpy.ndarray: float32向量或矩阵，总是新数组（codes可能是只读的内存映射，调用方会原地修改结果）
+    """
+    if scales is None:
+        return np.array(codes, dtype=np.float32)
+    values = np.asarray(codes, dtype=np.float32)
+    scales = np.asarray(scales, dtype=np.float32)
+    return values * (scales[..., np.newaxis] if values.ndim == 2 else scales)
+
+
+def quantized_scores(codes, scales, query, chunk_rows=SCORE_CHUNK_ROWS, rows=None):
+    """在量化矩阵上计算与查询向量的点积
+
+    Args:
+        codes: 形状为(n, d)的量化矩阵（可以是内存映射）
+        scales: int8的每行缩放系数，其他类型为None
+        query: float32查询向量，或形状为(d, m)的查询矩阵
+        chunk_rows: 每块的行数
+        rows: 只为这些行打分（升序行号），None表示全部行
+
+    Returns:
+        numpy.ndarray: 形状为(len(rows),)或(len(rows), m)的float32分数
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if rows is None and codes.dtype == np.float32:
+        return codes @ query
+
+    count = codes.shape[0] if rows is None else len(rows)
+    scores = np.empty((count,) + query.shape[1:], dtype=np.float32)
+    for start in range(0, count, chunk_rows):
+        selected = slice(start, start + chunk_rows) if rows is None else rows[start:start + chunk_rows]
+        block = np.asarray(codes[selected], dtype=np.float32)
+        scores[start:start + len(block)] = block @ query
+    if scales is not None:
+        selected_scales = scales if rows is None else scales[rows]
+        scores *= np.asarray(selected_scales).reshape((-1,) + (1,) * (scores.ndim - 1))
+    return scores
+
+
+def pack_vector(vector, dtype="float32"):
+    """量化单个向量，用于缓存
+
+    Args:
+        vector: 向量（list或数组）
+        dtype: 存储类型
+
+    Returns:
+        tuple: (codes, scale)
+    """
+    return quantize(vector, dtype)
+
+
+def unpack_vector(packed):
+    """还原pack_vector的结果
+
+    Args:
+        packed: pack_vector返回的(codes, scale)
+
+    Returns:
+        list: float向量
+    """
+    codes, scale = packed
+    return dequantize(codes, scale).tolist()
@@ -0,0 +1,414 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+# 排队通道，从高到低；与评估调度器的优先级一致
+PRIORITY_LANES = ("interactive", "batch")
+
+# 当前调用的排队通道，由评估调度器的slot/slot_async设置；不在任何评估名额内的调用按interactive排队
+request_priority = contextvars.ContextVar("request_priority", default=PRIORITY_LANES[0])
+
+
+class RateLimiter:
+    """单个后端端点的令牌桶限流器
+
+    - 令牌桶控制每秒请求数（QPS），burst为桶容量
+    - 并发上限控制同时在途的请求数
+    - 调用方按request_priority分通道排队：有许可时先发给interactive通道，同一通道内按到达顺序（先到先得）
+    - 低优先级通道不动用桶中保留的reserved_tokens个令牌，批量调用占满QPS时交互式调用仍能立即拿到令牌
+    - 防饿死：排队超过starvation_timeout秒的低优先级调用在下一个许可上优先发放
+    - 收到限流响应时QPS减半，之后每个成功请求按加性增长逐步恢复到配置值
+    - 记录排队等待时间，便于观察是否已达到安全吞吐上限
+    - 线程（acquire）和协程（acquire_async）共用同一个队列、令牌桶和并发计数
+    """
+
+    # 协程排队时检查许可的最长间隔（线程归还许可时无法直接唤醒协程）
+    ASYNC_POLL_INTERVAL = 0.005
+
+    def __init__(self, name, qps, burst=None, max_concurrency=None, min_qps=0.5, recovery_step=None,
+                 reserved_tokens=None, starvation_timeout=30.0):
+        """初始化限流器
+
+        Args:
+            name: 端点名称
+            qps: 每秒允许的请求数
+            burst: 令牌桶容量，默认与qps相同（至少为1）
+            max_concurrency: 最大并发请求数，None表示不限
+            min_qps: 自适应降速的下限
+            recovery_step: 每个成功请求恢复的QPS，默认为qps的5%
+            reserved_tokens: 为interactive通道保留的令牌数，默认为burst的1/4（不超过burst - 1）
+            starvation_timeout: 低优先级调用排队超过该秒数后优先发放许可，None表示不提升
+        """
+        self.name = name
+        self.max_qps = float(qps)
+        self.qps = float(qps)
+        self.burst = float(burst if burst is not None else max(1.0, qps))
+        self.max_concurrency = max_concurrency
+        self.min_qps = min_qps
+        self.recovery_step = recovery_step if recovery_step is not None else max(0.01, qps * 0.05)
+        self.reserved_tokens = min(self.burst - 1, reserved_tokens if reserved_tokens is not None else self.burst / 4)
+        self.starvation_timeout = starvation_timeout
+
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._in_flight = 0
+        self._sequence = itertools.count()
+        # 排队号码为(通道序号, 到达序号)，堆中按通道再按到达顺序排列；已发放或放弃的号码惰性删除
+        self._queue = []
+        self._enqueued = {}
+        # 低优先级通道的到达顺序，用于防饿死
+        self._arrivals = {rank: deque() for rank in range(1, len(PRIORITY_LANES) + 1)}
+        self._condition = threading.Condition()
+
+        # 统计信息
+        self._acquired = 0
+        self._throttled = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._promoted = 0
+        self._lane_acquired = [0] * (len(PRIORITY_LANES) + 1)
+        self._lane_total_wait = [0.0] * (len(PRIORITY_LANES) + 1)
+        self._lane_max_wait = [0.0] * (len(PRIORITY_LANES) + 1)
+
+    def _refill(self, now):
+        """按当前速率补充令牌"""
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.qps)
+        self._last_refill = now
+
+    def acquire(self, timeout=None):
+        """排队获取一个请求许可
+
+        Args:
+            timeout: 最长等待秒数，None表示一直等待
+
+        Returns:
+            float: 本次排队等待的秒数
+
+        Raises:
+            TimeoutError: 超时仍未获得许可
+        """
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        with self._condition:
+            ticket = self._take_ticket()
+            try:
+                while True:
+                    ready, wait = self._poll(ticket, deadline)
+                    if ready:
+                        break
+                    self._condition.wait(wait)
+            except BaseException:
+                self._abandon(ticket)
+                raise
+            return self._grant(ticket, started)
+
+    async def acquire_async(self, timeout=None):
+        """在事件循环中排队获取一个请求许可，等待期间不阻塞线程
+
+        Args:
+            timeout: 最长等待秒数，None表示一直等待
+
+        Returns:
+            float: 本次排队等待的秒数
+
+        Raises:
+            TimeoutError: 超时仍未获得许可
+        """
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        with self._condition:
+            ticket = self._take_ticket()
+        try:
+            while True:
+                with self._condition:
+                    ready, wait = self._poll(ticket, deadline)
+                    if ready:
+                        return self._grant(ticket, started)
+                await asyncio.sleep(self.ASYNC_POLL_INTERVAL if wait is None else min(wait, self.ASYNC_POLL_INTERVAL))
+        except BaseException:
+            with self._condition:
+                self._abandon(ticket)
+            raise
+
+    def _take_ticket(self):
+        """按当前调用的request_priority领取排队号码，未知的通道排在最后（调用方持有锁）"""
+        priority = request_priority.get()
+        rank = PRIORITY_LANES.index(priority) if priority in PRIORITY_LANES else len(PRIORITY_LANES)
+        ticket = (rank, next(self._sequence))
+        heapq.heappush(self._queue, ticket)
+        self._enqueued[ticket] = time.monotonic()
+        if rank:
+            self._arrivals[rank].append(ticket)
+        return ticket
+
+    def _head(self, now):
+        """下一个应获得许可的号码，没有排队的调用方时返回None（调用方持有锁）"""
+        while self._queue and self._queue[0] not in self._enqueued:
+            heapq.heappop(self._queue)
+        # 排队过久的低优先级调用先于高优先级发放，多个时最早到达的优先
+        if self.starvation_timeout is not None:
+            starved = None
+            for arrivals in self._arrivals.values():
+                while arrivals and arrivals[0] not in self._enqueued:
+                    arrivals.popleft()
+                if (arrivals and now - self._enqueued[arrivals[0]] >= self.starvation_timeout
+                        and (starved is None or self._enqueued[arrivals[0]] < self._enqueued[starved])):
+                    starved = arrivals[0]
+            if starved is not None:
+                return starved
+        return self._queue[0] if self._queue else None
+
+    def _poll(self, ticket, deadline):
+        """检查ticket能否获得许可（调用方持有锁）
+
+        Returns:
+            tuple: (是否可以获得许可, 建议等待的秒数，None表示等待其他调用方唤醒)
+
+        Raises:
+            TimeoutError: 已超过deadline
+        """
+        now = time.monotonic()
+        self._refill(now)
+        concurrency_ok = self.max_concurrency is None or self._in_flight < self.max_concurrency
+        serving = ticket == self._head(now)
+        # 低优先级通道不动用保留的令牌；防饿死提升的调用不在堆顶，只需一个令牌
+        needed = 1 + self.reserved_tokens if ticket[0] and ticket == self._queue[0] else 1
+        if serving and concurrency_ok and self._tokens >= needed:
+            return True, None
+
+        # 轮到自己但令牌不足时，等到足够的令牌产生；否则等待其他调用方唤醒
+        wait = None
+        if serving and concurrency_ok:
+            wait = (needed - self._tokens) / self.qps
+        elif ticket[0] and self.starvation_timeout is not None:
+            # 低优先级调用到达防饿死期限时需要醒来检查，不能只等其他调用方唤醒
+            wait = max(0.0, self._enqueued[ticket] + self.starvation_timeout - now)
+        if deadline is not None:
+            remaining = deadline - now
+            if remaining <= 0:
+                raise TimeoutError(f"{self.name} 限流排队超时")
+            wait = remaining if wait is None else min(wait, remaining)
+        return False, wait
+
+    def _grant(self, ticket, started):
+        """发放许可并记录等待时间（调用方持有锁）"""
+        self._tokens -= 1
+        self._in_flight += 1
+        del self._enqueued[ticket]
+        if self._queue[0] != ticket:
+            self._promoted += 1
+        waited = time.monotonic() - started
+        self._acquired += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        rank = ticket[0]
+        self._lane_acquired[rank] += 1
+        self._lane_total_wait[rank] += waited
+        self._lane_max_wait[rank] = max(self._lane_max_wait[rank], waited)
+        self._condition.notify_all()
+        return waited
+
+    def _abandon(self, ticket):
+        """放弃排队时让出位置，避免后面的调用方永远等不到（调用方持有锁）"""
+        self._enqueued.pop(ticket, None)
+        self._condition.notify_all()
+
+    def release(self):
+        """归还并发许可"""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """以上下文管理器的方式获取许可
+
+        Yields:
+            float: 本次排队等待的秒数
+        """
+        waited = self.acquire(timeout)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        """以异步上下文管理器的方式获取许可
+
+        Yields:
+            float: 本次排队等待的秒数
+        """
+        waited = await self.acquire_async()
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def on_throttled(self):
+        """收到限流响应：QPS减半并清空令牌，让后续请求自然退避"""
+        with self._condition:
+            self._throttled += 1
+            self.qps = max(self.min_qps, self.qps / 2)
+            self._tokens = 0
+            self._last_refill = time.monotonic()
+
+    def on_success(self):
+        """请求成功：QPS按加性增长恢复，直到配置值"""
+        if self.qps >= self.max_qps:
+            return
+        with self._condition:
+            self.qps = min(self.max_qps, self.qps + self.recovery_step)
+
+    def stats(self):
+        """返回限流统计
+
+        Returns:
+            dict: 当前QPS、排队数、在途请求数、限流次数和排队等待时间，以及各通道的排队数和排队等待时间
+        """
+        with self._condition:
+            waiting = [0] * (len(PRIORITY_LANES) + 1)
+            for rank, _ in self._enqueued:
+                waiting[rank] += 1
+            lanes = {}
+            for rank, lane in enumerate(PRIORITY_LANES + ("other",)):
+                if rank == len(PRIORITY_LANES) and not (waiting[rank] or self._lane_acquired[rank]):
+                    continue
+                lanes[lane] = {
+                    "waiting": waiting[rank],
+                    "acquired": self._lane_acquired[rank],
+                    "avg_wait": (self._lane_total_wait[rank] / self._lane_acquired[rank]
+                                 if self._lane_acquired[rank] else 0.0),
+                    "max_wait": self._lane_max_wait[rank],
+                }
+            return {
+                "name": self.name,
+                "qps": self.qps,
+                "max_qps": self.max_qps,
+                "queue_depth": len(self._enqueued),
+                "in_flight": self._in_flight,
+                "acquired": self._acquired,
+                "throttled": self._throttled,
+                "avg_wait": self._total_wait / self._acquired if self._acquired else 0.0,
+                "max_wait": self._max_wait,
+                "promoted": self._promoted,
+                "lanes": lanes
+            }
+
+
+class ThrottledError(Exception):
+    """后端持续返回限流响应，重试次数用尽"""
+
+
+# 各端点的默认限流配置，可通过环境变量RATE_LIMITS以JSON覆盖，
+# 如{"dashscope": {"qps": 20, "max_concurrency": 10}}
+DEFAULT_RATE_LIMITS = {
+    "dashscope": {"qps": 10, "max_concurrency": 8},
+    "dashvector": {"qps": 20, "max_concurrency": 16},
+}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name):
+    """获取进程内共享的端点限流器
+
+    Args:
+        name: 端点名称，如"dashscope"、"dashvector"
+
+    Returns:
+        RateLimiter: 限流器
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            settings = dict(DEFAULT_RATE_LIMITS.get(name, {"qps": 10}))
+            settings.update(json.loads(os.environ.get("RATE_LIMITS", "{}")).get(name, {}))
+            _limiters[name] = RateLimiter(name, **settings)
+        return _limiters[name]
+
+
+def rate_limiter_stats():
+    """返回全部已创建限流器的统计信息
+
+    Returns:
+        dict: 端点名称到统计信息的映射
+    """
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def call_with_rate_limit(name, func, is_throttled, max_retries=5, backoff=0.5):
+    """在限流器保护下调用后端，遇到限流响应时降速并重试
+
+    Args:
+        name: 端点名称
+        func: 无参调用，返回后端响应
+        is_throttled: 判断响应或异常是否为限流的函数
+        max_retries: 限流后的最大重试次数
+        backoff: 首次重试前的等待秒数，之后逐次翻倍
+
+    Returns:
+        后端响应
+
+    Raises:
+        ThrottledError: 重试次数用尽仍被限流
+    """
+    limiter = get_rate_limiter(name)
+    for attempt in range(max_retries + 1):
+        with limiter.slot():
+            try:
+                response = func()
+            except Exception as e:
+                if not is_throttled(e):
+                    raise
+                response = e
+        if not is_throttled(response):
+            limiter.on_success()
+            return response
+        limiter.on_throttled()
+        if attempt < max_retries:
+            time.sleep(backoff * (2 ** attempt))
+    raise ThrottledError(f"{name} 持续限流，已重试 {max_retries} 次")
+
+
+async def call_with_rate_limit_async(name, func, is_throttled, max_retries=5, backoff=0.5):
+    """call_with_rate_limit的协程版本，与线程调用方共用同一个限流器
+
+    Args:
+        name: 端点名称
+        func: 无参协程函数，返回后端响应
+        is_throttled: 判断响应或异常是否为限流的函数
+        max_retries: 限流后的最大重试次数
+        backoff: 首次重试前的等待秒数，之后逐次翻倍
+
+    Returns:
+        后端响应
+
+    Raises:
+        ThrottledError: 重试次数用尽仍被限流
+    """
+    limiter = get_rate_limiter(name)
+    for attempt in range(max_retries + 1):
+        async with limiter.slot_async():
+            try:
+                response = await func()
+            except Exception as e:
+                if not is_throttled(e):
+                    raise
+                response = e
+        if not is_throttled(response):
+            limiter.on_success()
+            return response
+        limiter.on_throttled()
+        if attempt < max_retries:
+            await asyncio.sleep(backoff * (2 ** attempt))
+    raise ThrottledError(f"{name} 持续限流，已重试 {max_retries} 次")
@@ -0,0 +1,452 @@
+"""批量评估报告的压缩归档
+
+批量评估每个输入生成一个Markdown报告，几万个小文件占用大量inode和磁盘块。归档模式改为把报告和得分JSON
+追加到压缩段文件中，并以规范化输入摘要（search_functions.evaluation_digest）为键建立偏移索引：
+
+    <归档目录>/index.sqlite3                      摘要 -> (段文件, 偏移, 长度)及选题、总分等元数据
+    <归档目录>/segment-<进程号>-<时间>-<序号>.dat  只追加的段文件
+
+段文件中每个条目为头部（魔数、报告和得分的压缩长度）后接zlib压缩的报告和得分JSON两帧，
+只读取报告时不解压得分。每个进程写自己的段文件，并发写入不会交错；一批条目先写入段文件并fsync，
+再在一个SQLite事务中写入索引，索引提交前的条目对读取方不可见；写入或提交失败时段文件截断回写入前的长度。
+同一摘要再次写入时索引指向新条目，旧条目不再可读，占用的空间见stats()。
+
+用法：
+    with ReportArchive("reports.archive") as archive:
+        archive_research_reports(inputs_list, archive, processes=4)
+        print(archive.read_report(evaluation_digest(paper_topic, variable_settings, empirical_model)))
+        archive.export_markdown("reports/")
+
+命令行：
+    python report_archive.py reports.archive list
+    python report_archive.py reports.archive show <摘要>
+    python report_archive.py reports.archive export-md reports/
+    python report_archive.py reports.archive export-jsonl reports.jsonl
+"""
+import argparse
+import itertools
+import json
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from report_generator import render_research_report
+from result_store import EvaluationStore
+from search_functions import evaluation_digest
+
+INDEX_FILE = "index.sqlite3"
+SEGMENT_PREFIX = "segment-"
+# 段文件达到该大小（字节）后换用新文件
+SEGMENT_BYTES = int(os.environ.get("REPORT_ARCHIVE_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# zlib压缩级别（1–9），批量写入时压缩是主要开销，6以上体积只再减少约15%
+COMPRESSION_LEVEL = int(os.environ.get("REPORT_ARCHIVE_COMPRESSION_LEVEL", "3"))
+
+# 条目头部：魔数、报告压缩长度、得分压缩长度
+_HEADER = struct.Struct("<4sII")
+_MAGIC = b"RPT1"
+# 顺序导出时读取段文件的缓冲区大小
+_EXPORT_BUFFER = 1024 * 1024
+
+# 归档中的一个条目，report/scores未读取时为None
+ArchivedReport = namedtuple("ArchivedReport", ["digest", "paper_topic", "variable_settings", "empirical_model",
+                                               "total_score", "created_at", "report", "scores"])
+
+
+def report_file_name(digest):
+    """导出的报告文件名"""
+    return f"{digest[:16]}.md"
+
+
+class ReportArchive:
+    """报告和得分的压缩归档，支持按摘要随机读取和按存储顺序批量导出"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS reports (
+            digest TEXT PRIMARY KEY,
+            paper_topic TEXT NOT NULL,
+            variable_settings TEXT NOT NULL,
+            empirical_model TEXT NOT NULL,
+            total_score REAL,
+            segment TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            report_length INTEGER NOT NULL,
+            scores_length INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_reports_location ON reports (segment, offset);
+        CREATE INDEX IF NOT EXISTS idx_reports_topic ON reports (paper_topic, created_at);
+    """
+
+    _METADATA = "digest, paper_topic, variable_settings, empirical_model, total_score, created_at"
+
+    def __init__(self, path, sync=True):
+        """打开（必要时创建）归档目录
+
+        Args:
+            path: 归档目录
+            sync: 提交索引前是否对段文件执行fsync，关闭后断电时已提交的条目可能丢失
+        """
+        self.path = path
+        self.sync = sync
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._segment_counter = itertools.count()
+        self._open()
+
+    def _open(self):
+        """打开索引连接，重置段文件和读取句柄（创建时和在子进程中首次使用时）"""
+        self._pid = os.getpid()
+        self._conn = sqlite3.connect(os.path.join(self.path, INDEX_FILE), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+        self._segment = None
+        self._readers = {}
+
+    def _check_process(self):
+        """fork出的子进程不沿用父进程的索引连接和段文件"""
+        if self._pid != os.getpid():
+            self._open()
+
+    def _writable_segment(self):
+        """当前写入的段文件(名称, 文件)，达到SEGMENT_BYTES后换用新文件"""
+        if self._segment is not None and self._segment[1].tell() >= SEGMENT_BYTES:
+            self._segment[1].close()
+            self._segment = None
+        if self._segment is None:
+            name = f"{SEGMENT_PREFIX}{os.getpid()}-{time.time_ns()}-{next(self._segment_counter)}.dat"
+            self._segment = (name, open(os.path.join(self.path, name), "ab"))
+        return self._segment
+
+    def _discard_segment(self, size):
+        """写入失败后关闭段文件并截断回写入前的长度，之后的写入使用新文件"""
+        name, f = self._segment
+        self._segment = None
+        try:
+            f.close()
+        except OSError:
+            pass
+        os.truncate(os.path.join(self.path, name), size)
+
+    @staticmethod
+    def _compress(text):
+        return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+    def append(self, paper_topic, variable_settings, empirical_model, report_content, score_results):
+        """写入一个报告
+
+        Returns:
+            str: 条目的摘要
+        """
+        return self.append_many([(paper_topic, variable_settings, empirical_model, report_content, score_results)])[0]
+
+    def append_many(self, entries):
+        """在一个事务中写入一批报告
+
+        Args:
+            entries: (论文选题, 变量设置, 实证模型, 报告Markdown内容, calculate_research_score的结果)的可迭代对象
+
+        Returns:
+            list: 各条目的摘要
+        """
+        prepared = []
+        for paper_topic, variable_settings, empirical_model, report_content, score_results in entries:
+            scores = json.dumps(EvaluationStore.serialize_result(score_results), ensure_ascii=False,
+                                separators=(",", ":"))
+            prepared.append((evaluation_digest(paper_topic, variable_settings, empirical_model), paper_topic,
+                             variable_settings or "", empirical_model or "", score_results.get("total_score"),
+                             self._compress(report_content), self._compress(scores)))
+        if not prepared:
+            return []
+
+        with self._lock:
+            self._check_process()
+            name, f = self._writable_segment()
+            start = f.tell()
+            created_at = time.time()
+            rows = []
+            try:
+                for digest, paper_topic, variable_settings, empirical_model, total_score, report, scores in prepared:
+                    rows.append((digest, paper_topic, variable_settings, empirical_model, total_score, name,
+                                 f.tell(), len(report), len(scores), created_at))
+                    f.write(_HEADER.pack(_MAGIC, len(report), len(scores)))
+                    f.write(report)
+                    f.write(scores)
+                f.flush()
+                if self.sync:
+                    os.fsync(f.fileno())
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO reports (digest, paper_topic, variable_settings, empirical_model, "
+                        "total_score, segment, offset, report_length, scores_length, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                    )
+            except BaseException:
+                self._discard_segment(start)
+                raise
+        return [row[0] for row in rows]
+
+    def _reader(self, segment):
+        """段文件的只读文件描述符（持有self._lock时调用；按段缓存，os.pread可在多个线程中并发使用）"""
+        fd = self._readers.get(segment)
+        if fd is None:
+            fd = self._readers[segment] = os.open(os.path.join(self.path, segment), os.O_RDONLY)
+        return fd
+
+    @staticmethod
+    def _check_header(data, row):
+        """校验条目头部与索引一致"""
+        magic, report_length, scores_length = _HEADER.unpack_from(data)
+        if magic != _MAGIC or report_length != row["report_length"] or scores_length != row["scores_length"]:
+            raise ValueError(f"归档条目损坏: {row['digest']}（{row['segment']}@{row['offset']}）")
+
+    @staticmethod
+    def _entry(row, report=None, scores=None):
+        return ArchivedReport(row["digest"], row["paper_topic"], row["variable_settings"], row["empirical_model"],
+                              row["total_score"], row["created_at"], report, scores)
+
+    def get(self, digest, scores=True):
+        """按摘要读取条目
+
+        Args:
+            digest: 规范化输入摘要
+            scores: 是否同时读取并解压得分JSON
+
+        Returns:
+            ArchivedReport: 条目，不存在时返回None
+
+        Raises:
+            ValueError: 条目头部与索引不一致
+        """
+        with self._lock:
+            self._check_process()
+            row = self._conn.execute("SELECT * FROM reports WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            fd = self._reader(row["segment"])
+        length = _HEADER.size + row["report_length"] + (row["scores_length"] if scores else 0)
+        data = os.pread(fd, length, row["offset"])
+        self._check_header(data, row)
+        report_end = _HEADER.size + row["report_length"]
+        report = zlib.decompress(data[_HEADER.size:report_end]).decode("utf-8")
+        return self._entry(row, report, json.loads(zlib.decompress(data[report_end:])) if scores else None)
+
+    def read_report(self, digest):
+        """按摘要读取报告Markdown内容，不存在时返回None"""
+        entry = self.get(digest, scores=False)
+        return entry.report if entry is not None else None
+
+    def read_scores(self, digest):
+        """按摘要读取得分（EvaluationStore.serialize_result的格式），不存在时返回None"""
+        entry = self.get(digest)
+        return entry.scores if entry is not None else None
+
+    def __contains__(self, digest):
+        with self._lock:
+            self._check_process()
+            return self._conn.execute("SELECT 1 FROM reports WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            self._check_process()
+            return self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def entries(self, topic_prefix=None):
+        """条目的元数据（不读取段文件），按写入时间倒序
+
+        Args:
+            topic_prefix: 只返回选题以该前缀开头的条目
+
+        Returns:
+            list: ArchivedReport列表，report和scores为None
+        """
+        sql = f"SELECT {self._METADATA} FROM reports"
+        params = ()
+        if topic_prefix:
+            sql += " WHERE substr(paper_topic, 1, ?) = ?"
+            params = (len(topic_prefix), topic_prefix)
+        with self._lock:
+            self._check_process()
+            rows = self._conn.execute(sql + " ORDER BY created_at DESC", params).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def iter_reports(self, scores=False):
+        """按存储顺序读取全部条目，每个段文件只顺序读取一遍
+
+        Args:
+            scores: 是否同时读取并解压得分JSON
+
+        Yields:
+            ArchivedReport: 条目
+        """
+        with self._lock:
+            self._check_process()
+            rows = self._conn.execute("SELECT * FROM reports ORDER BY segment, offset").fetchall()
+        for segment, group in itertools.groupby(rows, key=lambda row: row["segment"]):
+            with open(os.path.join(self.path, segment), "rb", buffering=_EXPORT_BUFFER) as f:
+                for row in group:
+                    f.seek(row["offset"])
+                    data = f.read(_HEADER.size + row["report_length"] + (row["scores_length"] if scores else 0))
+                    self._check_header(data, row)
+                    report_end = _HEADER.size + row["report_length"]
+                    report = zlib.decompress(data[_HEADER.size:report_end]).decode("utf-8")
+                    yield self._entry(row, report, json.loads(zlib.decompress(data[report_end:])) if scores else None)
+
+    def export_markdown(self, directory):
+        """把全部报告导出为Markdown文件，文件名见report_file_name
+
+        Returns:
+            int: 导出的报告数
+        """
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        for entry in self.iter_reports():
+            with open(os.path.join(directory, report_file_name(entry.digest)), "w", encoding="utf-8") as f:
+                f.write(entry.report)
+            count += 1
+        return count
+
+    def export_jsonl(self, f):
+        """把全部条目（元数据、报告和得分）按行写为JSON对象
+
+        Args:
+            f: 文本文件对象
+
+        Returns:
+            int: 导出的条目数
+        """
+        count = 0
+        for entry in self.iter_reports(scores=True):
+            f.write(json.dumps(entry._asdict(), ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+            count += 1
+        return count
+
+    def stats(self):
+        """归档的条目数、段文件数和空间占用
+
+        Returns:
+            dict: entries、segments、file_bytes（段文件总大小）和live_bytes（可读取的条目占用）
+        """
+        with self._lock:
+            self._check_process()
+            row = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM({_HEADER.size} + report_length + scores_length), 0) FROM reports"
+            ).fetchone()
+        segments = [name for name in os.listdir(self.path) if name.startswith(SEGMENT_PREFIX)]
+        return {
+            "entries": row[0],
+            "segments": len(segments),
+            "file_bytes": sum(os.path.getsize(os.path.join(self.path, name)) for name in segments),
+            "live_bytes": row[1],
+        }
+
+    def close(self):
+        """关闭段文件、读取句柄和索引连接"""
+        with self._lock:
+            if self._pid == os.getpid():
+                if self._segment is not None:
+                    self._segment[1].close()
+                    self._segment = None
+                for fd in self._readers.values():
+                    os.close(fd)
+                self._readers = {}
+                self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def archive_research_reports(inputs_list, archive, processes=None, chunk_size=8, batch_size=64, use_store=True):
+    """在进程池中批量评估，报告和得分写入归档
+
+    Args:
+        inputs_list: (论文选题, 变量设置, 实证模型)元组列表
+        archive: ReportArchive
+        processes: 工作进程数，默认为CPU核数
+        chunk_size: 每个任务评估的输入数（见result_transport.evaluate_in_processes）
+        batch_size: 每个索引事务写入的报告数
+        use_store: 工作进程是否读写评估结果存储
+
+    Returns:
+        list: 与inputs_list顺序一致的条目摘要，评估失败的输入为None
+    """
+    from result_transport import evaluate_in_processes
+    inputs_list = [tuple(inputs) for inputs in inputs_list]
+    results = evaluate_in_processes(inputs_list, processes=processes, chunk_size=chunk_size, use_store=use_store)
+    digests = [None] * len(inputs_list)
+    batch = []
+
+    def flush():
+        for index, digest in zip([index for index, _ in batch], archive.append_many([entry for _, entry in batch])):
+            digests[index] = digest
+        batch.clear()
+
+    for index, (inputs, score_results) in enumerate(zip(inputs_list, results)):
+        if not score_results:
+            continue
+        paper_topic, variable_settings, empirical_model = inputs
+        report_content = render_research_report(paper_topic, score_results)
+        batch.append((index, (paper_topic, variable_settings, empirical_model, report_content, score_results)))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return digests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评估报告归档的查看和导出")
+    parser.add_argument("archive", help="归档目录")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list", help="列出条目")
+    list_parser.add_argument("--topic-prefix", help="只列出选题以该前缀开头的条目")
+    show_parser = subparsers.add_parser("show", help="输出一个报告")
+    show_parser.add_argument("digest", help="规范化输入摘要（可只写前缀）")
+    show_parser.add_argument("--scores", action="store_true", help="输出得分JSON而不是报告")
+    export_md = subparsers.add_parser("export-md", help="把全部报告导出为Markdown文件")
+    export_md.add_argument("directory", help="输出目录")
+    export_jsonl = subparsers.add_parser("export-jsonl", help="把全部条目导出为JSON Lines，-表示标准输出")
+    export_jsonl.add_argument("output", help="输出文件")
+    subparsers.add_parser("stats", help="条目数和空间占用")
+    args = parser.parse_args()
+
+    if not os.path.isfile(os.path.join(args.archive, INDEX_FILE)):
+        parser.error(f"不是报告归档: {args.archive}")
+    with ReportArchive(args.archive) as archive:
+        if args.command == "list":
+            for entry in archive.entries(args.topic_prefix):
+                total_score = "-" if entry.total_score is None else f"{entry.total_score:.2f}"
+                created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.created_at))
+                print(f"{entry.digest[:16]}  {created_at}  {total_score:>5}  {entry.paper_topic}")
+        elif args.command == "show":
+            matches = [entry.digest for entry in archive.entries() if entry.digest.startswith(args.digest)]
+            if len(matches) != 1:
+                sys.exit(f"{'没有' if not matches else '有多个'}摘要以 {args.digest} 开头的条目")
+            entry = archive.get(matches[0], scores=args.scores)
+            print(json.dumps(entry.scores, ensure_ascii=False, indent=2) if args.scores else entry.report)
+        elif args.command == "export-md":
+            count = archive.export_markdown(args.directory)
+            print(f"已导出 {count} 个报告到 {args.directory}", file=sys.stderr)
+        elif args.command == "export-jsonl":
+            if args.output == "-":
+                count = archive.export_jsonl(sys.stdout)
+            else:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    count = archive.export_jsonl(f)
+            print(f"已导出 {count} 个条目到 {args.output}", file=sys.stderr)
+        else:
+            print(json.dumps(archive.stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
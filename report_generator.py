@@ -1,5 +1,7 @@
-from search_functions import calculate_research_score
+from search_functions import calculate_research_score, evaluation_digest, SearchConfig
+from result_store import get_default_store
 import os
+import threading
 
 def generate_star_display(score):
     """
@@ -178,26 +180,17 @@ def generate_dataset_table(journal_docs):
     
     return table_content
 
-def generate_research_report(paper_topic, variable_settings, empirical_model="", output_file=None):
+def render_research_report(paper_topic, score_results):
     """
-    生成论文选题评估报告
+    根据评分结果渲染论文选题评估报告的Markdown内容
     
     Args:
         paper_topic: 论文选题
-        variable_settings: 变量设置
-        empirical_model: 实证模型
-        output_file: 输出文件路径，默认为"论文选题评估结果.md"
+        score_results: calculate_research_score返回的评分结果
     
     Returns:
-        str: 生成的报告文件路径
+        str: 报告的Markdown内容
     """
-    # 如果未指定输出文件，使用默认文件名
-    if output_file is None:
-        output_file = os.path.join(os.path.dirname(__file__), "论文选题评估结果.md")
-    
-    # 运行calculate_research_score获取评分结果
-    score_results = calculate_research_score(paper_topic, variable_settings, empirical_model)
-    
     # 提取各项得分和评分理由
     # 总分为所有维度得分的平均值
     total_score = score_results.get("total_score", 0)
@@ -330,14 +323,135 @@ def generate_research_report(paper_topic, variable_settings, empirical_model="",
  ### 实证模型可行性：{empirical_model_score_stars}
  {empirical_model_reason}
 """
+    return report_content
+
+def default_report_path(digest=None):
+    """
+    默认的报告文件路径，不同输入的报告写入不同文件，并发运行不会互相覆盖
+    
+    Args:
+        digest: 规范化输入摘要（见search_functions.evaluation_digest）
+    
+    Returns:
+        str: 模块所在目录下的"论文选题评估结果-<摘要前16位>.md"，未指定摘要时为"论文选题评估结果.md"
+    """
+    file_name = f"论文选题评估结果-{digest[:16]}.md" if digest else "论文选题评估结果.md"
+    return os.path.join(os.path.dirname(__file__), file_name)
 
+def write_report(report_content, output_file=None, digest=None):
+    """
+    将报告内容写入文件，先写入同目录下的临时文件再替换，读取方不会看到写了一半的报告
+    
+    Args:
+        report_content: 报告的Markdown内容
+        output_file: 输出文件路径，默认为default_report_path(digest)
+        digest: 规范化输入摘要，用于默认文件名
+    
+    Returns:
+        str: 报告文件路径
+    """
+    # 如果未指定输出文件，使用默认文件名
+    if output_file is None:
+        output_file = default_report_path(digest)
+    
     # 写入报告文件
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(report_content)
+    tmp_path = f"{output_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(report_content)
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
     
     print(f"评估报告已生成: {output_file}")
     return output_file
 
+def generate_research_report(paper_topic, variable_settings, empirical_model="", output_file=None, profile=None,
+                             archive=None):
+    """
+    生成论文选题评估报告
+    
+    Args:
+        paper_topic: 论文选题
+        variable_settings: 变量设置
+        empirical_model: 实证模型
+        output_file: 输出文件路径，默认为default_report_path(输入摘要)
+        profile: 性能分析模式（cprofile或sampling，见profiling.py），None时使用SearchConfig.PROFILE，False时不分析；
+            分析结果写在报告旁边，文件名为报告名加".profile"
+        archive: report_archive.ReportArchive，指定时报告和得分写入归档而不是单独的文件
+    
+    Returns:
+        str: 生成的报告文件路径；写入归档时为条目的摘要
+    """
+    digest = evaluation_digest(paper_topic, variable_settings, empirical_model)
+    if profile is None:
+        profile = SearchConfig.PROFILE
+    if profile:
+        from profiling import run_profiled
+        profile_path = os.path.splitext(output_file or default_report_path(digest))[0] + ".profile"
+        return run_profiled(profile, profile_path, _generate_research_report, paper_topic, variable_settings,
+                            empirical_model, output_file, digest, archive, label=paper_topic)
+    return _generate_research_report(paper_topic, variable_settings, empirical_model, output_file, digest, archive)
+
+def _generate_research_report(paper_topic, variable_settings, empirical_model, output_file, digest, archive):
+    """
+    generate_research_report的实现（不含性能分析）
+    """
+    # 运行calculate_research_score获取评分结果，重复的输入直接由缓存或持久化存储返回
+    score_results = calculate_research_score(paper_topic, variable_settings, empirical_model, profile=False)
+    
+    report_content = render_research_report(paper_topic, score_results)
+    if archive is not None:
+        return archive.append(paper_topic, variable_settings, empirical_model, report_content, score_results)
+    return write_report(report_content, output_file, digest)
+
+async def generate_research_report_async(paper_topic, variable_settings, empirical_model="", output_file=None, engine=None):
+    """
+    generate_research_report的异步版本，检索通过AsyncVectorSearchEngine发出
+    
+    Args:
+        paper_topic: 论文选题
+        variable_settings: 变量设置
+        empirical_model: 实证模型
+        output_file: 输出文件路径，默认为default_report_path(输入摘要)
+        engine: 共享的AsyncVectorSearchEngine，默认为本次调用新建
+    
+    Returns:
+        str: 生成的报告文件路径
+    """
+    import asyncio
+    from async_search import calculate_research_score_async
+    
+    score_results = await calculate_research_score_async(paper_topic, variable_settings, empirical_model, engine=engine)
+    
+    report_content = render_research_report(paper_topic, score_results)
+    digest = evaluation_digest(paper_topic, variable_settings, empirical_model)
+    return await asyncio.to_thread(write_report, report_content, output_file, digest)
+
+def rerender_research_report(digest, output_file=None, store=None):
+    """
+    从持久化存储中读取最近一次评估结果并重新生成报告，不调用任何检索服务
+    
+    Args:
+        digest: 规范化输入摘要（见search_functions.evaluation_digest）
+        output_file: 输出文件路径，默认为default_report_path(digest)
+        store: 评估结果存储，默认使用get_default_store()
+    
+    Returns:
+        str: 生成的报告文件路径，存储中没有该摘要时返回None
+    """
+    store = store or get_default_store()
+    records = store.find_by_digest(digest) if store is not None else []
+    if not records:
+        print(f"评估结果存储中没有摘要为 {digest} 的记录")
+        return None
+    
+    record = records[0]
+    report_content = render_research_report(record["paper_topic"], record["result"])
+    return write_report(report_content, output_file, digest)
+
 if __name__ == "__main__":
     # 示例用法
     paper_topic = "新质生产力对碳排放的影响路经分析"
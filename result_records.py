@@ -0,0 +1,180 @@
+"""紧凑的检索结果记录类型
+
+每个集合一个带__slots__的记录类型，字段即该集合的输出字段加id和score，替代检索结果的dict或dashvector的Doc：
+
+    JournalDoc      journal（默认journal_new）
+    CfpDoc          cfp（默认CFP_v2）
+    DatasetDoc      dataset（默认dataset_v4）
+    SkjjDoc         skjj（默认SKJJ）
+
+记录类型按集合别名对应，集合名称经评估配置快照（evaluation_config）解析，覆盖集合名称后仍使用对应的记录类型。
+
+source、journallevel等取值重复度高的字符串字段以及列表字段（存为元组）中的字符串经sys.intern驻留，
+大量记录共享同一个字符串对象。记录保留dict的只读接口（get、[]、in、keys、items）并注册为
+collections.abc.Mapping，现有按dict访问结果的代码无需修改；to_dict/from_dict与普通dict互相转换。
+"""
+import collections.abc
+import sys
+
+from vector_search_core import APIConfig, ResultProcessor
+from evaluation_config import COLLECTION_SETTINGS, current_config
+
+
+class CompactRecord:
+    """检索结果记录基类，子类通过__slots__声明字段
+
+    值为None的字段视为不存在；不在__slots__中的字段保存在_extra字典中，转换时不会丢失
+    """
+
+    __slots__ = ("_extra",)
+    # 需要驻留的字符串字段
+    INTERNED = ()
+    _FIELDS = ()
+    _FIELD_SET = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELDS = tuple(field for klass in reversed(cls.__mro__)
+                            for field in getattr(klass, "__slots__", ()) if field != "_extra")
+        cls._FIELD_SET = frozenset(cls._FIELDS)
+
+    def __init__(self, **values):
+        self._extra = None
+        for field in self._FIELDS:
+            setattr(self, field, None)
+        for key, value in values.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, record):
+        """由dict创建记录"""
+        return cls(**record)
+
+    def _compact(self, key, value):
+        """驻留字符串，列表转换为元组"""
+        if isinstance(value, str):
+            return sys.intern(value) if key in self.INTERNED else value
+        if isinstance(value, list):
+            return tuple(sys.intern(item) if isinstance(item, str) else item for item in value)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._FIELD_SET:
+            setattr(self, key, self._compact(key, value))
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __getitem__(self, key):
+        value = getattr(self, key, None) if key in self._FIELD_SET else (self._extra or {}).get(key)
+        if value is None:
+            raise KeyError(key)
+        return list(value) if isinstance(value, tuple) else value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        keys = [field for field in self._FIELDS if getattr(self, field) is not None]
+        return keys + [key for key, value in (self._extra or {}).items() if value is not None]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def to_dict(self):
+        """转换为普通dict（元组字段还原为列表，不含值为None的字段）"""
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, collections.abc.Mapping):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+# 记录与dict、result_transport.SharedRecord等映射按内容比较
+collections.abc.Mapping.register(CompactRecord)
+
+
+class JournalDoc(CompactRecord):
+    __slots__ = ("id", "score", "title", "source", "keywords", "descs", "publication_date", "url", "journallevel")
+    INTERNED = ("source", "journallevel", "publication_date")
+
+
+class CfpDoc(CompactRecord):
+    __slots__ = ("id", "score", "journal_name", "hot_topics", "call_for_papers_title", "url")
+    INTERNED = ("journal_name",)
+
+
+class DatasetDoc(CompactRecord):
+    __slots__ = ("id", "score", "name", "indicators", "year_start", "year_end", "url")
+
+
+class SkjjDoc(CompactRecord):
+    __slots__ = ("id", "score", "topic_name")
+
+
+# 集合别名（见evaluation_config.COLLECTION_SETTINGS）到记录类型的映射
+RECORD_TYPES = {
+    "journal": JournalDoc,
+    "cfp": CfpDoc,
+    "dataset": DatasetDoc,
+    "skjj": SkjjDoc,
+}
+
+
+def record_type_for(collection_name, config=None):
+    """集合名称对应的记录类型
+
+    先按配置快照中的集合名称解析别名，不在快照中的名称再按APIConfig中的默认集合名称解析
+
+    Args:
+        collection_name: 集合名称
+        config: 配置快照，默认为current_config()
+
+    Returns:
+        CompactRecord的子类，未知集合时为None
+    """
+    for alias, name in (config or current_config()).collections.items():
+        if name == collection_name:
+            return RECORD_TYPES[alias]
+    for alias, attribute in COLLECTION_SETTINGS.items():
+        if getattr(APIConfig, attribute) == collection_name:
+            return RECORD_TYPES[alias]
+    return None
+
+
+def to_record(result, collection_name, config=None):
+    """将检索结果（dict、Doc或记录）转换为集合对应的记录类型
+
+    Args:
+        result: 单条检索结果
+        collection_name: 集合名称，未知集合时返回普通dict
+        config: 解析集合名称的配置快照，默认为current_config()
+
+    Returns:
+        CompactRecord或dict
+    """
+    record_type = record_type_for(collection_name, config)
+    if record_type is not None and type(result) is record_type:
+        return result
+    record = ResultProcessor.to_dict(result)
+    return record if record_type is None else record_type.from_dict(record)
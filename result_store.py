@@ -0,0 +1,355 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections.abc import Sequence
+
+from vector_search_core import ResultProcessor
+
+
+class EvaluationStore:
+    """评估结果持久化存储，基于SQLite
+
+    以(规范化输入摘要, 集合版本, 配置摘要)为唯一键保存calculate_research_score的完整结果，
+    支持按摘要、选题前缀和时间范围检索
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS evaluations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            digest TEXT NOT NULL,
+            collection_versions TEXT NOT NULL,
+            config_hash TEXT NOT NULL,
+            paper_topic TEXT NOT NULL,
+            variable_settings TEXT NOT NULL,
+            empirical_model TEXT NOT NULL,
+            total_score REAL,
+            created_at REAL NOT NULL,
+            result_json TEXT NOT NULL,
+            UNIQUE (digest, collection_versions, config_hash)
+        );
+        CREATE INDEX IF NOT EXISTS idx_evaluations_topic ON evaluations (paper_topic, created_at);
+        CREATE INDEX IF NOT EXISTS idx_evaluations_created ON evaluations (created_at);
+        CREATE INDEX IF NOT EXISTS idx_evaluations_versions ON evaluations (collection_versions, config_hash);
+        CREATE TABLE IF NOT EXISTS evaluation_queries (
+            digest TEXT NOT NULL,
+            collection_versions TEXT NOT NULL,
+            config_hash TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            collection TEXT NOT NULL,
+            query_text TEXT NOT NULL,
+            topk INTEGER NOT NULL,
+            threshold REAL NOT NULL,
+            vector BLOB NOT NULL,
+            PRIMARY KEY (digest, collection_versions, config_hash, dimension, query_text)
+        );
+        CREATE INDEX IF NOT EXISTS idx_queries_collection ON evaluation_queries (collection, collection_versions, config_hash);
+    """
+
+    def __init__(self, path):
+        """打开（必要时创建）存储文件
+
+        Args:
+            path: SQLite数据库文件路径，":memory:"表示内存数据库
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def _versions_key(collection_versions):
+        """集合版本的规范化JSON表示"""
+        return json.dumps(collection_versions or {}, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+    @staticmethod
+    def serialize_result(score_results):
+        """将评估结果转换为可JSON序列化的字典，检索结果中的Doc对象会被展开
+
+        Args:
+            score_results: calculate_research_score返回的字典
+
+        Returns:
+            dict: 可序列化的评估结果
+        """
+        serialized = {}
+        for key, value in score_results.items():
+            if key.endswith("_results") and isinstance(value, Sequence) and not isinstance(value, str):
+                value = [ResultProcessor.to_dict(result) for result in value]
+            serialized[key] = value
+        return serialized
+
+    @staticmethod
+    def _row_to_record(row):
+        """将数据库行转换为记录字典"""
+        return {
+            "digest": row["digest"],
+            "collection_versions": json.loads(row["collection_versions"]),
+            "config_hash": row["config_hash"],
+            "paper_topic": row["paper_topic"],
+            "variable_settings": row["variable_settings"],
+            "empirical_model": row["empirical_model"],
+            "total_score": row["total_score"],
+            "created_at": row["created_at"],
+            "result": json.loads(row["result_json"])
+        }
+
+    def put(self, digest, inputs, score_results, collection_versions, config_hash, created_at=None):
+        """保存一次评估结果，相同键的旧结果会被覆盖
+
+        Args:
+            digest: 规范化输入摘要
+            inputs: 规范化后的输入字典（paper_topic、variable_settings、empirical_model）
+            score_results: 评估结果字典
+            collection_versions: 集合版本字典
+            config_hash: 检索配置摘要
+            created_at: 评估时间戳，默认为当前时间
+        """
+        result_json = json.dumps(self.serialize_result(score_results), ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO evaluations
+                    (digest, collection_versions, config_hash, paper_topic, variable_settings,
+                     empirical_model, total_score, created_at, result_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    digest,
+                    self._versions_key(collection_versions),
+                    config_hash,
+                    inputs.get("paper_topic", ""),
+                    inputs.get("variable_settings", ""),
+                    inputs.get("empirical_model", ""),
+                    score_results.get("total_score"),
+                    time.time() if created_at is None else created_at,
+                    result_json
+                )
+            )
+            self._conn.commit()
+
+    def get(self, digest, collection_versions, config_hash):
+        """按完整键读取评估结果
+
+        Args:
+            digest: 规范化输入摘要
+            collection_versions: 集合版本字典
+            config_hash: 检索配置摘要
+
+        Returns:
+            dict: 评估结果，不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result_json FROM evaluations WHERE digest = ? AND collection_versions = ? AND config_hash = ?",
+                (digest, self._versions_key(collection_versions), config_hash)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row["result_json"])
+
+    def find_by_digest(self, digest):
+        """读取某个输入在所有集合版本和配置下的评估记录，按时间倒序
+
+        Args:
+            digest: 规范化输入摘要
+
+        Returns:
+            list: 记录字典列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM evaluations WHERE digest = ? ORDER BY created_at DESC",
+                (digest,)
+            ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def find_by_topic_prefix(self, prefix, limit=100):
+        """按选题前缀检索评估记录，按选题和时间排序
+
+        Args:
+            prefix: 规范化后的选题前缀
+            limit: 最大返回条数
+
+        Returns:
+            list: 记录字典列表
+        """
+        # 使用区间查询而不是LIKE，保证能走paper_topic索引
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT * FROM evaluations
+                WHERE paper_topic >= ? AND paper_topic < ?
+                ORDER BY paper_topic, created_at DESC
+                LIMIT ?
+                """,
+                (prefix, prefix + "\U0010ffff", limit)
+            ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def find_by_date_range(self, start=None, end=None, limit=1000):
+        """按评估时间范围检索评估记录，按时间倒序
+
+        Args:
+            start: 起始时间戳（包含），None表示不限
+            end: 结束时间戳（不包含），None表示不限
+            limit: 最大返回条数
+
+        Returns:
+            list: 记录字典列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT * FROM evaluations
+                WHERE created_at >= ? AND created_at < ?
+                ORDER BY created_at DESC
+                LIMIT ?
+                """,
+                (start if start is not None else float("-inf"), end if end is not None else float("inf"), limit)
+            ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def list_evaluations(self, collection_versions, config_hash):
+        """列出某个集合版本和配置下的全部评估记录
+
+        Args:
+            collection_versions: 集合版本字典
+            config_hash: 检索配置摘要
+
+        Returns:
+            list: 记录字典列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM evaluations WHERE collection_versions = ? AND config_hash = ?",
+                (self._versions_key(collection_versions), config_hash)
+            ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def put_queries(self, digest, collection_versions, config_hash, queries):
+        """保存一次评估中各维度的查询向量和阈值，用于集合更新后判断评估是否受影响
+
+        Args:
+            digest: 规范化输入摘要
+            collection_versions: 集合版本字典
+            config_hash: 检索配置摘要
+            queries: 查询描述列表，每项包含dimension、collection、query_text、topk、threshold和vector
+                （vector为None表示没有查询向量，以空BLOB保存）
+        """
+        versions_key = self._versions_key(collection_versions)
+        rows = [
+            (
+                digest, versions_key, config_hash, query["dimension"], query["collection"],
+                query["query_text"], int(query["topk"]), float(query["threshold"]),
+                b"" if query["vector"] is None else array("f", query["vector"]).tobytes()
+            )
+            for query in queries
+        ]
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO evaluation_queries
+                    (digest, collection_versions, config_hash, dimension, collection, query_text, topk, threshold, vector)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            self._conn.commit()
+
+    def get_queries(self, collection, collection_versions, config_hash):
+        """读取某个集合上保存的全部查询
+
+        Args:
+            collection: 集合名称
+            collection_versions: 集合版本字典
+            config_hash: 检索配置摘要
+
+        Returns:
+            list: 查询描述列表，vector为float32的array，没有查询向量时为None
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT digest, dimension, collection, query_text, topk, threshold, vector
+                FROM evaluation_queries
+                WHERE collection = ? AND collection_versions = ? AND config_hash = ?
+                """,
+                (collection, self._versions_key(collection_versions), config_hash)
+            ).fetchall()
+        queries = []
+        for row in rows:
+            vector = None
+            if row["vector"]:
+                vector = array("f")
+                vector.frombytes(row["vector"])
+            queries.append({
+                "digest": row["digest"],
+                "dimension": row["dimension"],
+                "collection": row["collection"],
+                "query_text": row["query_text"],
+                "topk": row["topk"],
+                "threshold": row["threshold"],
+                "vector": vector
+            })
+        return queries
+
+    def copy_queries(self, digest, collection_versions, new_collection_versions, config_hash):
+        """将某个评估的查询复制到新的集合版本下（查询向量只依赖输入文本，与集合内容无关）
+
+        Args:
+            digest: 规范化输入摘要
+            collection_versions: 原集合版本字典
+            new_collection_versions: 新集合版本字典
+            config_hash: 检索配置摘要
+        """
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO evaluation_queries
+                    (digest, collection_versions, config_hash, dimension, collection, query_text, topk, threshold, vector)
+                SELECT digest, ?, config_hash, dimension, collection, query_text, topk, threshold, vector
+                FROM evaluation_queries
+                WHERE digest = ? AND collection_versions = ? AND config_hash = ?
+                """,
+                (self._versions_key(new_collection_versions), digest, self._versions_key(collection_versions), config_hash)
+            )
+            self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store():
+    """返回默认的评估结果存储
+
+    存储路径由环境变量EVALUATION_STORE_PATH指定，默认为当前目录下的evaluation_store.sqlite3；
+    设置为空字符串时禁用持久化
+
+    Returns:
+        EvaluationStore或None
+    """
+    global _default_store
+    path = os.environ.get(
+        "EVALUATION_STORE_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "evaluation_store.sqlite3")
+    )
+    if not path:
+        return None
+    with _default_store_lock:
+        if _default_store is None or _default_store.path != path:
+            _default_store = EvaluationStore(path)
+        return _default_store
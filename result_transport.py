@@ -0,0 +1,539 @@
+"""进程池批量评估的共享内存结果传输
+
+批量评估在进程池中运行时，每个评估结果包含几十到上百条检索记录（期刊摘要、关键词、数据集指标等），
+逐个pickle发回父进程会在两端各消耗一次完整的序列化CPU和内存。本模块改为：
+
+    工作进程把一块评估结果中的全部记录按列写入一个内存映射文件（默认位于/dev/shm，即共享内存），
+    只返回很小的ResultHandle（文件路径、列布局和得分等标量字段）；
+    父进程映射该文件后立即删除路径，数值列直接作为NumPy数组、字符串列作为内存切片读取，
+    报告渲染只解码读到的那几条记录的那几个字段；转换为存储格式等读取全部字段时整列一次解码。
+
+列的编码：
+    float   float64数组（None记为NaN）
+    int     int64数组 + 空值掩码
+    str     UTF-8字节拼接 + 字节偏移和字符偏移（int64） + 空值掩码
+    strlist 列表偏移 + str列（关键词、指标等元组字段）
+    vector  float32矩阵（等长数值列表，如检索时返回的向量）
+    object  逐条pickle（整数与浮点数混合、超出int64范围的整数等其他类型的字段）
+
+用法：
+    results = evaluate_in_processes(inputs_list, processes=4)
+    for inputs, score_results in zip(inputs_list, results):
+        render_research_report(inputs[0], score_results)
+"""
+import collections.abc
+import concurrent.futures
+import itertools
+import math
+import mmap
+import os
+import pickle
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from result_records import RECORD_TYPES
+from structured_log import get_logger
+
+log = get_logger("result_transport")
+
+# 段文件目录：优先使用内存文件系统/dev/shm，可通过环境变量RESULT_TRANSPORT_DIR修改
+TRANSPORT_DIR = os.environ.get("RESULT_TRANSPORT_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+SEGMENT_PREFIX = "topic-evaluation-results-"
+# 各列在段文件中的对齐字节数
+_ALIGNMENT = 8
+# int列的取值范围（int64）
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+# 工作进程返回的结果句柄：path为段文件路径，tables为各结果列表的列布局，
+# scalars为每个评估结果除检索记录外的字段（评估失败时为None），ranges为每个结果在各表中的行范围
+ResultHandle = namedtuple("ResultHandle", ["path", "size", "tables", "scalars", "ranges"])
+
+_RECORD_TYPES_BY_NAME = {record_type.__name__: record_type for record_type in RECORD_TYPES.values()}
+_segment_counter = itertools.count()
+
+
+def _is_results_field(key, value):
+    """检索记录列表字段（journal_results等）"""
+    return key.endswith("_results") and isinstance(value, (list, tuple, RecordListView))
+
+
+def _column_kind(values):
+    """根据一列的非空值选择编码方式
+
+    整数和浮点数混合的列逐条pickle，避免整数（如year_start）读回时变成浮点数
+    """
+    present = [value for value in values if value is not None]
+    types = {type(value) for value in present}
+    if not types:
+        return "object"
+    if types == {float}:
+        return "float"
+    if types == {int}:
+        return "int" if all(_INT64_MIN <= value <= _INT64_MAX for value in present) else "object"
+    if types == {str}:
+        return "str"
+    if types <= {list, tuple}:
+        item_types = {type(item) for value in present for item in value}
+        if item_types <= {str}:
+            return "strlist"
+        lengths = {len(value) for value in present}
+        if item_types <= {float, int} and len(present) == len(values) and len(lengths) == 1 and lengths.pop() > 0:
+            return "vector"
+    return "object"
+
+
+class _SegmentWriter:
+    """按对齐偏移依次写入各列缓冲区"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = 0
+
+    def write(self, data):
+        """写入一个缓冲区，返回(偏移, 字节数)"""
+        padding = -self.offset % _ALIGNMENT
+        if padding:
+            self.f.write(b"\0" * padding)
+            self.offset += padding
+        data = memoryview(data).cast("B")
+        self.f.write(data)
+        start = self.offset
+        self.offset += len(data)
+        return start, len(data)
+
+    def write_offsets(self, lengths):
+        """写入由各项长度累加得到的int64偏移数组（比长度多一项）"""
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return self.write(offsets)
+
+    def write_strings(self, values):
+        """写入字符串列：UTF-8字节拼接，返回(字节偏移, 字符偏移, 数据)的布局
+
+        字节偏移用于只解码访问到的那一条，字符偏移用于整列一次解码后切片
+        """
+        values = [value if value is not None else "" for value in values]
+        encoded = [value.encode("utf-8") for value in values]
+        return (self.write_offsets([len(item) for item in encoded]), self.write_offsets([len(value) for value in values]),
+                self.write(b"".join(encoded)))
+
+    def write_column(self, kind, values):
+        """写入一列，返回该列的布局"""
+        layout = {"kind": kind, "rows": len(values)}
+        if kind in ("int", "str", "strlist"):
+            layout["mask"] = self.write(np.fromiter((value is not None for value in values), dtype=np.bool_,
+                                                    count=len(values)))
+        if kind == "float":
+            layout["values"] = self.write(np.array([math.nan if value is None else value for value in values],
+                                                   dtype=np.float64))
+        elif kind == "int":
+            layout["values"] = self.write(np.array([0 if value is None else value for value in values], dtype=np.int64))
+        elif kind == "str":
+            layout["offsets"], layout["chars"], layout["data"] = self.write_strings(values)
+        elif kind == "strlist":
+            layout["lists"] = self.write_offsets([len(value) if value is not None else 0 for value in values])
+            layout["offsets"], layout["chars"], layout["data"] = self.write_strings(
+                [item for value in values if value is not None for item in value])
+        elif kind == "vector":
+            matrix = np.array(values, dtype=np.float32)
+            layout["values"] = self.write(matrix)
+            layout["shape"] = matrix.shape
+        else:
+            blobs = [pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL) for value in values]
+            layout["offsets"] = self.write_offsets([len(blob) for blob in blobs])
+            layout["data"] = self.write(b"".join(blobs))
+        return layout
+
+
+def _table_fields(records):
+    """记录表的字段顺序和记录类型名称：紧凑记录按其字段定义，其余按首次出现顺序"""
+    record_types = {type(record) for record in records}
+    record_type = record_types.pop() if len(record_types) == 1 else None
+    if record_type is not None and record_type.__name__ not in _RECORD_TYPES_BY_NAME:
+        record_type = None
+    fields = list(record_type._FIELDS) if record_type is not None else []
+    seen = set(fields)
+    for record in records:
+        extra = getattr(record, "_extra", None) if record_type is not None else record
+        for key in (extra or ()):
+            if key not in seen:
+                seen.add(key)
+                fields.append(key)
+    return fields, record_type
+
+
+def _column_values(records, field, record_type):
+    """读取一个字段在全部记录上的值；紧凑记录的声明字段直接读取属性（元组不转换为列表）"""
+    if record_type is not None and field in record_type._FIELD_SET:
+        return [getattr(record, field) for record in records]
+    return [record.get(field) for record in records]
+
+
+def pack_results(results_list, directory=None):
+    """把一组评估结果写入段文件（工作进程调用）
+
+    Args:
+        results_list: calculate_research_score返回值的列表，失败的评估为None
+        directory: 段文件目录，默认为TRANSPORT_DIR
+
+    Returns:
+        ResultHandle: 可以廉价pickle的结果句柄
+    """
+    scalars = []
+    ranges = []
+    rows = {}
+    for score_results in results_list:
+        if not score_results:
+            scalars.append(None)
+            ranges.append(None)
+            continue
+        scalars.append({key: value for key, value in score_results.items() if not _is_results_field(key, value)})
+        result_ranges = {}
+        for key, value in score_results.items():
+            if _is_results_field(key, value):
+                table = rows.setdefault(key, [])
+                result_ranges[key] = (len(table), len(table) + len(value))
+                table.extend(value)
+        ranges.append(result_ranges)
+
+    path = os.path.join(directory or TRANSPORT_DIR, f"{SEGMENT_PREFIX}{os.getpid()}-{next(_segment_counter)}.bin")
+    tables = {}
+    try:
+        with open(path, "wb") as f:
+            writer = _SegmentWriter(f)
+            for key, records in rows.items():
+                fields, record_type = _table_fields(records)
+                columns = {}
+                for field in fields:
+                    values = _column_values(records, field, record_type)
+                    columns[field] = writer.write_column(_column_kind(values), values)
+                tables[key] = {"type": record_type.__name__ if record_type is not None else None,
+                               "rows": len(records), "fields": fields, "columns": columns}
+            size = writer.offset
+    except BaseException:
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+    return ResultHandle(path, size, tables, scalars, ranges)
+
+
+class _Column:
+    """段文件中一列的只读视图
+
+    数值列和向量列是直接建立在映射内存上的NumPy数组；字符串只在访问到某条记录的该字段时解码那一条，
+    报告只展示前几条记录、且不展示摘要等长文本字段，大部分数据不会被解码
+    """
+
+    def __init__(self, buffer, layout):
+        self.kind = layout["kind"]
+        self.rows = layout["rows"]
+        self._buffer = buffer
+        self._layout = layout
+        self._prepared = False
+        self._decoded = None
+        if self.kind in ("float", "int"):
+            self.values = self._array("values", np.float64 if self.kind == "float" else np.int64)
+        elif self.kind == "vector":
+            self.values = self._array("values", np.float32).reshape(layout["shape"])
+
+    def _array(self, name, dtype):
+        start, length = self._layout[name]
+        return np.frombuffer(self._buffer, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=start)
+
+    def _prepare(self):
+        """首次访问时把偏移和掩码转换为列表（逐条访问NumPy标量较慢）"""
+        layout = self._layout
+        if "mask" in layout:
+            self._mask = self._array("mask", np.bool_).tolist()
+        if "offsets" in layout:
+            self._offsets = self._array("offsets", np.int64).tolist()
+            start, length = layout["data"]
+            self._data = self._buffer[start:start + length]
+        if "lists" in layout:
+            self._lists = self._array("lists", np.int64).tolist()
+        if self.kind in ("float", "int"):
+            self._values = self.values.tolist()
+        self._prepared = True
+
+    def _string(self, index):
+        return str(self._data[self._offsets[index]:self._offsets[index + 1]], "utf-8")
+
+    def value(self, row):
+        """第row条记录的值，不存在时返回None"""
+        if self._decoded is not None:
+            value = self._decoded[row]
+            return list(value) if type(value) is list else value
+        if not self._prepared:
+            self._prepare()
+        kind = self.kind
+        if kind == "float":
+            value = self._values[row]
+            return None if value != value else value
+        if kind == "vector":
+            return self.values[row].tolist()
+        if kind == "object":
+            return pickle.loads(self._data[self._offsets[row]:self._offsets[row + 1]])
+        if not self._mask[row]:
+            return None
+        if kind == "int":
+            return self._values[row]
+        if kind == "str":
+            return self._string(row)
+        return [self._string(index) for index in range(self._lists[row], self._lists[row + 1])]
+
+    def decoded(self):
+        """整列解码（读取全部记录时使用），结果缓存，字符串列只调用一次UTF-8解码"""
+        if self._decoded is not None:
+            return self._decoded
+        if self.kind not in ("str", "strlist"):
+            self._decoded = [self.value(row) for row in range(self.rows)]
+            return self._decoded
+        if not self._prepared:
+            self._prepare()
+        chars = self._array("chars", np.int64).tolist()
+        text = str(self._data, "utf-8")
+        strings = [text[start:stop] for start, stop in zip(chars, chars[1:])]
+        mask = self._mask
+        if self.kind == "str":
+            self._decoded = [string if present else None for string, present in zip(strings, mask)]
+        else:
+            lists = self._lists
+            self._decoded = [strings[lists[row]:lists[row + 1]] if mask[row] else None for row in range(self.rows)]
+        return self._decoded
+
+
+class SharedRecord(collections.abc.Mapping):
+    """段文件中一条检索记录的只读视图，按字段访问时才解码，接口与result_records的紧凑记录一致"""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        column = self._table.columns.get(key)
+        value = column.value(self._row) if column is not None else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        column = self._table.columns.get(key)
+        value = column.value(self._row) if column is not None else None
+        return default if value is None else value
+
+    def keys(self):
+        return [field for field in self._table.fields if self.get(field) is not None]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def to_dict(self):
+        """转换为普通dict"""
+        return dict(self.items())
+
+    def items(self):
+        """全部字段，按整列解码后取值（逐字段get适合只读取少数记录的场景，如渲染报告）"""
+        row = self._row
+        items = []
+        for field, values in self._table.decoded_columns():
+            value = values[row]
+            if value is not None:
+                items.append((field, list(value) if type(value) is list else value))
+        return items
+
+    def to_record(self):
+        """转换为result_records中的紧凑记录（未知类型时为dict）"""
+        record_type = _RECORD_TYPES_BY_NAME.get(self._table.type)
+        return record_type.from_dict(self.to_dict()) if record_type is not None else self.to_dict()
+
+    def __eq__(self, other):
+        if isinstance(other, collections.abc.Mapping):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class _Table:
+    """段文件中一个结果列表字段的全部记录"""
+
+    def __init__(self, buffer, layout):
+        self.type = layout["type"]
+        self.rows = layout["rows"]
+        self.fields = layout["fields"]
+        self.columns = {field: _Column(buffer, column) for field, column in layout["columns"].items()}
+        self._decoded = None
+
+    def decoded_columns(self):
+        """整列解码后的[(字段, 各行取值)]，按字段顺序"""
+        if self._decoded is None:
+            self._decoded = [(field, self.columns[field].decoded()) for field in self.fields]
+        return self._decoded
+
+
+class RecordListView(collections.abc.Sequence):
+    """一个评估结果中某个结果列表字段的记录视图（按需创建SharedRecord）"""
+
+    def __init__(self, table, start, stop):
+        self._table = table
+        self._start = start
+        self._stop = stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return SharedRecord(self._table, self._start + index)
+
+    def column(self, field):
+        """该字段在这些记录上的整列数据（数值列为NumPy视图，不复制），其他类型返回列表"""
+        column = self._table.columns.get(field)
+        if column is None:
+            return [None] * len(self)
+        if column.kind in ("float", "vector"):
+            return column.values[self._start:self._stop]
+        return [column.value(row) for row in range(self._start, self._stop)]
+
+    def __eq__(self, other):
+        if isinstance(other, collections.abc.Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(mine == theirs for mine, theirs in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def open_results(handle):
+    """映射工作进程写入的段文件，返回评估结果视图（父进程调用）
+
+    映射后立即删除段文件，映射在最后一个视图被回收后释放，父进程异常退出也不会遗留文件
+
+    Args:
+        handle: pack_results返回的ResultHandle
+
+    Returns:
+        list: 与打包时顺序一致的评估结果字典，检索记录字段为RecordListView，失败的评估为None
+    """
+    try:
+        if handle.size:
+            with open(handle.path, "rb") as f:
+                buffer = memoryview(mmap.mmap(f.fileno(), handle.size, access=mmap.ACCESS_READ))
+        else:
+            buffer = memoryview(b"")
+    finally:
+        os.unlink(handle.path)
+    tables = {key: _Table(buffer, layout) for key, layout in handle.tables.items()}
+    results = []
+    for scalars, ranges in zip(handle.scalars, handle.ranges):
+        if scalars is None:
+            results.append(None)
+            continue
+        score_results = dict(scalars)
+        for key, (start, stop) in ranges.items():
+            score_results[key] = RecordListView(tables[key], start, stop)
+        results.append(score_results)
+    return results
+
+
+def cleanup_stale_segments(max_age=3600, directory=None):
+    """删除异常退出的工作进程遗留的段文件
+
+    Args:
+        max_age: 超过该秒数未修改的段文件视为遗留
+        directory: 段文件目录，默认为TRANSPORT_DIR
+
+    Returns:
+        int: 删除的文件数
+    """
+    directory = directory or TRANSPORT_DIR
+    removed = 0
+    now = time.time()
+    for name in os.listdir(directory):
+        if not name.startswith(SEGMENT_PREFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.unlink(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def _evaluate_chunk(chunk, transport, use_store):
+    """在工作进程中评估一块输入"""
+    from search_functions import calculate_research_score
+    results = []
+    for paper_topic, variable_settings, empirical_model in chunk:
+        try:
+            results.append(calculate_research_score(paper_topic, variable_settings, empirical_model,
+                                                    use_store=use_store, profile=False))
+        except Exception as e:
+            log.error("batch_evaluation_failed", "批量评估失败: {paper_topic}: {error}", paper_topic=paper_topic, error=e)
+            results.append(None)
+    return pack_results(results) if transport == "shared" else results
+
+
+def evaluate_in_processes(inputs_list, processes=None, chunk_size=8, transport="shared", use_store=True, executor=None):
+    """在进程池中批量评估
+
+    Args:
+        inputs_list: (论文选题, 变量设置, 实证模型)元组列表
+        processes: 工作进程数，默认为CPU核数
+        chunk_size: 每个任务评估的输入数，一个任务的结果写入同一个段文件
+        transport: shared（共享内存段文件，返回视图）或pickle（逐个pickle返回完整结果）
+        use_store: 工作进程是否读写评估结果存储
+        executor: 已有的ProcessPoolExecutor，默认新建并在结束时关闭
+
+    Returns:
+        list: 与inputs_list顺序一致的评估结果，失败的评估为None
+
+    Raises:
+        ValueError: 不支持的传输方式
+    """
+    if transport not in ("shared", "pickle"):
+        raise ValueError(f"不支持的结果传输方式: {transport}")
+    inputs_list = [tuple(inputs) for inputs in inputs_list]
+    chunks = [inputs_list[start:start + chunk_size] for start in range(0, len(inputs_list), chunk_size)]
+    owned = executor is None
+    executor = executor or concurrent.futures.ProcessPoolExecutor(max_workers=processes)
+    futures = []
+    opened = 0
+    try:
+        futures = [executor.submit(_evaluate_chunk, chunk, transport, use_store) for chunk in chunks]
+        results = []
+        for future in futures:
+            value = future.result()
+            opened += 1
+            results.extend(open_results(value) if transport == "shared" else value)
+        return results
+    except BaseException:
+        # 删除其余任务已经写出、尚未打开的段文件
+        for future in futures[opened:]:
+            if future.cancel() or transport != "shared":
+                continue
+            try:
+                os.unlink(future.result().path)
+            except Exception:
+                pass
+        raise
+    finally:
+        if owned:
+            executor.shutdown()
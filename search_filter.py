@@ -0,0 +1,111 @@
+import json
+
+import numpy as np
+
+
+class SearchFilter:
+    """向量检索的元数据过滤条件，各条件之间为"且"关系
+
+    同一个过滤条件既可以转换为DashVector的filter表达式，也可以在本地集合上
+    通过二级索引直接求出满足条件的行号，检索时只对这些行打分。
+
+    示例：
+        SearchFilter().where_in("journallevel", ["CSSCI", "北大核心"])
+        SearchFilter().where_range("year_start", high=2010).where_range("year_end", low=2020)
+    """
+
+    def __init__(self):
+        self.conditions = []
+
+    def where_in(self, field, values):
+        """字段值属于values之一（列表字段只要包含其中之一即满足）
+
+        Args:
+            field: 字段名
+            values: 候选值列表
+
+        Returns:
+            SearchFilter: 自身，便于链式调用
+        """
+        self.conditions.append(("in", field, tuple(values)))
+        return self
+
+    def where_range(self, field, low=None, high=None):
+        """数值字段落在闭区间[low, high]内，None表示该侧不限
+
+        Args:
+            field: 字段名
+            low: 下界
+            high: 上界
+
+        Returns:
+            SearchFilter: 自身，便于链式调用
+        """
+        self.conditions.append(("range", field, low, high))
+        return self
+
+    def __bool__(self):
+        return bool(self.conditions)
+
+    def cache_key(self):
+        """参与检索缓存键计算的稳定表示
+
+        Returns:
+            str: 按条件排序后的JSON
+        """
+        return json.dumps(sorted(json.dumps(condition, ensure_ascii=False) for condition in self.conditions),
+                          ensure_ascii=False)
+
+    @staticmethod
+    def _literal(value):
+        """DashVector表达式中的字面量，字符串加单引号并转义"""
+        if isinstance(value, str):
+            return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+        return repr(value)
+
+    def to_dashvector(self):
+        """转换为DashVector的filter表达式
+
+        Returns:
+            str: 如"(journallevel = 'CSSCI' or journallevel = '北大核心') and year_start <= 2010"
+        """
+        clauses = []
+        for condition in self.conditions:
+            if condition[0] == "in":
+                _, field, values = condition
+                if not values:
+                    # 空候选集不匹配任何文档
+                    clauses.append("1 = 0")
+                    continue
+                options = " or ".join(f"{field} = {self._literal(value)}" for value in values)
+                clauses.append(f"({options})" if len(values) > 1 else options)
+            else:
+                _, field, low, high = condition
+                if low is not None:
+                    clauses.append(f"{field} >= {self._literal(low)}")
+                if high is not None:
+                    clauses.append(f"{field} <= {self._literal(high)}")
+        return " and ".join(clauses)
+
+    def rows(self, collection):
+        """通过本地集合的二级索引求出满足全部条件的行号
+
+        Args:
+            collection: collection_snapshot.LocalCollection
+
+        Returns:
+            numpy.ndarray: 升序排列的行号
+
+        Raises:
+            KeyError: 集合中没有过滤的字段
+        """
+        rows = None
+        for condition in self.conditions:
+            if condition[0] == "in":
+                matched = collection.field_index(condition[1]).lookup(condition[2])
+            else:
+                matched = collection.field_index(condition[1]).range(condition[2], condition[3])
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+            if not len(rows):
+                break
+        return np.arange(len(collection), dtype=np.int64) if rows is None else rows
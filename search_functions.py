@@ -1,9 +1,27 @@
-from vector_search_core import TextVectorizer, VectorSearchClient, ResultProcessor, APIConfig
+from vector_search_core import (
+    ResultProcessor, APIConfig, LRUCache, create_vectorizer, create_search_client, embedding_model_id
+)
+from result_store import get_default_store
+from rate_limiter import ThrottledError
+from quantization import pack_vector, unpack_vector
+from search_filter import SearchFilter
+from collection_snapshot import LocalCollection
+from dataset_availability import AvailabilityTable
+from result_records import to_record
+from structured_log import get_logger
+from evaluation_config import current_config
+import hashlib
 import json
 import os
-import requests
+import re
+import time
+import unicodedata
+import numpy as np
 
-# 内部配置参数
+log = get_logger("search_functions")
+
+# 内部配置参数；检索数量、分数阈值、过滤条件和词法检索参数是默认值，
+# 评估时使用的是evaluation_config的配置快照（可由evaluation_settings.json覆盖并热加载）
 class SearchConfig:
     # 检索结果数量配置
     MAX_JOURNAL_RESULTS = 60  # 期刊检索最大返回结果数
@@ -16,454 +34,1164 @@ class SearchConfig:
     DATASET_MAX_SCORE = 0.55   # 数据集检索最大score值
     CFP_MAX_SCORE = 0.5        # CFP检索最大score值
     SKJJ_MAX_SCORE = 0.52       # skjj检索最大score值
+    
+    # 缓存容量配置
+    EMBEDDING_CACHE_SIZE = 4096   # 文本向量缓存条目数
+    SEARCH_CACHE_SIZE = 2048      # 检索结果缓存条目数
+    EVALUATION_CACHE_SIZE = 256   # 评估结果缓存条目数
+    
+    # 文本向量缓存的存储类型：float32、float16或int8（每个向量单独缩放）
+    EMBEDDING_CACHE_DTYPE = os.environ.get("EMBEDDING_CACHE_DTYPE", "float32")
+    
+    # 检索前的元数据过滤，None表示不过滤
+    JOURNAL_LEVELS = None       # 期刊检索限定的journallevel，如["CSSCI", "北大核心"]
+    CFP_JOURNALS = None         # CFP检索限定的journal_name
+    DATASET_YEAR_RANGE = None   # 数据集需覆盖的年份区间(start, end)：year_start <= start且year_end >= end
+    
+    # 数据集检索的词法索引（使用LOCAL_INDEX_DIR下dataset_v4快照的indicators/keywords倒排索引）：
+    # 变量名与某个指标完全相同时直接由索引给出结果，不再向量化和检索；其他变量的向量分数与BM25分数融合
+    DATASET_LEXICAL_SEARCH = os.environ.get("DATASET_LEXICAL_SEARCH", "0") == "1"
+    DATASET_EXACT_MATCH_SCORE = 1.0   # 精确匹配记录的分数
+    DATASET_LEXICAL_WEIGHT = 0.3      # 融合分数 = 向量分数 + 权重 × BM25分数 × (1 - 向量分数)
+    
+    # 单次评估的性能分析（见profiling.py）：为空时不分析，cprofile或sampling时对每次评估执行分析；
+    # 也可以通过calculate_research_score/generate_research_report的profile参数按次开启
+    PROFILE = os.environ.get("EVALUATION_PROFILE", "")
+    PROFILE_DIR = os.environ.get("EVALUATION_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+    
+    # 变量可用性预计算表（由dataset_availability.py生成），设置为空字符串时不使用
+    DATASET_AVAILABILITY_PATH = os.environ.get(
+        "DATASET_AVAILABILITY_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset_availability.json.gz")
+    )
 
-def search_vector_by_text(paper_topic, empirical_model=""):
-    """根据文本执行向量检索
+
+# 进程内缓存，键为规范化输入的摘要
+_EMBEDDING_CACHE = LRUCache(SearchConfig.EMBEDDING_CACHE_SIZE)
+_SEARCH_CACHE = LRUCache(SearchConfig.SEARCH_CACHE_SIZE)
+_EVALUATION_CACHE = LRUCache(SearchConfig.EVALUATION_CACHE_SIZE)
+
+# 带词法索引的本地快照，键为快照目录，值为(manifest修改时间, LocalCollection)
+_LEXICAL_COLLECTIONS = {}
+
+# 已加载的变量可用性表，键为文件路径，值为(文件修改时间, AvailabilityTable)
+_AVAILABILITY_TABLES = {}
+
+# 已计算的检索配置摘要，键为(配置快照摘要, 检索后端, 向量化模型, 向量缓存类型)
+_CONFIG_HASHES = {}
+
+# 规范化时使用的版本号，规范化规则变化时递增，使旧摘要全部失效
+NORMALIZATION_VERSION = "1"
+
+# NFKC之后仍需统一的标点（中文引号、破折号、顿号等）
+_PUNCTUATION_MAP = str.maketrans({
+    "“": '"', "”": '"', "„": '"', "‘": "'", "’": "'",
+    "—": "-", "–": "-", "－": "-", "〜": "~",
+    "。": ".", "｡": ".", "､": "、",
+})
+
+# 变量设置的分隔符：顿号、中英文逗号、分号、斜杠、竖线和换行
+_VARIABLE_SEPARATORS = re.compile(r"[、,;/|\n\r\t]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """规范化单段文本
+    
+    统一Unicode全角/半角形式（NFKC）、常见标点和空白，去掉首尾空白
+    
+    Args:
+        text: 原始文本
+        
+    Returns:
+        str: 规范化后的文本，None返回空字符串
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", str(text))
+    text = text.translate(_PUNCTUATION_MAP)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def split_variables(variable_settings):
+    """将变量设置拆分为规范化的变量元组
+    
+    支持"、"、"，"、","、"；"等所有常见分隔符，去重（忽略大小写）后排序，
+    变量的先后顺序不影响检索和评估结果
+    
+    Args:
+        variable_settings: 变量设置字符串
+        
+    Returns:
+        tuple: 规范化、去重并排序后的变量
+    """
+    if not variable_settings or not isinstance(variable_settings, str):
+        return ()
+    
+    variables = {}
+    for item in _VARIABLE_SEPARATORS.split(normalize_text(variable_settings)):
+        item = item.strip()
+        if item:
+            variables.setdefault(item.casefold(), item)
+    return tuple(variables[key] for key in sorted(variables))
+
+
+def canonicalize_inputs(paper_topic, variable_settings, empirical_model=""):
+    """规范化一次评估的全部输入
     
     Args:
         paper_topic: 论文选题
-        empirical_model: 实证模型，默认为空字符串
+        variable_settings: 变量设置
+        empirical_model: 实证模型
         
     Returns:
-        tuple: (filtered_count, filtered_docs)
-            - filtered_count: 筛选后的记录数量
-            - filtered_docs: 筛选后的记录内容列表
+        dict: 包含paper_topic、variables、variable_settings和empirical_model的字典，
+            其中variable_settings为用"、"重新拼接的规范化变量
+    """
+    variables = split_variables(variable_settings)
+    return {
+        "paper_topic": normalize_text(paper_topic),
+        "variables": variables,
+        "variable_settings": "、".join(variables),
+        "empirical_model": normalize_text(empirical_model)
+    }
+
+
+def _digest(kind, *parts):
+    """计算稳定的内容摘要，与进程、平台和字典顺序无关"""
+    payload = json.dumps([NORMALIZATION_VERSION, kind] + list(parts), ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def embedding_digest(text, model=None):
+    """文本向量缓存键
+    
+    Args:
+        text: 要向量化的文本
+        model: embedding模型标识，默认为当前部署使用的模型
+        
+    Returns:
+        str: 十六进制摘要
     """
-    # 使用配置类获取API密钥
-    dashscope_api_key = APIConfig.DASHSCOPE_API_KEY
-    dashvector_api_key = APIConfig.DASHVECTOR_API_KEY
-    cluster_endpoint = APIConfig.CLUSTER_ENDPOINT
+    return _digest("embedding", model or embedding_model_id(), normalize_text(text))
+
+
+def _cache_embedding(cache_key, vector):
+    """将向量按SearchConfig.EMBEDDING_CACHE_DTYPE量化后写入向量缓存
     
-    # 初始化文本向量转换器
-    vectorizer = TextVectorizer(api_key=dashscope_api_key)
+    返回量化还原后的向量，未命中缓存时与之后命中缓存时使用同一个向量，
+    同一输入的首次评估和重复评估得分一致
     
-    # 拼接paper_topic和empirical_model
-    query_text = paper_topic
+    Args:
+        cache_key: embedding_digest返回的缓存键
+        vector: 向量化后端返回的向量
+        
+    Returns:
+        list: 量化还原后的向量
+    """
+    packed = pack_vector(vector, SearchConfig.EMBEDDING_CACHE_DTYPE)
+    _EMBEDDING_CACHE.set(cache_key, packed)
+    return unpack_vector(packed)
+
+
+def search_digest(collection_name, text, topk, search_filter=None):
+    """检索结果缓存键
+    
+    Args:
+        collection_name: 集合名称
+        text: 查询文本
+        topk: 返回结果数量
+        search_filter: 元数据过滤条件，不过滤时摘要与之前相同
+        
+    Returns:
+        str: 十六进制摘要
+    """
+    parts = [APIConfig.SEARCH_BACKEND, embedding_model_id(), collection_name, normalize_text(text), int(topk)]
+    if search_filter:
+        parts.append(search_filter.cache_key())
+    return _digest("search", *parts)
+
+
+def dimension_filter(dimension, config=None):
+    """评估维度在检索前使用的元数据过滤条件
+    
+    Args:
+        dimension: 评估维度名称，见EVALUATION_DIMENSIONS
+        config: 配置快照，默认为current_config()
+        
+    Returns:
+        SearchFilter: 过滤条件，未配置时返回None
+    """
+    search = (config or current_config()).search
+    if dimension in ("journal", "journal_model") and search["JOURNAL_LEVELS"]:
+        return SearchFilter().where_in("journallevel", list(search["JOURNAL_LEVELS"]))
+    if dimension == "cfp" and search["CFP_JOURNALS"]:
+        return SearchFilter().where_in("journal_name", list(search["CFP_JOURNALS"]))
+    if dimension == "dataset" and search["DATASET_YEAR_RANGE"]:
+        start, end = search["DATASET_YEAR_RANGE"]
+        return SearchFilter().where_range("year_start", high=start).where_range("year_end", low=end)
+    return None
+
+
+def evaluation_digest(paper_topic, variable_settings, empirical_model=""):
+    """评估结果缓存键，变量的分隔符、顺序和重复不影响摘要
+    
+    Args:
+        paper_topic: 论文选题
+        variable_settings: 变量设置
+        empirical_model: 实证模型
+        
+    Returns:
+        str: 十六进制摘要
+    """
+    inputs = canonicalize_inputs(paper_topic, variable_settings, empirical_model)
+    return _digest("evaluation", inputs["paper_topic"], list(inputs["variables"]), inputs["empirical_model"])
+
+
+def search_config_hash(config=None):
+    """检索配置摘要，评估提示词、检索数量、分数阈值、过滤条件、集合名称或检索/向量化后端变化时摘要随之变化
+    
+    Args:
+        config: 配置快照，默认为current_config()
+        
+    Returns:
+        str: 十六进制摘要
+    """
+    config = config or current_config()
+    key = (config.config_hash, APIConfig.SEARCH_BACKEND, embedding_model_id(), SearchConfig.EMBEDDING_CACHE_DTYPE)
+    digest = _CONFIG_HASHES.get(key)
+    if digest is None:
+        settings = {"config": config.config_hash, "search_backend": key[1], "embedding_model": key[2]}
+        if key[3] != "float32":
+            # 量化的查询向量会轻微改变检索分数
+            settings["embedding_cache_dtype"] = key[3]
+        digest = _CONFIG_HASHES[key] = _digest("config", settings)
+    return digest
+
+
+def evaluation_cache_key(digest, config_hash):
+    """进程内评估结果缓存的键
+    
+    Args:
+        digest: evaluation_digest返回的输入摘要
+        config_hash: search_config_hash返回的配置摘要
+        
+    Returns:
+        tuple: 缓存键，配置变化后按旧配置计算的评估结果不再命中
+    """
+    return digest, config_hash
+
+
+def _model_query_text(paper_topic, empirical_model):
+    """拼接论文选题和实证模型作为查询文本"""
+    paper_topic = normalize_text(paper_topic)
+    empirical_model = normalize_text(empirical_model)
     if empirical_model:
-        query_text = f"{paper_topic}；{empirical_model}"
+        return f"{paper_topic}；{empirical_model}"
+    return paper_topic
+
+
+class SearchFailedError(Exception):
+    """检索失败：查询向量化失败、检索客户端不可用或检索请求出错
     
-    # 将查询文本转换为向量
-    query_vector = vectorizer.text_to_vector(query_text)
-    if not query_vector:
-        print("向量转换失败，无法执行检索")
-        return 0, []
+    与检索成功但没有结果区分开，含失败维度的评估不写入评估缓存和评估结果存储
+    """
+
+
+class _SearchSession:
+    """一次检索过程中共享的向量转换器和检索客户端
     
-    print(f"成功将文本 '{query_text}' 转换为向量-search_vector_by_text")
+    两者都在首次缓存未命中时才创建，缓存全部命中时不建立任何连接
+    """
     
-    # 初始化向量检索客户端
-    search_client = VectorSearchClient(api_key=dashvector_api_key, endpoint=cluster_endpoint)
+    def __init__(self, cluster_name=None):
+        """初始化检索会话
+        
+        Args:
+            cluster_name: 需要先获取的集群名称，为None时直接获取collection
+        """
+        self.cluster_name = cluster_name
+        self._vectorizer = None
+        self._search_client = None
+        self._collection_name = None
+        self._failed = False
+    
+    def text_to_vector(self, text):
+        """带缓存的文本向量化
+        
+        缓存中的向量按SearchConfig.EMBEDDING_CACHE_DTYPE量化保存，占用随向量维度线性下降
+        
+        Args:
+            text: 规范化后的文本
+            
+        Returns:
+            向量或None（如果转换失败）
+        """
+        cache_key = embedding_digest(text)
+        vector = _EMBEDDING_CACHE.get(cache_key)
+        if vector is not None:
+            return unpack_vector(vector)
+        
+        if self._vectorizer is None:
+            self._vectorizer = create_vectorizer()
+        vector = self._vectorizer.text_to_vector(text)
+        if vector:
+            vector = _cache_embedding(cache_key, vector)
+        return vector
+    
+    def client_for(self, collection_name):
+        """获取已切换到指定collection的检索客户端
+        
+        Args:
+            collection_name: 集合名称
+            
+        Returns:
+            VectorSearchClient或None（如果获取集群或collection失败）
+        """
+        if self._failed:
+            return None
+        if self._search_client is None:
+            self._search_client = create_search_client()
+            if self.cluster_name and not self._search_client.get_cluster(self.cluster_name):
+                self._failed = True
+                return None
+        if self._collection_name != collection_name:
+            if not self._search_client.get_collection(collection_name):
+                self._failed = True
+                return None
+            self._collection_name = collection_name
+        return self._search_client
+    
+    def query(self, query_text, collection_name, topk, caller, search_filter=None):
+        """执行一次带缓存的向量检索
+        
+        Args:
+            query_text: 规范化后的查询文本
+            collection_name: 集合名称
+            topk: 返回结果数量
+            caller: 调用方名称，用于日志
+            search_filter: 元数据过滤条件，在检索时下推，只对满足条件的文档打分
+            
+        Returns:
+            list: 原始检索结果列表，无结果时返回None
+            
+        Raises:
+            SearchFailedError: 向量化失败、获取集群或collection失败，或检索请求出错
+        """
+        cache_key = search_digest(collection_name, query_text, topk, search_filter)
+        results = _SEARCH_CACHE.get(cache_key)
+        if results is not None:
+            log.debug("search_cache_hit", "命中检索缓存: {collection} '{query}'", collection=collection_name, query=query_text)
+            return results
+        
+        query_vector = self.text_to_vector(query_text)
+        if not query_vector:
+            log.warning("embedding_failed", "文本 '{query}' 向量转换失败，无法执行检索", query=query_text)
+            raise SearchFailedError(f"文本 '{query_text}' 向量转换失败")
+        
+        log.debug("embedding", "成功将文本 '{query}' 转换为向量-{caller}", query=query_text, caller=caller)
+        
+        search_client = self.client_for(collection_name)
+        if search_client is None:
+            raise SearchFailedError(f"无法获取collection {collection_name}")
+        
+        output_fields = APIConfig.get_output_fields(collection_name)
+        results = search_client.search(
+            query_vector=query_vector,
+            topk=topk,
+            output_fields=output_fields,
+            include_vector=False,
+            search_filter=search_filter
+        )
+        if results is None:
+            raise SearchFailedError(f"检索collection {collection_name} 失败")
+        if not results:
+            return None
+        
+        # 转换为紧凑记录后再缓存，批量运行时占用更少内存
+        results = [to_record(result, collection_name) for result in results]
+        _SEARCH_CACHE.set(cache_key, results)
+        return results
     
-    # 获取集群和collection
-    cluster_name = APIConfig.CLUSTER_NAME
-    collection_name = APIConfig.JOURNAL_COLLECTION
+    def texts_to_vectors(self, texts):
+        """带缓存的批量文本向量化，未命中缓存的文本一次批量转换
+        
+        Args:
+            texts: 规范化后的文本列表
+            
+        Returns:
+            list: 与texts顺序一致的向量列表，转换失败的位置为None
+        """
+        vectors = []
+        missing = []
+        for index, text in enumerate(texts):
+            packed = _EMBEDDING_CACHE.get(embedding_digest(text))
+            vectors.append(None if packed is None else unpack_vector(packed))
+            if packed is None:
+                missing.append(index)
+        if not missing:
+            return vectors
+        
+        if self._vectorizer is None:
+            self._vectorizer = create_vectorizer()
+        converted = self._vectorizer.texts_to_vectors([texts[index] for index in missing])
+        for index, vector in zip(missing, converted):
+            if vector:
+                vectors[index] = _cache_embedding(embedding_digest(texts[index]), vector)
+        return vectors
+    
+    def query_many(self, query_texts, collection_name, topk, caller, search_filter=None):
+        """对同一个collection批量执行带缓存的向量检索
+        
+        未命中缓存的查询先批量向量化，再通过search_many一次发出
+        
+        Args:
+            query_texts: 规范化后的查询文本列表
+            collection_name: 集合名称
+            topk: 返回结果数量
+            caller: 调用方名称，用于日志
+            search_filter: 元数据过滤条件，对全部查询生效
+            
+        Returns:
+            list: 与query_texts顺序一致的原始检索结果列表，检索失败的位置为None，无结果的位置为空列表
+        """
+        results = [None] * len(query_texts)
+        pending = []
+        for index, query_text in enumerate(query_texts):
+            cached = _SEARCH_CACHE.get(search_digest(collection_name, query_text, topk, search_filter))
+            if cached is not None:
+                log.debug("search_cache_hit", "命中检索缓存: {collection} '{query}'", collection=collection_name,
+                          query=query_text)
+                results[index] = cached
+            else:
+                pending.append(index)
+        if not pending:
+            return results
+        
+        vectors = self.texts_to_vectors([query_texts[index] for index in pending])
+        searchable = []
+        for index, vector in zip(pending, vectors):
+            if vector:
+                log.debug("embedding", "成功将文本 '{query}' 转换为向量-{caller}", query=query_texts[index], caller=caller)
+                searchable.append((index, vector))
+            else:
+                log.warning("embedding_failed", "文本 '{query}' 向量转换失败，无法执行检索", query=query_texts[index])
+        if not searchable:
+            return results
+        
+        search_client = self.client_for(collection_name)
+        if search_client is None:
+            return results
+        
+        batch_results = search_client.search_many(
+            [vector for _, vector in searchable],
+            topk=topk,
+            output_fields=APIConfig.get_output_fields(collection_name),
+            include_vector=False,
+            search_filter=search_filter
+        ) or []
+        for (index, _), batch in zip(searchable, batch_results):
+            if batch is not None:
+                results[index] = [to_record(result, collection_name) for result in batch]
+            if batch:
+                _SEARCH_CACHE.set(search_digest(collection_name, query_texts[index], topk, search_filter), results[index])
+        return results
+
+
+def search_vector_by_text(paper_topic, empirical_model="", config=None):
+    """根据文本执行向量检索
     
-    if not search_client.get_cluster(cluster_name):
-        return 0, []
+    Args:
+        paper_topic: 论文选题
+        empirical_model: 实证模型，默认为空字符串
+        config: 配置快照，默认为current_config()
         
-    if not search_client.get_collection(collection_name):
-        return 0, []
+    Returns:
+        tuple: (filtered_count, filtered_docs)
+            - filtered_count: 筛选后的记录数量
+            - filtered_docs: 筛选后的记录内容列表
+            
+    Raises:
+        SearchFailedError: 检索失败（区别于没有结果）
+    """
+    config = config or current_config()
+    # 拼接paper_topic和empirical_model
+    query_text = _model_query_text(paper_topic, empirical_model)
     
     # 执行向量检索
-    collection_name = APIConfig.JOURNAL_COLLECTION
-    output_fields = APIConfig.get_output_fields(collection_name)
-    results = search_client.search(
-        query_vector=query_vector,
-        topk=SearchConfig.MAX_JOURNAL_RESULTS,
-        output_fields=output_fields,
-        include_vector=False
-    )
+    session = _SearchSession(cluster_name=APIConfig.CLUSTER_NAME)
+    results = session.query(query_text, config.collection("journal"), config.topk("journal"), "search_vector_by_text",
+                            dimension_filter("journal", config))
     
     if not results:
-        print(f"未找到与 '{paper_topic}' 相关的结果")
+        log.info("search_empty", "未找到与 '{query}' 相关的结果", query=paper_topic)
         return 0, []
     
     # 处理检索结果
     processor = ResultProcessor()
-    filtered_results = processor.filter_results_by_score(results, SearchConfig.JOURNAL_MAX_SCORE)
+    filtered_results = processor.filter_results_by_score(results, config.threshold("journal"))
     
     # 返回筛选后的记录数量和记录内容
     filtered_count = len(filtered_results)
     
-    print(f"筛选出 {filtered_count} 条score值小于等于{SearchConfig.JOURNAL_MAX_SCORE}的记录")
+    log.info("search_filtered", "筛选出 {count} 条score值小于等于{max_score}的记录", collection=config.collection("journal"),
+             count=filtered_count, max_score=config.threshold("journal"))
     if filtered_count > 0:
-        print(f"筛选出的记录内容第一条: {filtered_results[0]}")
+        log.debug("search_first_record", "筛选出的记录内容第一条: {record}", record=filtered_results[0])
     return filtered_count, filtered_results
 
 
-def search_vector_from_cfp(paper_topic):
+def search_vector_from_cfp(paper_topic, config=None):
     """从CFP_v2集合中根据文本执行向量检索
     
     Args:
         paper_topic: 论文选题
+        config: 配置快照，默认为current_config()
         
     Returns:
         tuple: (filtered_count, filtered_docs)
             - filtered_count: 筛选后的记录数量
             - filtered_docs: 筛选后的记录内容列表
+            
+    Raises:
+        SearchFailedError: 检索失败（区别于没有结果）
     """
-    # 使用配置类获取API密钥
-    dashscope_api_key = APIConfig.DASHSCOPE_API_KEY
-    dashvector_api_key = APIConfig.DASHVECTOR_API_KEY
-    cluster_endpoint = APIConfig.CLUSTER_ENDPOINT
-    
-    # 初始化文本向量转换器
-    vectorizer = TextVectorizer(api_key=dashscope_api_key)
-    
-    # 将查询文本转换为向量
-    query_vector = vectorizer.text_to_vector(paper_topic)
-    if not query_vector:
-        print("向量转换失败，无法执行检索")
-        return 0, []
-    
-    print(f"成功将文本 '{paper_topic}' 转换为向量-search_vector_from_cfp")
-    
-    # 初始化向量检索客户端
-    search_client = VectorSearchClient(api_key=dashvector_api_key, endpoint=cluster_endpoint)
-    
-    # 获取集群和collection
-    cluster_name = APIConfig.CLUSTER_NAME
-    collection_name = APIConfig.CFP_COLLECTION
-    
-    if not search_client.get_cluster(cluster_name):
-        return 0, []
-        
-    if not search_client.get_collection(collection_name):
-        return 0, []
-    
+    config = config or current_config()
     # 执行向量检索
-    collection_name = APIConfig.CFP_COLLECTION
-    output_fields = APIConfig.get_output_fields(collection_name)
-    results = search_client.search(
-        query_vector=query_vector,
-        topk=SearchConfig.MAX_CFP_RESULTS,
-        output_fields=output_fields,
-        include_vector=False
-    )
+    session = _SearchSession(cluster_name=APIConfig.CLUSTER_NAME)
+    results = session.query(normalize_text(paper_topic), config.collection("cfp"), config.topk("cfp"), "search_vector_from_cfp",
+                            dimension_filter("cfp", config))
     
     if not results:
-        print(f"未找到与 '{paper_topic}' 相关的结果")
+        log.info("search_empty", "未找到与 '{query}' 相关的结果", query=paper_topic)
         return 0, []
     
     # 处理检索结果
     processor = ResultProcessor()
-    filtered_results = processor.filter_results_by_score(results, SearchConfig.CFP_MAX_SCORE)
+    filtered_results = processor.filter_results_by_score(results, config.threshold("cfp"))
     
     # 返回筛选后的记录数量和记录内容
     filtered_count = len(filtered_results)
     
-    print(f"从CFP_v2集合中筛选出 {filtered_count} 条score值小于等于{SearchConfig.CFP_MAX_SCORE}的记录")
+    log.info("search_filtered", "从{collection}集合中筛选出 {count} 条score值小于等于{max_score}的记录",
+             collection=config.collection("cfp"), count=filtered_count, max_score=config.threshold("cfp"))
     if filtered_count > 0:
-        print(f"筛选出的记录内容第一条: {filtered_results[0]}")
+        log.debug("search_first_record", "筛选出的记录内容第一条: {record}", record=filtered_results[0])
     return filtered_count, filtered_results
 
 
-def search_vector_from_dataset(variable_settings):
+def lexical_collection(collection_name):
+    """LOCAL_INDEX_DIR下带词法索引的集合快照，快照被替换后重新加载
+    
+    Args:
+        collection_name: 集合名称
+        
+    Returns:
+        LocalCollection: 快照不存在或没有可索引的文本字段时返回None
+    """
+    directory = os.path.join(APIConfig.LOCAL_INDEX_DIR, collection_name)
+    try:
+        mtime = os.path.getmtime(os.path.join(directory, "manifest.json"))
+    except OSError:
+        return None
+    cached = _LEXICAL_COLLECTIONS.get(directory)
+    if cached is None or cached[0] != mtime:
+        collection = LocalCollection(directory)
+        cached = (mtime, collection if collection.lexical_index() is not None else None)
+        _LEXICAL_COLLECTIONS[directory] = cached
+    return cached[1]
+
+
+def availability_table(config=None):
+    """当前有效的变量可用性表，文件被替换后重新加载
+    
+    表对应的dataset_v4集合版本或检索配置摘要与当前不一致时视为过期，不再使用
+    
+    Args:
+        config: 配置快照，默认为current_config()
+        
+    Returns:
+        AvailabilityTable: 未配置、文件不存在、无法读取或已过期时返回None
+    """
+    path = SearchConfig.DATASET_AVAILABILITY_PATH
+    if not path:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _AVAILABILITY_TABLES.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            table = AvailabilityTable.load(path)
+        except (OSError, ValueError) as e:
+            log.warning("availability_table_failed", "加载变量可用性表失败: {error}", path=path, error=e)
+            table = None
+        cached = (mtime, table)
+        _AVAILABILITY_TABLES[path] = cached
+    table = cached[1]
+    config = config or current_config()
+    collection_version = config.collection_versions()[config.collection("dataset")]
+    if table is None or not table.matches(collection_version, search_config_hash(config)):
+        return None
+    return table
+
+
+def _lexical_scores(collection, keyword):
+    """关键词与集合各行的归一化BM25分数，{行号: 分数}"""
+    rows, scores = collection.lexical_index().scores(keyword)
+    return dict(zip(rows.tolist(), scores.tolist()))
+
+
+def exact_match_results(collection, keyword, topk, search_filter=None, config=None):
+    """关键词与文档的某个词条完全相同时，直接由词法索引给出检索结果
+    
+    Args:
+        collection: lexical_collection返回的LocalCollection
+        keyword: 规范化后的关键词
+        topk: 返回结果数量
+        search_filter: 元数据过滤条件
+        config: 配置快照，默认为current_config()
+        
+    Returns:
+        list: 结果记录列表（按BM25分数降序，score为配置项DATASET_EXACT_MATCH_SCORE），没有精确匹配时为空
+    """
+    rows = collection.lexical_index().exact_rows(keyword)
+    if search_filter and len(rows):
+        rows = np.intersect1d(rows, search_filter.rows(collection), assume_unique=True)
+    if not len(rows):
+        return []
+    
+    lexical = _lexical_scores(collection, keyword)
+    rows = sorted(rows.tolist(), key=lambda row: (-lexical.get(row, 0.0), row))[:topk]
+    output_fields = APIConfig.get_output_fields(collection.name)
+    score = (config or current_config()).search["DATASET_EXACT_MATCH_SCORE"]
+    return [to_record(dict(collection.doc(row, output_fields), score=score), collection.name, config) for row in rows]
+
+
+def fuse_lexical_scores(collection, keyword, results, config=None):
+    """将向量检索结果的分数与BM25分数融合
+    
+    融合分数为v + w·l·(1 - v)（v为向量分数，l为归一化BM25分数，w为配置项DATASET_LEXICAL_WEIGHT），
+    只提高同时有词法命中的记录，没有词法命中的记录分数不变
+    
+    Args:
+        collection: lexical_collection返回的LocalCollection
+        keyword: 规范化后的关键词
+        results: 原始检索结果列表
+        config: 配置快照，默认为current_config()
+        
+    Returns:
+        list: 融合分数后的结果记录列表（副本，不修改缓存中的结果），按分数降序
+    """
+    lexical = _lexical_scores(collection, keyword)
+    weight = (config or current_config()).search["DATASET_LEXICAL_WEIGHT"]
+    fused = []
+    for result in results:
+        record = to_record(ResultProcessor.to_dict(result), collection.name, config)
+        row = collection.index_of(record.get("id"))
+        lexical_score = lexical.get(row, 0.0) if row is not None else 0.0
+        if lexical_score > 0 and record.get("score") is not None:
+            record["score"] += weight * lexical_score * (1 - record["score"])
+        fused.append(record)
+    fused.sort(key=lambda record: -record.get("score", 0))
+    return fused
+
+
+def local_dataset_results(keywords, use_table=True, config=None):
+    """不调用远程服务即可得到的关键词结果：变量可用性预计算表和词法索引精确匹配
+    
+    Args:
+        keywords: 规范化后的关键词列表
+        use_table: 是否使用变量可用性预计算表
+        config: 配置快照，默认为current_config()
+        
+    Returns:
+        tuple: (keyword_results, lexical)
+            - keyword_results: 已得到结果的关键词到结果记录列表的映射
+            - lexical: 启用词法索引时为dataset_v4的LocalCollection（用于融合其余关键词的分数），否则为None
+    """
+    config = config or current_config()
+    collection_name = config.collection("dataset")
+    search_filter = dimension_filter("dataset", config)
+    keyword_results = {}
+    
+    # 常见变量直接查预计算表
+    table = availability_table(config) if use_table else None
+    if table is not None:
+        for keyword in keywords:
+            hits = table.get(keyword)
+            if hits is not None:
+                log.debug("availability_table_hit", "关键词 '{keyword}' 命中变量可用性表: {count} 条记录", keyword=keyword,
+                          count=len(hits))
+                keyword_results[keyword] = [to_record(hit, collection_name, config) for hit in hits]
+    
+    # 精确匹配的关键词由词法索引直接给出结果
+    lexical = lexical_collection(collection_name) if config.search["DATASET_LEXICAL_SEARCH"] else None
+    if lexical is not None:
+        for keyword in keywords:
+            if keyword in keyword_results:
+                continue
+            exact = exact_match_results(lexical, keyword, config.topk("dataset"), search_filter, config)
+            if exact:
+                log.debug("lexical_exact_match", "关键词 '{keyword}' 由词法索引精确匹配到 {count} 条记录", keyword=keyword,
+                          count=len(exact))
+                keyword_results[keyword] = exact
+    return keyword_results, lexical
+
+
+def search_dataset_keywords(keywords, session=None, use_table=True, config=None):
+    """逐关键词检索dataset_v4集合
+    
+    依次尝试：变量可用性预计算表（见dataset_availability.py）；启用配置项DATASET_LEXICAL_SEARCH时
+    由词法索引精确匹配；其余关键词批量向量检索，启用词法索引时向量分数与BM25分数融合
+    
+    Args:
+        keywords: 规范化后的关键词列表
+        session: _SearchSession，默认新建
+        use_table: 是否使用变量可用性预计算表（构建该表时为False）
+        config: 配置快照，默认为current_config()
+        
+    Returns:
+        dict: 关键词到检索结果列表的映射，检索失败时为None，无结果时为空列表
+    """
+    config = config or current_config()
+    collection_name = config.collection("dataset")
+    session = session or _SearchSession()
+    keyword_results, lexical = local_dataset_results(keywords, use_table, config)
+    
+    # 其余关键词批量检索，结果与关键词顺序一致
+    vector_keywords = [keyword for keyword in keywords if keyword not in keyword_results]
+    if vector_keywords:
+        batch_results = session.query_many(vector_keywords, collection_name, config.topk("dataset"),
+                                           "search_vector_from_dataset", dimension_filter("dataset", config))
+        for keyword, results in zip(vector_keywords, batch_results):
+            if results and lexical is not None:
+                results = fuse_lexical_scores(lexical, keyword, results, config)
+            keyword_results[keyword] = results
+    return keyword_results
+
+
+def merge_dataset_results(keywords, keyword_results, config=None):
+    """按分数筛选各关键词的数据集检索结果，并按url去重合并
+    
+    Args:
+        keywords: 规范化后的关键词列表
+        keyword_results: 关键词到检索结果列表的映射（见search_dataset_keywords）
+        config: 配置快照，默认为current_config()
+        
+    Returns:
+        tuple: (filtered_count, filtered_docs, keyword_counts)
+    """
+    # 存储所有检索结果和每个关键词的匹配数量
+    all_results = []
+    keyword_counts = {}
+    
+    # 所有关键词的结果一次性按分数过滤
+    filtered_lists = ResultProcessor.filter_results_by_score_many(
+        [keyword_results.get(keyword) for keyword in keywords], (config or current_config()).threshold("dataset"))
+    
+    for keyword, filtered_results in zip(keywords, filtered_lists):
+        results = keyword_results.get(keyword)
+        if not results:
+            log.debug("dataset_keyword_empty", "未找到与关键词 '{keyword}' 相关的结果", keyword=keyword)
+            keyword_counts[keyword] = 0
+            continue
+        
+        # 记录该关键词的匹配数量
+        keyword_counts[keyword] = len(filtered_results)
+        log.debug("dataset_keyword", "关键词 '{keyword}' 匹配到 {count} 条记录", keyword=keyword, count=len(filtered_results))
+        
+        # 将结果添加到总结果列表中
+        all_results.extend(filtered_results)
+    
+    # 去重（根据url字段）
+    unique_results = []
+    seen_urls = set()
+    for result in all_results:
+        url = result.get('url', '')
+        if url and url not in seen_urls:
+            seen_urls.add(url)
+            unique_results.append(result)
+    
+    filtered_count = len(unique_results)
+    log.info("dataset_merged", "总共找到 {count} 条不重复的数据集记录", count=filtered_count)
+    
+    return filtered_count, unique_results, keyword_counts
+
+
+def search_vector_from_dataset(variable_settings, config=None):
     """从dataset_v4集合中执行向量检索
     
-    支持按"、"分隔多个关键词，分别执行检索并合并结果
+    支持按"、"、"，"、"；"等分隔多个关键词，规范化去重后分别执行检索（见search_dataset_keywords）并合并结果
     
     Args:
-        variable_settings: 变量设置，支持按"、"分隔多个关键词
+        variable_settings: 变量设置，支持按"、"等分隔符分隔多个关键词
+        config: 配置快照，默认为current_config()
         
     Returns:
         tuple: (filtered_count, filtered_docs, keyword_counts)
             - filtered_count: 筛选后的记录数量
             - filtered_docs: 筛选后的记录内容列表（每条记录包含url字段）
             - keyword_counts: 每个关键词匹配的结果数量字典
+            
+    Raises:
+        SearchFailedError: 任一关键词检索失败（区别于没有结果）
     """
     try:
         # 参数检查
         if not variable_settings or not isinstance(variable_settings, str):
-            print("变量设置无效")
+            log.warning("dataset_invalid_variables", "变量设置无效")
             return 0, [], {}
             
-        # 初始化向量转换器和检索客户端
-        try:
-            vectorizer = TextVectorizer(api_key=APIConfig.DASHSCOPE_API_KEY)
-            search_client = VectorSearchClient(api_key=APIConfig.DASHVECTOR_API_KEY, endpoint=APIConfig.CLUSTER_ENDPOINT)
-            
-            # 检查集合是否存在
-            collection_name = APIConfig.DATASET_COLLECTION
-            if not search_client.get_collection(collection_name):
-                print(f"集合 {collection_name} 不存在")
-                return 0, [], {}
-                
-            # 拆分关键词
-            keywords = [kw.strip() for kw in variable_settings.split("、") if kw.strip()]
-            if not keywords:
-                print("未提供有效的关键词")
-                return 0, [], {}
-                
-            print(f"从变量设置中提取的关键词: {keywords}")
-            
-            # 存储所有检索结果和每个关键词的匹配数量
-            all_results = []
-            keyword_counts = {}
-            
-            # 对每个关键词执行检索
-            for keyword in keywords:
-                print(f"\n检索关键词: {keyword}")
-                
-                # 将关键词转换为向量
-                query_vector = vectorizer.text_to_vector(keyword)
-                if not query_vector:
-                    print(f"关键词 '{keyword}' 向量转换失败，跳过")
-                    keyword_counts[keyword] = 0
-                    continue
-                
-                # 执行向量检索
-                output_fields = APIConfig.get_output_fields(collection_name)
-                results = search_client.search(
-                    query_vector=query_vector,
-                    topk=SearchConfig.MAX_DATASET_RESULTS,
-                    output_fields=output_fields,
-                    include_vector=False
-                )
-                
-                if not results:
-                    print(f"未找到与关键词 '{keyword}' 相关的结果")
-                    keyword_counts[keyword] = 0
-                    continue
-                
-                # 处理检索结果
-                processor = ResultProcessor()
-                filtered_results = processor.filter_results_by_score(results, SearchConfig.DATASET_MAX_SCORE)
-                
-                # 记录该关键词的匹配数量
-                keyword_counts[keyword] = len(filtered_results)
-                print(f"关键词 '{keyword}' 匹配到 {len(filtered_results)} 条记录")
-                
-                # 将结果添加到总结果列表中
-                all_results.extend(filtered_results)
-            
-            # 去重（根据url字段）
-            unique_results = []
-            seen_urls = set()
-            for result in all_results:
-                url = result.get('url', '')
-                if url and url not in seen_urls:
-                    seen_urls.add(url)
-                    unique_results.append(result)
+        # 拆分关键词
+        keywords = split_variables(variable_settings)
+        if not keywords:
+            log.warning("dataset_no_keywords", "未提供有效的关键词")
+            return 0, [], {}
             
-            filtered_count = len(unique_results)
-            print(f"\n总共找到 {filtered_count} 条不重复的数据集记录")
+        log.debug("dataset_keywords", "从变量设置中提取的关键词: {keywords}", keywords=list(keywords))
+        
+        try:
+            session = _SearchSession()
             
-            return filtered_count, unique_results, keyword_counts
+            config = config or current_config()
+            keyword_results = search_dataset_keywords(keywords, session, config=config)
+            failed = [keyword for keyword in keywords if keyword_results.get(keyword) is None]
+            if failed:
+                raise SearchFailedError(f"关键词 {failed} 检索失败")
+            return merge_dataset_results(keywords, keyword_results, config)
             
+        except (ThrottledError, SearchFailedError):
+            raise
         except Exception as e:
-            print(f"执行向量检索时发生异常: {str(e)}")
+            log.error("dataset_search_error", "执行向量检索时发生异常: {error}", error=e)
             return 0, [], {}
             
+    except (ThrottledError, SearchFailedError):
+        raise
     except Exception as e:
-        print(f"search_vector_from_dataset函数发生异常: {str(e)}")
+        log.error("dataset_error", "search_vector_from_dataset函数发生异常: {error}", error=e)
         return 0, [], {}
 
 
-def search_vector_from_skjj(paper_topic):
+def search_vector_from_skjj(paper_topic, config=None):
     """从SKJJ集合中根据文本执行向量检索
     
     Args:
         paper_topic: 论文选题
+        config: 配置快照，默认为current_config()
         
     Returns:
         tuple: (filtered_count, filtered_docs)
             - filtered_count: 筛选后的记录数量
             - filtered_docs: 筛选后的记录内容列表
+            
+    Raises:
+        SearchFailedError: 检索失败（区别于没有结果）
     """
-    # 使用配置类获取API密钥
-    dashscope_api_key = APIConfig.DASHSCOPE_API_KEY
-    dashvector_api_key = APIConfig.DASHVECTOR_API_KEY
-    cluster_endpoint = APIConfig.CLUSTER_ENDPOINT
-    
-    # 初始化文本向量转换器
-    vectorizer = TextVectorizer(api_key=dashscope_api_key)
-    
-    # 将查询文本转换为向量
-    query_vector = vectorizer.text_to_vector(paper_topic)
-    if not query_vector:
-        print("向量转换失败，无法执行检索")
-        return 0, []
-    
-    print(f"成功将文本 '{paper_topic}' 转换为向量-search_vector_from_skjj")
-    
-    # 初始化向量检索客户端
-    search_client = VectorSearchClient(api_key=dashvector_api_key, endpoint=cluster_endpoint)
-    
-    # 获取集群和collection
-    cluster_name = APIConfig.CLUSTER_NAME
-    collection_name = APIConfig.SKJJ_COLLECTION
-    
-    if not search_client.get_cluster(cluster_name):
-        return 0, []
-        
-    if not search_client.get_collection(collection_name):
-        return 0, []
-    
+    config = config or current_config()
     # 执行向量检索
-    collection_name = APIConfig.SKJJ_COLLECTION
-    output_fields = APIConfig.get_output_fields(collection_name)
-    results = search_client.search(
-        query_vector=query_vector,
-        topk=SearchConfig.MAX_SKJJ_RESULTS,
-        output_fields=output_fields,
-        include_vector=False
-    )
+    session = _SearchSession(cluster_name=APIConfig.CLUSTER_NAME)
+    results = session.query(normalize_text(paper_topic), config.collection("skjj"), config.topk("skjj"), "search_vector_from_skjj")
     
     if not results:
-        print(f"未找到与 '{paper_topic}' 相关的结果")
+        log.info("search_empty", "未找到与 '{query}' 相关的结果", query=paper_topic)
         return 0, []
     
     # 处理检索结果
     processor = ResultProcessor()
-    filtered_results = processor.filter_results_by_score(results, SearchConfig.SKJJ_MAX_SCORE)
+    filtered_results = processor.filter_results_by_score(results, config.threshold("skjj"))
     
     # 返回筛选后的记录数量和记录内容
     filtered_count = len(filtered_results)
     
-    print(f"从SKJJ集合中筛选出 {filtered_count} 条score值小于等于{SearchConfig.SKJJ_MAX_SCORE}的记录")
+    log.info("search_filtered", "从{collection}集合中筛选出 {count} 条score值小于等于{max_score}的记录",
+             collection=config.collection("skjj"), count=filtered_count, max_score=config.threshold("skjj"))
     if filtered_count > 0:
-        print(f"筛选出的记录内容第一条: {filtered_results[0]}")
+        log.debug("search_first_record", "筛选出的记录内容第一条: {record}", record=filtered_results[0])
     return filtered_count, filtered_results
 
 
-def search_vector_by_model(paper_topic, empirical_model):
+def search_vector_by_model(paper_topic, empirical_model, config=None):
     """根据论文选题和实证模型执行向量检索
     
     Args:
         paper_topic: 论文选题
         empirical_model: 实证模型
+        config: 配置快照，默认为current_config()
         
     Returns:
         tuple: (filtered_count, filtered_docs)
             - filtered_count: 筛选后的记录数量
             - filtered_docs: 筛选后的记录内容列表
+            
+    Raises:
+        SearchFailedError: 检索失败（区别于没有结果）
     """
-    # 使用配置类获取API密钥
-    dashscope_api_key = APIConfig.DASHSCOPE_API_KEY
-    dashvector_api_key = APIConfig.DASHVECTOR_API_KEY
-    cluster_endpoint = APIConfig.CLUSTER_ENDPOINT
-    
-    # 初始化文本向量转换器
-    vectorizer = TextVectorizer(api_key=dashscope_api_key)
-    
+    config = config or current_config()
     # 拼接paper_topic和empirical_model
-    query_text = f"{paper_topic}；{empirical_model}"
-    
-    # 将查询文本转换为向量
-    query_vector = vectorizer.text_to_vector(query_text)
-    if not query_vector:
-        print("向量转换失败，无法执行检索")
-        return 0, []
-    
-    print(f"成功将文本 '{query_text}' 转换为向量-search_vector_by_model")
-    
-    # 初始化向量检索客户端
-    search_client = VectorSearchClient(api_key=dashvector_api_key, endpoint=cluster_endpoint)
-    
-    # 获取集群和collection
-    cluster_name = APIConfig.CLUSTER_NAME
-    collection_name = APIConfig.JOURNAL_COLLECTION
-    
-    if not search_client.get_cluster(cluster_name):
-        return 0, []
-        
-    if not search_client.get_collection(collection_name):
-        return 0, []
+    query_text = f"{normalize_text(paper_topic)}；{normalize_text(empirical_model)}"
     
     # 执行向量检索
-    collection_name = APIConfig.JOURNAL_COLLECTION
-    output_fields = APIConfig.get_output_fields(collection_name)
-    results = search_client.search(
-        query_vector=query_vector,
-        topk=SearchConfig.MAX_JOURNAL_RESULTS,
-        output_fields=output_fields,
-        include_vector=False
-    )
+    session = _SearchSession(cluster_name=APIConfig.CLUSTER_NAME)
+    results = session.query(query_text, config.collection("journal_model"), config.topk("journal_model"),
+                            "search_vector_by_model", dimension_filter("journal_model", config))
     
     if not results:
-        print(f"未找到与 '{query_text}' 相关的结果")
+        log.info("search_empty", "未找到与 '{query}' 相关的结果", query=query_text)
         return 0, []
     
     # 处理检索结果
     processor = ResultProcessor()
-    filtered_results = processor.filter_results_by_score(results, SearchConfig.JOURNAL_MAX_SCORE)
+    filtered_results = processor.filter_results_by_score(results, config.threshold("journal"))
     
     # 返回筛选后的记录数量和记录内容
     filtered_count = len(filtered_results)
     
-    print(f"筛选出 {filtered_count} 条score值小于等于{SearchConfig.JOURNAL_MAX_SCORE}的记录")
+    log.info("search_filtered", "筛选出 {count} 条score值小于等于{max_score}的记录", collection=config.collection("journal"),
+             count=filtered_count, max_score=config.threshold("journal"))
     if filtered_count > 0:
-        print(f"筛选出的记录内容第一条: {filtered_results[0]}")
+        log.debug("search_first_record", "筛选出的记录内容第一条: {record}", record=filtered_results[0])
     return filtered_count, filtered_results
 
 
-def load_prompts():
+def load_prompts(config=None):
     """加载评估提示词
     
+    提示词随配置快照加载一次，文件修改后自动重新加载（见evaluation_config.py），不再每次评估都读取文件
+    
+    Args:
+        config: 配置快照，默认为current_config()
+        
     Returns:
-        dict: 评估提示词字典
+        Mapping: 只读的评估提示词，文件不存在时为空
     """
     try:
-        # 获取当前文件所在目录
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        # 构建提示词文件路径
-        prompts_file = os.path.join(current_dir, "evaluation_prompts.json")
-        
-        # 检查文件是否存在
-        if not os.path.exists(prompts_file):
-            print(f"提示词文件不存在: {prompts_file}")
-            return {}
-            
-        # 读取提示词文件
-        with open(prompts_file, "r", encoding="utf-8") as f:
-            prompts = json.load(f)
-            
-        return prompts
+        return (config or current_config()).prompts
     except Exception as e:
-        print(f"加载提示词文件时发生异常: {str(e)}")
+        log.error("prompts_error", "加载提示词文件时发生异常: {error}", error=e)
         return {}
 
 
-def calculate_research_score(paper_topic, variable_settings, empirical_model=""):
+def calculate_research_score(paper_topic, variable_settings, empirical_model="", use_store=True, profile=None,
+                             profile_path=None):
     """计算论文选题评估得分
     
+    先查询进程内缓存，再查询持久化存储（键包含集合版本和检索配置摘要），
+    都未命中时才执行检索并计算得分。检索失败的维度按没有结果计分，但该次评估不写入缓存和存储
+    
     Args:
         paper_topic: 论文选题
         variable_settings: 变量设置
         empirical_model: 实证模型，默认为空字符串
+        use_store: 是否读写持久化的评估结果存储
+        profile: 性能分析模式（cprofile或sampling，见profiling.py），None时使用SearchConfig.PROFILE，False时不分析
+        profile_path: 分析结果的路径前缀，默认写入SearchConfig.PROFILE_DIR
         
     Returns:
         dict: 评估得分和分析结果
     """
+    if profile is None:
+        profile = SearchConfig.PROFILE
+    if profile:
+        from profiling import run_profiled
+        if profile_path is None:
+            inputs = canonicalize_inputs(paper_topic, variable_settings, empirical_model)
+            digest = evaluation_digest(inputs["paper_topic"], inputs["variable_settings"], inputs["empirical_model"])
+            profile_path = os.path.join(SearchConfig.PROFILE_DIR, f"{digest[:16]}-{int(time.time())}")
+        return run_profiled(profile, profile_path, _calculate_research_score, paper_topic, variable_settings,
+                            empirical_model, use_store, label=paper_topic)
+    return _calculate_research_score(paper_topic, variable_settings, empirical_model, use_store)
+
+
+def _calculate_research_score(paper_topic, variable_settings, empirical_model, use_store):
+    """calculate_research_score的实现（不含性能分析）"""
+    # 规范化输入，相同含义的输入共享同一个缓存键
+    inputs = canonicalize_inputs(paper_topic, variable_settings, empirical_model)
+    paper_topic = inputs["paper_topic"]
+    variable_settings = inputs["variable_settings"]
+    empirical_model = inputs["empirical_model"]
+    
+    # 整次评估使用同一份配置快照，评估过程中配置重新加载不影响本次评估
+    config = current_config()
+    config_hash = search_config_hash(config)
+    cache_key = evaluation_digest(paper_topic, variable_settings, empirical_model)
+    memory_key = evaluation_cache_key(cache_key, config_hash)
+    cached = _EVALUATION_CACHE.get(memory_key)
+    if cached is not None:
+        log.info("evaluation_cache_hit", "命中评估结果缓存: {paper_topic}", paper_topic=paper_topic)
+        return dict(cached)
+    
+    store = get_default_store() if use_store else None
+    collection_versions = config.collection_versions()
+    if store is not None:
+        stored = store.get(cache_key, collection_versions, config_hash)
+        if stored is not None:
+            log.info("evaluation_store_hit", "命中评估结果存储: {paper_topic}", paper_topic=paper_topic)
+            _EVALUATION_CACHE.set(memory_key, stored)
+            return dict(stored)
+    
     # 加载评估提示词
-    prompts = load_prompts()
+    prompts = load_prompts(config)
     if not prompts:
-        print("加载评估提示词失败")
+        log.error("prompts_failed", "加载评估提示词失败")
         return {}
         
-    # 执行向量检索
-    print("\n执行论文选题相关文献检索...")
-    journal_count, journal_results = search_vector_by_text(paper_topic)
+    # 执行向量检索，失败的维度按没有结果计分
+    dimension_outputs = {}
+    failed = []
+    for dimension in EVALUATION_DIMENSIONS:
+        log.debug("dimension", "{label}", dimension=dimension, label=_DIMENSION_LABELS[dimension])
+        try:
+            dimension_outputs[dimension] = run_dimension(dimension, inputs, config)
+        except SearchFailedError as e:
+            log.warning("dimension_failed", "{dimension} 维度检索失败: {error}", dimension=dimension, error=e)
+            failed.append(dimension)
+            dimension_outputs[dimension] = (0, [])
+    
+    score_results = build_score_results(dimension_outputs)
+    if failed:
+        # 失败不是没有结果，不缓存也不保存，下次评估重新检索
+        log.warning("evaluation_not_cached", "{paper_topic} 有维度检索失败，评估结果不缓存", paper_topic=paper_topic,
+                    dimensions=failed)
+        return dict(score_results)
+    _EVALUATION_CACHE.set(memory_key, score_results)
+    if store is not None:
+        try:
+            store.put(cache_key, inputs, score_results, collection_versions, config_hash)
+            store.put_queries(cache_key, collection_versions, config_hash, _resolve_query_vectors(inputs, config))
+        except Exception as e:
+            log.error("evaluation_store_failed", "保存评估结果失败: {error}", error=e)
+    return dict(score_results)
+
+
+# 评估维度及其对应的结果键，顺序即检索执行顺序
+EVALUATION_DIMENSIONS = {
+    "journal": "journal_results",
+    "journal_model": "journal_model_results",
+    "dataset": "dataset_results",
+    "cfp": "cfp_results",
+    "skjj": "skjj_results",
+}
+
+_DIMENSION_LABELS = {
+    "journal": "执行论文选题相关文献检索...",
+    "journal_model": "执行实证模型相关文献检索...",
+    "dataset": "执行数据集检索...",
+    "cfp": "执行征稿启事检索...",
+    "skjj": "执行SKJJ项目检索...",
+}
+
+
+def run_dimension(dimension, inputs, config=None):
+    """执行单个评估维度的检索
+    
+    Args:
+        dimension: 评估维度名称，见EVALUATION_DIMENSIONS
+        inputs: canonicalize_inputs返回的规范化输入
+        config: 配置快照，默认为current_config()
+        
+    Returns:
+        tuple: (filtered_count, filtered_docs)
+        
+    Raises:
+        SearchFailedError: 该维度的检索失败
+    """
+    config = config or current_config()
+    if dimension == "journal":
+        return search_vector_by_text(inputs["paper_topic"], config=config)
+    if dimension == "journal_model":
+        return search_vector_by_model(inputs["paper_topic"], inputs["empirical_model"], config)
+    if dimension == "dataset":
+        dataset_count, dataset_results, keyword_counts = search_vector_from_dataset(inputs["variable_settings"], config)
+        return dataset_count, dataset_results
+    if dimension == "cfp":
+        return search_vector_from_cfp(inputs["paper_topic"], config)
+    if dimension == "skjj":
+        return search_vector_from_skjj(inputs["paper_topic"], config)
+    raise ValueError(f"未知的评估维度: {dimension}")
+
+
+def describe_dimension_queries(inputs, config=None):
+    """列出一次评估中各维度发出的全部检索
     
-    print("\n执行实证模型相关文献检索...")
-    journal_model_count, journal_model_results = search_vector_by_model(paper_topic, empirical_model)
+    Args:
+        inputs: canonicalize_inputs返回的规范化输入
+        config: 配置快照，默认为current_config()
+        
+    Returns:
+        list: 检索描述字典列表，包含dimension、collection、query_text、topk、threshold和search_filter
+    """
+    config = config or current_config()
+    paper_topic = inputs["paper_topic"]
+    queries = [
+        ("journal", paper_topic),
+        ("journal_model", f"{paper_topic}；{inputs['empirical_model']}"),
+        ("cfp", paper_topic),
+        ("skjj", paper_topic),
+    ]
+    queries += [("dataset", keyword) for keyword in inputs["variables"]]
+    return [
+        {"dimension": dimension, "collection": config.collection(dimension), "query_text": query_text,
+         "topk": config.topk(dimension), "threshold": config.threshold(dimension),
+         "search_filter": dimension_filter(dimension, config)}
+        for dimension, query_text in queries
+    ]
+
+
+def invalidate_dimension_queries(inputs, dimensions, config=None):
+    """使指定维度的检索缓存和该输入的评估缓存失效
     
-    print("\n执行数据集检索...")
-    dataset_count, dataset_results, keyword_counts = search_vector_from_dataset(variable_settings)
+    Args:
+        inputs: canonicalize_inputs返回的规范化输入
+        dimensions: 需要失效的维度集合
+        config: 配置快照，默认为current_config()
+    """
+    config = config or current_config()
+    for query in describe_dimension_queries(inputs, config):
+        if query["dimension"] in dimensions:
+            _SEARCH_CACHE.pop(search_digest(query["collection"], query["query_text"], query["topk"], query["search_filter"]))
+    digest = evaluation_digest(inputs["paper_topic"], inputs["variable_settings"], inputs["empirical_model"])
+    _EVALUATION_CACHE.pop(evaluation_cache_key(digest, search_config_hash(config)))
+
+
+def _resolve_query_vectors(inputs, config=None):
+    """为各维度的检索补充查询向量，只使用向量缓存中已有的向量，保存评估结果时不重新向量化
     
-    print("\n执行征稿启事检索...")
-    cfp_count, cfp_results = search_vector_from_cfp(paper_topic)
+    由词法精确匹配或变量可用性表回答的数据集关键词，以及向量已被缓存淘汰的查询没有向量，
+    vector为None；增量刷新时这些查询所在的集合一有变化，其维度就视为受影响（见find_affected_evaluations）
+    """
+    queries = []
+    for query in describe_dimension_queries(inputs, config):
+        packed = _EMBEDDING_CACHE.get(embedding_digest(query["query_text"]))
+        queries.append(dict(query, vector=None if packed is None else unpack_vector(packed)))
+    return queries
+
+
+def compute_dimension_scores(journal_count, journal_model_count, dataset_count, cfp_count, skjj_count, minimum=min):
+    """根据各维度筛选后的记录数计算全部数值得分
     
-    print("\n执行SKJJ项目检索...")
-    skjj_count, skjj_results = search_vector_from_skjj(paper_topic)
+    参数既可以是单次评估的整数，也可以是一批评估的NumPy数组（此时minimum传入numpy.minimum），
+    两种情况使用同一组公式和运算顺序，结果逐项相等
     
-    # 计算各项得分
+    Args:
+        journal_count: 选题相关文献数
+        journal_model_count: 实证模型相关文献数
+        dataset_count: 相关数据集数
+        cfp_count: 相关征稿启事数
+        skjj_count: 相关社科基金项目数
+        minimum: 取较小值的函数，标量为min，数组为numpy.minimum
+        
+    Returns:
+        dict: 得分名称到得分（标量或数组）的映射
+    """
     # 1. 价值性得分
     # 1.1 文件支撑性得分
-    skjj_score = min(5, skjj_count)
+    skjj_score = minimum(5, skjj_count)
     
     # 1.2 征稿启事参考性得分
-    cfp_reference_score = min(5, cfp_count)
+    cfp_reference_score = minimum(5, cfp_count)
     
     # 1.3 政策参考性得分
     policy_reference_score = 3  # 默认值
@@ -479,13 +1207,13 @@ def calculate_research_score(paper_topic, variable_settings, empirical_model="")
     theoretical_innovation_score = 3  # 默认值
     
     # 2.2 研究视角创新性得分
-    research_perspective_score = 5 - min(5, journal_count / 3)
+    research_perspective_score = 5 - minimum(5, journal_count / 3)
     
     # 理论创新总分
     theoretical_innovation_total_score = (theoretical_innovation_score + research_perspective_score) / 2
     
     # 2.3 模型创新性得分
-    model_innovation_score = 5 - min(5, journal_model_count / 3)
+    model_innovation_score = 5 - minimum(5, journal_model_count / 3)
     
     # 2.4 数据创新性得分
     data_innovation_score = 3  # 默认值
@@ -495,7 +1223,7 @@ def calculate_research_score(paper_topic, variable_settings, empirical_model="")
     
     # 3. 可行性得分
     # 3.1 数据可得性得分
-    data_availability_score = min(5, dataset_count)
+    data_availability_score = minimum(5, dataset_count)
     
     # 3.2 实证模型可行性得分
     empirical_model_score = 3  # 默认值
@@ -506,6 +1234,43 @@ def calculate_research_score(paper_topic, variable_settings, empirical_model="")
     # 总分
     total_score = (value_score + innovation_score + feasibility_score) / 3
     
+    return {
+        "total_score": total_score,
+        "value_score": value_score,
+        "skjj_score": skjj_score,
+        "cfp_reference_score": cfp_reference_score,
+        "policy_reference_score": policy_reference_score,
+        "practical_solution_score": practical_solution_score,
+        "innovation_score": innovation_score,
+        "theoretical_innovation_total_score": theoretical_innovation_total_score,
+        "theoretical_innovation_score": theoretical_innovation_score,
+        "research_perspective_score": research_perspective_score,
+        "model_innovation_score": model_innovation_score,
+        "data_innovation_score": data_innovation_score,
+        "feasibility_score": feasibility_score,
+        "data_availability_score": data_availability_score,
+        "empirical_model_feasibility_score": empirical_model_score,
+    }
+
+
+def build_score_results(dimension_outputs):
+    """根据各维度的检索结果计算评估得分和分析文本
+    
+    Args:
+        dimension_outputs: 维度名称到(filtered_count, filtered_docs)的映射
+        
+    Returns:
+        dict: 评估得分和分析结果
+    """
+    journal_count, journal_results = dimension_outputs["journal"]
+    journal_model_count, journal_model_results = dimension_outputs["journal_model"]
+    dataset_count, dataset_results = dimension_outputs["dataset"]
+    cfp_count, cfp_results = dimension_outputs["cfp"]
+    skjj_count, skjj_results = dimension_outputs["skjj"]
+    
+    # 计算各项得分
+    scores = compute_dimension_scores(journal_count, journal_model_count, dataset_count, cfp_count, skjj_count)
+    
     # 生成分析文本
     # 文件支撑性分析
     skjj_analysis = f"该选题在国家社科基金重大项目招标选题中找到了{skjj_count}个相关项目，表明该选题具有一定的文件支撑性。"
@@ -523,10 +1288,10 @@ def calculate_research_score(paper_topic, variable_settings, empirical_model="")
     theoretical_innovation_reason = "该选题在理论层面有一定的创新空间，但需要进一步明确其理论贡献点。"
     
     # 研究视角创新性分析
-    research_perspective_innovation_analysis = f"该选题在现有文献中找到了{journal_count}篇相关文献，创新空间{5 - min(5, journal_count / 3)}星。"
+    research_perspective_innovation_analysis = f"该选题在现有文献中找到了{journal_count}篇相关文献，创新空间{scores['research_perspective_score']}星。"
     
     # 模型创新性分析
-    model_innovation_analysis = f"该选题使用的实证模型在现有文献中找到了{journal_model_count}篇相关文献，创新空间{5 - min(5, journal_model_count / 3)}星。"
+    model_innovation_analysis = f"该选题使用的实证模型在现有文献中找到了{journal_model_count}篇相关文献，创新空间{scores['model_innovation_score']}星。"
     
     # 数据创新性分析
     data_innovation_analysis = "该选题使用的数据具有一定的创新性，但需要进一步明确其数据处理和应用方式。"
@@ -539,34 +1304,34 @@ def calculate_research_score(paper_topic, variable_settings, empirical_model="")
     
     # 返回评估结果
     return {
-        "total_score": total_score,
-        "value_score": value_score,
-        "skjj_score": skjj_score,
+        "total_score": scores["total_score"],
+        "value_score": scores["value_score"],
+        "skjj_score": scores["skjj_score"],
         "skjj_analysis": skjj_analysis,
-        "cfp_reference_score": cfp_reference_score,
+        "cfp_reference_score": scores["cfp_reference_score"],
         "cfp_analysis": cfp_analysis,
-        "policy_reference_score": policy_reference_score,
+        "policy_reference_score": scores["policy_reference_score"],
         "policy_reference_reason": policy_reference_reason,
-        "practical_solution_score": practical_solution_score,
+        "practical_solution_score": scores["practical_solution_score"],
         "practical_solution_reason": practical_solution_reason,
-        "innovation_score": innovation_score,
-        "theoretical_innovation_total_score": theoretical_innovation_total_score,
-        "theoretical_innovation_score": theoretical_innovation_score,
+        "innovation_score": scores["innovation_score"],
+        "theoretical_innovation_total_score": scores["theoretical_innovation_total_score"],
+        "theoretical_innovation_score": scores["theoretical_innovation_score"],
         "theoretical_innovation_reason": theoretical_innovation_reason,
-        "research_perspective_score": research_perspective_score,
+        "research_perspective_score": scores["research_perspective_score"],
         "research_perspective_innovation_analysis": research_perspective_innovation_analysis,
-        "model_innovation_score": model_innovation_score,
+        "model_innovation_score": scores["model_innovation_score"],
         "model_innovation_analysis": model_innovation_analysis,
-        "data_innovation_score": data_innovation_score,
+        "data_innovation_score": scores["data_innovation_score"],
         "data_innovation_analysis": data_innovation_analysis,
-        "feasibility_score": feasibility_score,
-        "data_availability_score": data_availability_score,
+        "feasibility_score": scores["feasibility_score"],
+        "data_availability_score": scores["data_availability_score"],
         "data_availability_analysis": data_availability_analysis,
-        "empirical_model_feasibility_score": empirical_model_score,
+        "empirical_model_feasibility_score": scores["empirical_model_feasibility_score"],
         "empirical_model_feasibility_reason": empirical_model_feasibility_reason,
         "journal_results": journal_results,
         "journal_model_results": journal_model_results,
         "dataset_results": dataset_results,
         "cfp_results": cfp_results,
         "skjj_results": skjj_results
-    }
\ No newline at end of file
+    }
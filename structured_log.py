@@ -0,0 +1,167 @@
+"""检索和评估流程的结构化日志
+
+热路径上的诊断信息（每次检索的API响应状态、命中缓存、筛选出的第一条记录等）不再直接print，
+而是经本模块输出：
+
+    log = get_logger("search_functions")
+    log.debug("search_cache_hit", "命中检索缓存: {collection} '{query}'", collection=collection_name, query=query_text)
+
+每条日志有级别、事件名和字段。消息模板按str.format的命名字段书写，只有在级别开启、通过采样、
+真正由处理器输出时才格式化；生产环境设为WARNING级别后，DEBUG/INFO日志在一次级别判断后直接返回，
+不格式化任何结果对象，也不争用stdout。
+
+环境变量：
+    EVALUATION_LOG_LEVEL        日志级别，默认INFO（每次检索的明细为DEBUG）
+    EVALUATION_LOG_FORMAT       text（只输出消息，与原先的print一致）或json（每行一个JSON对象，含事件名和字段）
+    EVALUATION_LOG_SAMPLE_RATE  DEBUG/INFO日志的采样比例（0–1），默认1；WARNING及以上总是输出
+
+日志记录器是标准库logging中"topic_evaluation"下的子记录器，也可以由应用自行添加处理器；
+configure()可在运行时修改级别、格式和采样比例。
+"""
+import json
+import logging
+import os
+import random
+import sys
+from collections.abc import Mapping
+
+LOGGER_NAMESPACE = "topic_evaluation"
+LOG_FORMATS = ("text", "json")
+
+# 采样比例，configure()修改
+_sample_rate = 1.0
+
+
+class _LazyMessage:
+    """日志消息，输出时才按字段格式化"""
+
+    __slots__ = ("template", "fields")
+
+    def __init__(self, template, fields):
+        self.template = template
+        self.fields = fields
+
+    def __str__(self):
+        return self.template.format(**self.fields) if self.fields else self.template
+
+
+class StructuredLogger:
+    """带事件名和字段的日志记录器"""
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def _log(self, level, event, template, fields):
+        logger = self._logger
+        if not logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING and _sample_rate < 1.0 and random.random() >= _sample_rate:
+            return
+        logger.log(level, _LazyMessage(template, fields), extra={"event": event, "fields": fields})
+
+    def enabled(self, level=logging.DEBUG):
+        """该级别是否会输出（构造字段本身开销较大时先判断）"""
+        return self._logger.isEnabledFor(level)
+
+    def debug(self, event, template, **fields):
+        self._log(logging.DEBUG, event, template, fields)
+
+    def info(self, event, template, **fields):
+        self._log(logging.INFO, event, template, fields)
+
+    def warning(self, event, template, **fields):
+        self._log(logging.WARNING, event, template, fields)
+
+    def error(self, event, template, **fields):
+        self._log(logging.ERROR, event, template, fields)
+
+
+def _json_default(value):
+    """JSON输出中非基本类型的字段：检索记录展开为dict，其余取字符串"""
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if isinstance(value, Mapping):
+        return dict(value.items())
+    if isinstance(value, (tuple, set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": getattr(record, "event", None),
+            "message": record.getMessage(),
+        }
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            entry.setdefault(key, value)
+        return json.dumps(entry, ensure_ascii=False, default=_json_default)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """输出到当前的sys.stdout（跟随contextlib.redirect_stdout）"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+_handler = None
+
+
+def configure(level=None, fmt=None, sample_rate=None):
+    """设置日志级别、输出格式和采样比例，未指定的参数保持不变
+
+    Args:
+        level: 日志级别名称（如"WARNING"）或数值
+        fmt: 输出格式，见LOG_FORMATS
+        sample_rate: DEBUG/INFO日志的采样比例（0–1）
+
+    Raises:
+        ValueError: 不支持的输出格式或采样比例
+    """
+    global _handler, _sample_rate
+    root = logging.getLogger(LOGGER_NAMESPACE)
+    if _handler is None:
+        _handler = _StdoutHandler()
+        _handler.setFormatter(logging.Formatter("%(message)s"))
+        root.addHandler(_handler)
+        root.propagate = False
+    if level is not None:
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+    if fmt is not None:
+        if fmt not in LOG_FORMATS:
+            raise ValueError(f"不支持的日志格式: {fmt}，可选: {LOG_FORMATS}")
+        _handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter("%(message)s"))
+    if sample_rate is not None:
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"日志采样比例应在0到1之间: {sample_rate}")
+        _sample_rate = float(sample_rate)
+
+
+def get_logger(name):
+    """获取模块的结构化日志记录器
+
+    Args:
+        name: 模块名，记录器名称为"topic_evaluation.<name>"
+
+    Returns:
+        StructuredLogger: 日志记录器
+    """
+    return StructuredLogger(logging.getLogger(f"{LOGGER_NAMESPACE}.{name}"))
+
+
+configure(level=os.environ.get("EVALUATION_LOG_LEVEL", "INFO"),
+          fmt=os.environ.get("EVALUATION_LOG_FORMAT", "text"),
+          sample_rate=float(os.environ.get("EVALUATION_LOG_SAMPLE_RATE", "1")))
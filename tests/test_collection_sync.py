@@ -0,0 +1,71 @@
+"""CollectionExporter增量同步的回归测试（使用内存中的假DashVector集合）"""
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collection_snapshot import CollectionExporter, LocalCollection
+
+
+class _FakeResponse(list):
+    message = ""
+
+
+class _FakeCollection:
+    """按更新标记升序分页返回文档，只支持"marker >= 值"形式的过滤"""
+
+    def __init__(self, marker_field):
+        self.marker_field = marker_field
+        self.docs = {}
+
+    def upsert(self, doc_id, vector, marker, **fields):
+        self.docs[doc_id] = SimpleNamespace(id=doc_id, vector=list(vector),
+                                            fields=dict(fields, **{self.marker_field: marker}))
+
+    def query(self, topk, filter=None, include_vector=True, output_fields=None, order_by_fields=None):
+        docs = sorted(self.docs.values(), key=lambda doc: (doc.fields[self.marker_field], doc.id))
+        if filter is not None:
+            cursor = float(filter.split(">=")[1])
+            docs = [doc for doc in docs if doc.fields[self.marker_field] >= cursor]
+        return _FakeResponse(docs[:topk])
+
+
+class _FakeClient:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_collection(self, collection_name):
+        return True
+
+
+class CollectionSyncTest(unittest.TestCase):
+
+    def test_incremental_sync_updates_existing_id_in_float32_snapshot(self):
+        collection = _FakeCollection("updated_at")
+        collection.upsert("a", [1.0, 0.0, 0.0, 0.0], 1, topic_name="甲")
+        collection.upsert("b", [0.0, 1.0, 0.0, 0.0], 2, topic_name="乙")
+        with tempfile.TemporaryDirectory() as out_dir:
+            def export():
+                return CollectionExporter("SKJJ", out_dir, "updated_at", page_size=10, dtype="float32",
+                                          search_client=_FakeClient(collection)).run()
+
+            export()
+            collection.upsert("a", [0.0, 0.0, 1.0, 0.0], 3, topic_name="甲2")
+            collection.upsert("c", [0.0, 0.0, 0.0, 1.0], 3, topic_name="丙")
+            delta = export()
+
+            snapshot = LocalCollection(os.path.join(out_dir, "SKJJ"))
+            self.assertEqual(sorted(delta["added"]), ["a", "c"])
+            self.assertEqual(list(snapshot.ids), ["a", "b", "c"])
+            self.assertEqual(snapshot.doc(0)["topic_name"], "甲2")
+            np.testing.assert_array_equal(snapshot.float_vectors()[0], [0.0, 0.0, 1.0, 0.0])
+            np.testing.assert_array_equal(snapshot.float_vectors()[1], [0.0, 1.0, 0.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
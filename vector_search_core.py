@@ -1,7 +1,18 @@
 import os 
+import json
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dashvector import Client
+from dashvector.common.error import DashVectorCode
 import dashscope
 from dashscope.embeddings.text_embedding import TextEmbedding
+from rate_limiter import call_with_rate_limit, ThrottledError
+from structured_log import get_logger
+
+log = get_logger("vector_search_core")
+
 
 class APIConfig:
     """API配置类，管理API密钥和端点配置"""
@@ -18,6 +29,84 @@ class APIConfig:
     DATASET_COLLECTION = "dataset_v4"
     SKJJ_COLLECTION = "SKJJ"
     
+    # 集合版本，集合数据更新后修改版本号，使持久化的评估结果失效
+    # 通过环境变量COLLECTION_VERSIONS以JSON形式配置，如{"journal_new": "2025-06"}
+    COLLECTION_VERSIONS = json.loads(os.environ.get("COLLECTION_VERSIONS", "{}"))
+    
+    @classmethod
+    def get_collection_versions(cls):
+        """返回评估所用全部集合的版本号
+        
+        Returns:
+            dict: 集合名称到版本号的映射，未配置的集合版本为"1"
+        """
+        collections = [cls.JOURNAL_COLLECTION, cls.CFP_COLLECTION, cls.DATASET_COLLECTION, cls.SKJJ_COLLECTION]
+        return {name: str(cls.COLLECTION_VERSIONS.get(name, "1")) for name in collections}
+    
+    # 限流后的最大重试次数，端点QPS和并发通过环境变量RATE_LIMITS配置（见rate_limiter.py）
+    THROTTLE_MAX_RETRIES = int(os.environ.get("THROTTLE_MAX_RETRIES", "5"))
+    
+    # 本地快照配置
+    LOCAL_SNAPSHOT_DIR = os.environ.get("LOCAL_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+    SNAPSHOT_MARKER_FIELD = os.environ.get("SNAPSHOT_MARKER_FIELD", "update_time")
+    
+    # 后端选择：EMBEDDING_BACKEND为dashscope或local，SEARCH_BACKEND为dashvector或local
+    EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "dashscope")
+    SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "dashvector")
+    EMBEDDING_MODEL = "text-embedding-v4"
+    
+    # DashScope向量维度：text-embedding-v4默认1024维，降低维度可减少缓存和本地索引占用，
+    # 但DashVector集合的维度固定，非默认维度需要配合按相同维度构建的本地索引使用
+    DEFAULT_EMBEDDING_DIMENSION = 1024
+    SUPPORTED_EMBEDDING_DIMENSIONS = (2048, 1536, 1024, 768, 512, 256, 128, 64)
+    EMBEDDING_DIMENSION = int(os.environ.get("EMBEDDING_DIMENSION", str(DEFAULT_EMBEDDING_DIMENSION)))
+    
+    # 本地索引目录：由local_search.py构建，包含各集合的快照和本地向量化后端的参数；
+    # 默认直接使用DashVector导出的快照（配合DashScope向量化）
+    LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", LOCAL_SNAPSHOT_DIR)
+    LOCAL_EMBEDDING_DIMENSION = int(os.environ.get("LOCAL_EMBEDDING_DIMENSION", "512"))
+    
+    # 本地索引以float16/int8量化存储并保留float32向量时，重排候选数相对topk的倍数，小于等于1时不重排
+    LOCAL_RERANK_FACTOR = int(os.environ.get("LOCAL_RERANK_FACTOR", "4"))
+    
+    # 本地检索的并行分片数（0表示CPU核数），每个分片至少LOCAL_SHARD_MIN_ROWS行，小集合不分片
+    LOCAL_SEARCH_SHARDS = int(os.environ.get("LOCAL_SEARCH_SHARDS", "0"))
+    LOCAL_SHARD_MIN_ROWS = int(os.environ.get("LOCAL_SHARD_MIN_ROWS", "50000"))
+    
+    # search_many对DashVector的最大并发请求数（仍受rate_limiter的端点限流约束）
+    SEARCH_MANY_CONCURRENCY = int(os.environ.get("SEARCH_MANY_CONCURRENCY", "8"))
+    
+    # 异步引擎（async_search.py）对各后端的最大在途请求数，可通过环境变量ASYNC_CONCURRENCY以JSON覆盖，
+    # 如{"dashvector": 64}；请求仍经过rate_limiter的端点限流，与同步调用共用配额
+    ASYNC_CONCURRENCY = dict({"dashscope": 16, "dashvector": 32}, **json.loads(os.environ.get("ASYNC_CONCURRENCY", "{}")))
+    ASYNC_HTTP_TIMEOUT = float(os.environ.get("ASYNC_HTTP_TIMEOUT", "30"))
+    DASHSCOPE_EMBEDDING_URL = os.environ.get(
+        "DASHSCOPE_EMBEDDING_URL",
+        "https://dashscope.aliyuncs.com/api/v1/services/embeddings/text-embedding/text-embedding"
+    )
+    
+    # 构建本地索引时，各集合参与向量化的文本字段
+    INDEX_TEXT_FIELDS = {
+        "journal_new": ["title", "keywords"],
+        "CFP_v2": ["call_for_papers_title", "hot_topics"],
+        "dataset_v4": ["name", "indicators"],
+        "SKJJ": ["topic_name"],
+    }
+    
+    # 本地快照中建立二级索引的过滤字段
+    INDEXED_FIELDS = {
+        "journal_new": ["journallevel"],
+        "CFP_v2": ["journal_name"],
+        "dataset_v4": ["year_start", "year_end"],
+    }
+    
+    # 本地快照中建立词法倒排索引（精确匹配和BM25）的文本字段
+    LEXICAL_FIELDS = {
+        "dataset_v4": ["indicators", "keywords"],
+        "journal_new": ["keywords"],
+        "CFP_v2": ["hot_topics"],
+    }
+    
     # 输出字段 - 根据不同集合类型返回不同字段
     @classmethod
     def get_output_fields(cls, collection_name=None):
@@ -43,24 +132,134 @@ class APIConfig:
         else:
             return ["title", "keywords", "source", "journallevel"]  # 默认字段
 
+def _is_dashscope_throttled(response):
+    """判断DashScope响应或异常是否为限流"""
+    if isinstance(response, Exception):
+        message = str(response)
+        return "Throttling" in message or "429" in message
+    return getattr(response, "status_code", None) == 429 or str(getattr(response, "code", "")).startswith("Throttling")
+
+
+def _is_dashvector_throttled(response):
+    """判断DashVector响应或异常是否为限流"""
+    if isinstance(response, Exception):
+        message = str(response)
+        return "ExceedRateLimit" in message or str(int(DashVectorCode.ExceedRateLimit)) in message
+    return getattr(response, "code", None) == DashVectorCode.ExceedRateLimit
+
+
+_embedding_backends = {}
+_embedding_backend_lock = threading.Lock()
+
+
+def get_embedding_backend():
+    """返回当前部署配置的本地向量化后端
+    
+    EMBEDDING_BACKEND为local时，优先加载本地索引目录中保存的后端参数，
+    保证查询与建索引使用同一个向量化器
+    
+    Returns:
+        EmbeddingBackend或None（使用DashScope时）
+    """
+    if APIConfig.EMBEDDING_BACKEND != "local":
+        return None
+    index_dir = APIConfig.LOCAL_INDEX_DIR
+    with _embedding_backend_lock:
+        if index_dir not in _embedding_backends:
+            from embedding_backends import HashedNgramEmbedding
+            if os.path.exists(os.path.join(index_dir, "embedder.json")):
+                _embedding_backends[index_dir] = HashedNgramEmbedding.load(index_dir)
+            else:
+                _embedding_backends[index_dir] = HashedNgramEmbedding(APIConfig.LOCAL_EMBEDDING_DIMENSION)
+        return _embedding_backends[index_dir]
+
+
+def dashscope_model_id(dimension=None):
+    """DashScope向量化模型在指定维度下的标识
+    
+    默认维度沿用模型名称，已有的缓存、存储和快照在默认维度下保持有效
+    
+    Args:
+        dimension: 向量维度，默认为APIConfig.EMBEDDING_DIMENSION
+        
+    Returns:
+        str: 模型标识，如"text-embedding-v4"、"text-embedding-v4-d256"
+    """
+    dimension = int(dimension or APIConfig.EMBEDDING_DIMENSION)
+    if dimension == APIConfig.DEFAULT_EMBEDDING_DIMENSION:
+        return APIConfig.EMBEDDING_MODEL
+    return f"{APIConfig.EMBEDDING_MODEL}-d{dimension}"
+
+
+def embedding_model_id():
+    """当前使用的向量化模型标识，参与向量缓存键计算，不同模型的向量不会混用
+    
+    Returns:
+        str: 模型标识
+    """
+    backend = get_embedding_backend()
+    return backend.model_id if backend is not None else dashscope_model_id()
+
+
+def create_vectorizer():
+    """按部署配置创建文本向量转换器
+    
+    Returns:
+        TextVectorizer: 文本向量转换器
+    """
+    return TextVectorizer(api_key=APIConfig.DASHSCOPE_API_KEY, backend=get_embedding_backend())
+
+
+def create_search_client():
+    """按部署配置创建向量检索客户端
+    
+    Returns:
+        VectorSearchClient或local_search.LocalSearchClient
+    """
+    if APIConfig.SEARCH_BACKEND == "local":
+        from local_search import LocalSearchClient
+        return LocalSearchClient(APIConfig.LOCAL_INDEX_DIR)
+    return VectorSearchClient(api_key=APIConfig.DASHVECTOR_API_KEY, endpoint=APIConfig.CLUSTER_ENDPOINT)
+
+
 class TextVectorizer:
     """文本向量转换类，负责将文本转换为向量"""
     
-    def __init__(self, api_key=None):
+    # DashScope单次批量请求的最大文本数
+    DASHSCOPE_BATCH_SIZE = 10
+    
+    def __init__(self, api_key=None, backend=None, dimension=None):
         """初始化文本向量转换器
         
         Args:
             api_key: DashScope API密钥
+            backend: 本地向量化后端（EmbeddingBackend），为None时调用DashScope
+            dimension: DashScope向量维度，默认为APIConfig.EMBEDDING_DIMENSION
+            
+        Raises:
+            ValueError: 模型不支持指定的维度
         """
         self.api_key = api_key
-        if api_key:
+        self.backend = backend
+        if backend is not None:
+            self.dimension = backend.dimension
+            self.model_id = backend.model_id
+        else:
+            self.dimension = int(dimension or APIConfig.EMBEDDING_DIMENSION)
+            if self.dimension not in APIConfig.SUPPORTED_EMBEDDING_DIMENSIONS:
+                raise ValueError(f"{APIConfig.EMBEDDING_MODEL} 不支持 {self.dimension} 维向量，"
+                                 f"可选维度: {APIConfig.SUPPORTED_EMBEDDING_DIMENSIONS}")
+            self.model_id = dashscope_model_id(self.dimension)
+        if backend is not None:
+            log.debug("embedding_backend", "使用本地向量化后端: {model_id}", model_id=self.model_id)
+        elif api_key:
             dashscope.api_key = api_key
             # 设置DashScope的base_url
             dashscope.base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
             masked_key = api_key[:6] + "..." + api_key[-4:] if len(api_key) > 10 else "未设置"
-            print(f"DashScope API Key: {masked_key}")
+            log.debug("dashscope_api_key", "DashScope API Key: {masked_key}", masked_key=masked_key)
         else:
-            print("DashScope API Key未设置")
+            log.warning("dashscope_api_key_missing", "DashScope API Key未设置")
     
     def text_to_vector(self, text):
         """将文本转换为向量
@@ -70,18 +269,28 @@ class TextVectorizer:
             
         Returns:
             向量或None（如果转换失败）
+            
+        Raises:
+            ThrottledError: 持续被限流，重试次数用尽
         """
+        if self.backend is not None:
+            return self.backend.embed(text)
+        
         try:
-            # 使用DashScope的TextEmbedding模型将文本转换为向量
-            resp = TextEmbedding.call(
-                model="text-embedding-v4",  # 使用最新的embedding模型
-                input=text,
-                api_key=self.api_key
+            # 使用DashScope的TextEmbedding模型将文本转换为向量，调用经过共享限流器排队
+            resp = call_with_rate_limit(
+                "dashscope",
+                lambda: TextEmbedding.call(
+                    model=APIConfig.EMBEDDING_MODEL,  # 使用最新的embedding模型
+                    input=text,
+                    api_key=self.api_key,
+                    dimension=self.dimension
+                ),
+                _is_dashscope_throttled,
+                max_retries=APIConfig.THROTTLE_MAX_RETRIES
             )
             
-            # 打印响应信息用于调试
-            print(f"API响应状态: {resp.status_code}")
-            # print(f"API响应内容: {resp.output}")
+            log.debug("embedding_response", "API响应状态: {status_code}", status_code=resp.status_code)
             
             if resp.status_code == 200:
                 # 根据响应结构提取向量
@@ -90,14 +299,62 @@ class TextVectorizer:
                 elif isinstance(resp.output, dict) and 'embeddings' in resp.output:
                     return resp.output['embeddings'][0]['embedding']
                 else:
-                    print(f"无法从响应中提取向量: {resp.output}")
+                    log.error("embedding_malformed", "无法从响应中提取向量: {output}", output=resp.output)
                     return None
             else:
-                print(f"文本转向量失败: {resp.message}")
+                log.error("embedding_failed", "文本转向量失败: {message}", message=resp.message)
                 return None
+        except ThrottledError:
+            # 限流不能当作空结果处理，否则会得到静默的零分
+            log.warning("embedding_throttled", "文本转向量持续被限流")
+            raise
         except Exception as e:
-            print(f"文本转向量异常: {str(e)}")
+            log.error("embedding_error", "文本转向量异常: {error}", error=e)
             return None
+    
+    def texts_to_vectors(self, texts):
+        """批量将文本转换为向量
+        
+        本地后端一次完成整批向量化；DashScope按每批DASHSCOPE_BATCH_SIZE条请求
+        
+        Args:
+            texts: 文本列表
+            
+        Returns:
+            list: 与texts等长的向量列表，转换失败的位置为None
+            
+        Raises:
+            ThrottledError: 持续被限流，重试次数用尽
+        """
+        if self.backend is not None:
+            return [vector.tolist() for vector in self.backend.embed_batch(list(texts))]
+        
+        vectors = [None] * len(texts)
+        for start in range(0, len(texts), self.DASHSCOPE_BATCH_SIZE):
+            batch = list(texts[start:start + self.DASHSCOPE_BATCH_SIZE])
+            try:
+                resp = call_with_rate_limit(
+                    "dashscope",
+                    lambda: TextEmbedding.call(model=APIConfig.EMBEDDING_MODEL, input=batch, api_key=self.api_key,
+                                              dimension=self.dimension),
+                    _is_dashscope_throttled,
+                    max_retries=APIConfig.THROTTLE_MAX_RETRIES
+                )
+            except ThrottledError:
+                log.warning("embedding_batch_throttled", "批量文本转向量持续被限流")
+                raise
+            except Exception as e:
+                log.error("embedding_batch_error", "批量文本转向量异常: {error}", error=e)
+                continue
+            
+            if resp.status_code != 200:
+                log.error("embedding_batch_failed", "批量文本转向量失败: {message}", message=resp.message)
+                continue
+            embeddings = resp.output['embeddings'] if isinstance(resp.output, dict) else resp.output.embeddings
+            for item in embeddings:
+                index = item['text_index'] if isinstance(item, dict) else item.text_index
+                vectors[start + index] = item['embedding'] if isinstance(item, dict) else item.embedding
+        return vectors
 
 
 class VectorSearchClient:
@@ -124,12 +381,10 @@ class VectorSearchClient:
         """初始化DashVector客户端"""
         try:
             self.client = Client(api_key=self.api_key, endpoint=self.endpoint)
-            print("创建客户端成功!")
-            # print(f"API Key: {self.api_key}")
-            # print(f"Endpoint: {self.endpoint}")
+            log.debug("dashvector_client", "创建客户端成功!")
             return True
         except Exception as e:
-            print(f"创建客户端失败: {str(e)}")
+            log.error("dashvector_client_failed", "创建客户端失败: {error}", error=e)
             return False
     
     def get_cluster(self, cluster_name):
@@ -143,10 +398,10 @@ class VectorSearchClient:
         """
         try:
             self.cluster = self.client.get(name=cluster_name)
-            print(f"成功获取cluster: {cluster_name}")
+            log.debug("dashvector_cluster", "成功获取cluster: {cluster}", cluster=cluster_name)
             return True
         except Exception as e:
-            print(f"获取cluster失败: {str(e)}")
+            log.error("dashvector_cluster_failed", "获取cluster失败: {error}", cluster=cluster_name, error=e)
             return False
     
     def get_collection(self, collection_name):
@@ -160,13 +415,13 @@ class VectorSearchClient:
         """
         try:
             self.collection = self.client.get(name=collection_name)
-            print(f"成功获取collection: {collection_name}")
+            log.debug("dashvector_collection", "成功获取collection: {collection}", collection=collection_name)
             return True
         except Exception as e:
-            print(f"获取collection失败: {str(e)}")
+            log.error("dashvector_collection_failed", "获取collection失败: {error}", collection=collection_name, error=e)
             return False
     
-    def search(self, query_vector, topk=10, output_fields=None, include_vector=True):
+    def search(self, query_vector, topk=10, output_fields=None, include_vector=True, search_filter=None):
         """执行向量检索
         
         Args:
@@ -174,26 +429,166 @@ class VectorSearchClient:
             topk: 返回结果数量
             output_fields: 返回字段列表
             include_vector: 是否包含向量数据
+            search_filter: 元数据过滤条件，SearchFilter或DashVector的filter表达式字符串
             
         Returns:
             检索结果列表或None（如果检索失败）
+            
+        Raises:
+            ThrottledError: 持续被限流，重试次数用尽
         """
         if not self.collection:
-            print("未设置collection，无法执行检索")
+            log.error("search_no_collection", "未设置collection，无法执行检索")
             return None
             
+        if search_filter is not None and not isinstance(search_filter, str):
+            search_filter = search_filter.to_dashvector()
+            
         try:
-            print("\n执行向量检索...")
-            results = self.collection.query(
-                vector=query_vector,
-                topk=topk,
-                output_fields=output_fields,
-                include_vector=include_vector
+            log.debug("search", "执行向量检索...")
+            results = call_with_rate_limit(
+                "dashvector",
+                lambda: self.collection.query(
+                    vector=query_vector,
+                    topk=topk,
+                    filter=search_filter or None,
+                    output_fields=output_fields,
+                    include_vector=include_vector
+                ),
+                _is_dashvector_throttled,
+                max_retries=APIConfig.THROTTLE_MAX_RETRIES
             )
             return results
+        except ThrottledError:
+            log.warning("search_throttled", "向量检索持续被限流")
+            raise
         except Exception as e:
-            print(f"执行向量检索失败: {str(e)}")
+            log.error("search_failed", "执行向量检索失败: {error}", error=e)
             return None
+    
+    def search_many(self, query_vectors, topk=10, output_fields=None, include_vector=True, search_filter=None):
+        """对同一个collection批量执行向量检索
+        
+        DashVector没有批量查询接口，各查询以有界并发发出
+        
+        Args:
+            query_vectors: 查询向量列表
+            topk: 每个查询的返回结果数量
+            output_fields: 返回字段列表
+            include_vector: 是否包含向量数据
+            search_filter: 元数据过滤条件，对全部查询生效
+            
+        Returns:
+            list: 与query_vectors顺序一致的检索结果列表，失败的查询对应None
+            
+        Raises:
+            ThrottledError: 持续被限流，重试次数用尽
+        """
+        query_vectors = list(query_vectors)
+        if len(query_vectors) <= 1 or APIConfig.SEARCH_MANY_CONCURRENCY <= 1:
+            return [self.search(vector, topk, output_fields, include_vector, search_filter) for vector in query_vectors]
+        
+        workers = min(APIConfig.SEARCH_MANY_CONCURRENCY, len(query_vectors))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # 在调用方的上下文中执行，检索按调用方的request_priority在限流器中排队
+            futures = [
+                executor.submit(contextvars.copy_context().run, self.search, vector, topk, output_fields,
+                                include_vector, search_filter)
+                for vector in query_vectors
+            ]
+            return [future.result() for future in futures]
+
+
+class LRUCache:
+    """线程安全的LRU缓存，用于缓存向量、检索结果和评估结果"""
+    
+    def __init__(self, maxsize=1024):
+        """初始化缓存
+        
+        Args:
+            maxsize: 最大缓存条目数，小于等于0时不缓存任何内容
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """读取缓存，命中时将条目移到最近使用的位置
+        
+        Args:
+            key: 缓存键
+            default: 未命中时的返回值
+            
+        Returns:
+            缓存值或default
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+    
+    def set(self, key, value):
+        """写入缓存，超出容量时淘汰最久未使用的条目
+        
+        Args:
+            key: 缓存键
+            value: 缓存值
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key, default=None):
+        """删除并返回缓存条目
+        
+        Args:
+            key: 缓存键
+            default: 条目不存在时的返回值
+            
+        Returns:
+            缓存值或default
+        """
+        with self._lock:
+            return self._data.pop(key, default)
+    
+    def clear(self):
+        """清空缓存和命中统计"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+    
+    def stats(self):
+        """返回缓存统计信息
+        
+        Returns:
+            dict: 包含size、hits、misses和hit_rate的字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
 
 
 class ResultProcessor:
@@ -229,6 +624,32 @@ class ResultProcessor:
                     if key != 'vector':  # 不打印向量数据
                         print(f"{key}: {value}")
     
+    @staticmethod
+    def to_dict(result):
+        """将单条检索结果转换为普通字典
+        
+        dashvector的Doc对象会被展开为id、score和fields中的各个字段，
+        result_records中的紧凑记录通过其to_dict转换
+        
+        Args:
+            result: 检索结果（dict、Doc或紧凑记录）
+            
+        Returns:
+            dict: 不含向量数据的结果字典
+        """
+        if isinstance(result, dict):
+            return {key: value for key, value in result.items() if key != 'vector'}
+        if hasattr(result, 'to_dict'):
+            return result.to_dict()
+        
+        record = {}
+        if getattr(result, 'id', None) is not None:
+            record['id'] = result.id
+        if getattr(result, 'score', None) is not None:
+            record['score'] = result.score
+        record.update(getattr(result, 'fields', None) or {})
+        return record
+    
     @staticmethod
     def extract_field_values(results, field_name):
         """从结果中提取指定字段的值
@@ -281,6 +702,35 @@ class ResultProcessor:
             return []
             
         return [result for result in results if result.get('score', 0) >= min_score]
+    
+    @staticmethod
+    def filter_results_by_score_many(results_list, min_score=0.5):
+        """对多次检索的结果一次性按分数过滤（分数矩阵上的阈值掩码，见batch_scoring.ScoreBatch）
+        
+        Args:
+            results_list: 检索结果列表的列表
+            min_score: 最小分数阈值，标量或每次检索一个阈值
+            
+        Returns:
+            list: 每次检索过滤后的结果列表，与逐次调用filter_results_by_score相同
+        """
+        from batch_scoring import ScoreBatch
+        
+        return ScoreBatch.from_results(results_list).select(results_list, min_score)
+    
+    @staticmethod
+    def calculate_average_score_many(results_list):
+        """计算多次检索各自的平均相似度分数
+        
+        Args:
+            results_list: 检索结果列表的列表
+            
+        Returns:
+            list: 平均分数列表，与逐次调用calculate_average_score相同
+        """
+        from batch_scoring import ScoreBatch
+        
+        return ScoreBatch.from_results(results_list).averages().tolist()
 
 
 class VectorSearchEngine:
@@ -322,12 +772,12 @@ class VectorSearchEngine:
         # 将文本转换为向量
         query_vector = self.vectorizer.text_to_vector(text)
         if not query_vector:
-            print("文本转向量失败，无法执行检索")
+            log.warning("search_embedding_failed", "文本转向量失败，无法执行检索")
             return None
         
         # 获取集合
         if not self.search_client.get_collection(collection_name):
-            print(f"获取集合 {collection_name} 失败，无法执行检索")
+            log.warning("search_collection_failed", "获取集合 {collection} 失败，无法执行检索", collection=collection_name)
             return None
         
         # 获取输出字段
@@ -342,7 +792,7 @@ class VectorSearchEngine:
         )
         
         if not results:
-            print("检索未返回结果")
+            log.info("search_empty", "检索未返回结果")
             return None
         
         # 如果设置了最小分数阈值，过滤结果